@@ -0,0 +1,218 @@
+#!/bin/sh
+
+
+# +
+#
+# Name:        artn.indexes.sh
+# Description: ARTN Index(es) Migration
+# Author:      Phil Daly (pndaly@email.arizona.edu)
+# Date:        20230601
+# Execute:     % bash artn.indexes.sh --help
+#
+# -
+
+
+# +
+# default(s) - edit as required
+# -
+def_db_name="artn"
+def_db_pass="db_secret"
+def_db_host="localhost:5432"
+def_db_user="artn"
+
+dry_run=0
+
+
+# +
+# variable(s)
+# -
+artn_db_name="${def_db_name}"
+artn_db_pass="${def_db_pass}"
+artn_db_host="${def_db_host}"
+artn_db_user="${def_db_user}"
+
+
+# +
+# utility functions
+# -
+write_blue () {
+  BLUE='\033[0;34m'
+  NCOL='\033[0m'
+  printf "${BLUE}${1}${NCOL}\n"
+}
+write_red () {
+  RED='\033[0;31m'
+  NCOL='\033[0m'
+  printf "${RED}${1}${NCOL}\n"
+}
+write_yellow () {
+  YELLOW='\033[0;33m'
+  NCOL='\033[0m'
+  printf "${YELLOW}${1}${NCOL}\n"
+}
+write_green () {
+  GREEN='\033[0;32m'
+  NCOL='\033[0m'
+  printf "${GREEN}${1}${NCOL}\n"
+}
+write_cyan () {
+  CYAN='\033[0;36m'
+  NCOL='\033[0m'
+  printf "${CYAN}${1}${NCOL}\n"
+}
+usage () {
+  write_blue   ""                                                                                                 2>&1
+  write_blue   "ARTN Index(es) Migration"                                                                          2>&1
+  write_blue   ""                                                                                                 2>&1
+  write_green  "Use:"                                                                                             2>&1
+  write_green  "  %% bash $0 --database=<str> --hostname=<str:int> --password=<str> --username=<str> [--dry-run]" 2>&1
+  write_cyan   ""                                                                                                 2>&1
+  write_yellow "Input(s):"                                                                                        2>&1
+  write_yellow "  --database=<str>,      where <str> is the database name,               default=${def_db_name}"  2>&1
+  write_yellow "  --hostname=<str:int>,  where <str> is the database hostname and port,  default=${def_db_host}"  2>&1
+  write_yellow "  --password=<str>,      where <str> is the database password,           default=${def_db_pass}"  2>&1
+  write_yellow "  --username=<str>,      where <str> is the database username,           default=${def_db_user}"  2>&1
+  write_cyan   ""                                                                                                 2>&1
+  write_cyan   "Flag(s):"                                                                                         2>&1
+  write_cyan   "  --dry-run,             show (but do not execute) commands,             default=false"           2>&1
+  write_cyan   ""                                                                                                 2>&1
+}
+
+# +
+# check command line argument(s) 
+# -
+while test $# -gt 0; do
+  case "${1}" in
+    --database*|--DATABASE*)
+      artn_db_name=$(echo $1 | cut -d'=' -f2)
+      shift
+      ;;
+    --dry-run|--DRY-RUN)
+      dry_run=1
+      shift
+      ;;
+    --password*|--PASSWORD*)
+      artn_db_pass=$(echo $1 | cut -d'=' -f2)
+      shift
+      ;;
+    --username*|--USERNAME*)
+      artn_db_user=$(echo $1 | cut -d'=' -f2)
+      shift
+      ;;
+    --hostname*|--HOSTNAME*)
+      artn_db_host=$(echo $1 | cut -d'=' -f2)
+      shift
+      ;;
+    --help|*)
+      usage
+      exit 0
+      ;;
+  esac
+done
+
+
+# +
+# check and (re)set variable(s)
+# -
+if [[ -z ${artn_db_name} ]]; then
+  artn_db_name=${def_db_name}
+fi
+if [[ -z ${artn_db_host} ]]; then
+  artn_db_host=${def_db_host}
+fi
+if [[ -z ${artn_db_pass} ]]; then
+  artn_db_pass=${def_db_pass}
+fi
+if [[ -z ${artn_db_user} ]]; then
+  artn_db_user=${def_db_user}
+fi
+
+
+# +
+# write file to create database
+# -
+_host=$(echo ${artn_db_host} | cut -d':' -f1)
+_port=$(echo ${artn_db_host} | cut -d':' -f2)
+PSQL_CMD="PGPASSWORD=\"${artn_db_pass}\" psql --echo-all -h ${_host} -p ${_port} -U ${artn_db_user} -d ${artn_db_name} "
+if [[ -f /tmp/artn.indexes.sh ]]; then
+  rm -f /tmp/artn.indexes.sh
+fi
+
+
+# +
+# create index(es), psql autocommits each statement (CONCURRENTLY cannot run inside a transaction block)
+# -
+echo "Creating /tmp/artn.indexes.sh"
+echo "#!/bin/sh"                                                                                                                                                 >> /tmp/artn.indexes.sh 2>&1
+echo ""                                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "${PSQL_CMD} << END_INDEXES"                                                                                                                                >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE EXTENSION IF NOT EXISTS pg_trgm;"                                                                                                                   >> /tmp/artn.indexes.sh 2>&1
+echo ""                                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "-- b-tree: exact (=) and prefix (LIKE 'abc%') match, list and queue pages"                                                                                 >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_username_idx ON obsreq2 (username varchar_pattern_ops);"                                                   >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_observation_id_idx ON obsreq2 (observation_id varchar_pattern_ops);"                                       >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_rts2_id_idx ON obsreq2 (rts2_id);"                                                                         >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_queued_completed_idx ON obsreq2 (queued, completed, queued_iso);"                                          >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_begin_end_mjd_idx ON obsreq2 (begin_mjd, end_mjd);"                                                        >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsexposure_obsreqid_idx ON obsexposure (obsreqid);"                                                               >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreqs_username_idx ON obsreqs (username varchar_pattern_ops);"                                                   >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreqs_group_id_idx ON obsreqs (group_id varchar_pattern_ops);"                                                   >> /tmp/artn.indexes.sh 2>&1
+echo ""                                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "-- trigram: substring (ILIKE '%abc%') search"                                                                                                              >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_username_trgm_idx ON obsreq2 USING gin (username gin_trgm_ops);"                                           >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_object_name_trgm_idx ON obsreq2 USING gin (object_name gin_trgm_ops);"                                     >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreq2_pi_trgm_idx ON obsreq2 USING gin (pi gin_trgm_ops);"                                                       >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreqs_username_trgm_idx ON obsreqs USING gin (username gin_trgm_ops);"                                           >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS obsreqs_object_name_trgm_idx ON obsreqs USING gin (object_name gin_trgm_ops);"                                     >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS users_username_trgm_idx ON users USING gin (username gin_trgm_ops);"                                               >> /tmp/artn.indexes.sh 2>&1
+echo "CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_trgm_idx ON users USING gin (email gin_trgm_ops);"                                                     >> /tmp/artn.indexes.sh 2>&1
+echo ""                                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "ANALYZE obsreq2;"                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "ANALYZE obsexposure;"                                                                                                                                      >> /tmp/artn.indexes.sh 2>&1
+echo "ANALYZE obsreqs;"                                                                                                                                          >> /tmp/artn.indexes.sh 2>&1
+echo "ANALYZE users;"                                                                                                                                            >> /tmp/artn.indexes.sh 2>&1
+echo "END_INDEXES"                                                                                                                                               >> /tmp/artn.indexes.sh 2>&1
+
+
+# +
+# execute
+# -
+write_blue "%% bash $0 --database=${artn_db_name} --hostname=${artn_db_host} --password=${artn_db_pass} --username=${artn_db_user} --dry-run=${dry_run}"
+if [[ ${dry_run} -eq 1 ]]; then
+  if [[ "${USER}" != "root" ]]; then
+    write_red "WARNING: you need to be root to execute these commands!"
+  fi
+  if [[ ! -f /tmp/artn.indexes.sh ]]; then
+    write_red "WARNING: /tmp/artn.indexes.sh does not exist!"
+  fi
+  write_yellow "Dry-Run> chmod a+x /tmp/artn.indexes.sh"
+  write_yellow "Dry-Run> bash /tmp/artn.indexes.sh"
+  write_yellow "Dry-Run> rm -f /tmp/artn.indexes.sh"
+  write_yellow "Dry-Run> PGPASSWORD='${artn_db_pass}' psql --echo-all -h ${_host} -p ${_port} -U ${artn_db_user} -d ${artn_db_name} -c '\\di'"
+
+else
+  if [[ "${USER}" != "root" ]]; then
+    write_red "ERROR: you need to be root to execute these commands!"
+    usage
+    exit
+  fi
+  if [[ ! -f /tmp/artn.indexes.sh ]]; then
+    write_red "ERROR: /tmp/artn.indexes.sh does not exist!"
+    usage
+    exit
+  fi
+  write_green "Executing> chmod a+x /tmp/artn.indexes.sh"
+  chmod a+x /tmp/artn.indexes.sh
+  write_green "Executing> bash /tmp/artn.indexes.sh"
+  bash /tmp/artn.indexes.sh
+  write_green "Executing> rm -f /tmp/artn.indexes.sh"
+  rm -f /tmp/artn.indexes.sh
+  write_green "Executing> PGPASSWORD='${artn_db_pass}' psql --echo-all -h ${_host} -p ${_port} -U ${artn_db_user} -d ${artn_db_name} -c '\\di'"
+  PGPASSWORD="${artn_db_pass}" psql --echo-all -h ${_host} -p ${_port} -U ${artn_db_user} -d ${artn_db_name} -c "\\di"
+fi
+
+
+# +
+# exit
+# -
+exit 0
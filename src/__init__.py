@@ -10,6 +10,7 @@ from astropy.time import Time
 from astropy import units as u
 from datetime import timedelta
 from datetime import datetime
+from . import convert
 
 import base64
 import hashlib
@@ -329,18 +330,15 @@ def get_date_utctime(days=0):
 # function: get_iso()
 # -
 def get_iso():
-    return Time.now().to_datetime(ARTN_TIMEZONE).isoformat()[:26]
+    return datetime.now(ARTN_TIMEZONE).isoformat()[:26]
 
 
 # +
 # function: iso_to_mjd()
 # -
-# noinspection PyBroadException,PyPep8
 def iso_to_mjd(iso=''):
-    try:
-        return ARTN_MJD_FORMAT.format(Time(iso).mjd).strip()
-    except Exception:
-        return ARTN_MJD_FORMAT.format(-1.0).strip()
+    _mjd = convert.iso_to_mjd(iso)
+    return ARTN_MJD_FORMAT.format(-1.0 if math.isnan(_mjd) else _mjd).strip()
 
 
 # +
@@ -357,7 +355,7 @@ def mjd_to_iso(mjd=''):
     if not isinstance(mjd, str) or mjd.strip() == '' or not re.search(ARTN_MJD_PATTERN, mjd):
         return ARTN_ISO_NULL
     else:
-        return Time(float(mjd) + 2400000.5, format='jd', precision=6).iso[:26].strip()
+        return convert.mjd_to_iso(float(mjd))
 
 
 # +
@@ -370,12 +368,8 @@ def get_jd():
 # +
 # function: iso_to_jd()
 # -
-# noinspection PyBroadException
 def iso_to_jd(_iso=''):
-    try:
-        return float(Time(_iso).mjd)+2400000.5
-    except Exception:
-        return float(math.nan)
+    return convert.iso_to_jd(_iso)
 
 
 # +
@@ -384,7 +378,7 @@ def iso_to_jd(_iso=''):
 # noinspection PyBroadException
 def jd_to_iso(_jd=0.0):
     try:
-        return Time(_jd, format='jd', precision=6).isot
+        return convert.jd_to_iso(float(_jd))
     except Exception:
         return None
 
@@ -399,7 +393,6 @@ def get_unique_hash():
 # +
 # function: ra_to_deg()
 # -
-# noinspection PyBroadException
 def ra_to_deg(_ra=''):
 
     # check input(s)
@@ -407,12 +400,7 @@ def ra_to_deg(_ra=''):
         return float('nan')
 
     # convert
-    try:
-        if 'hours' not in _ra.lower():
-            _ra = '{} hours'.format(_ra)
-        return float(Angle(_ra).degree)
-    except Exception:
-        return float('nan')
+    return convert.hms_to_deg(_ra)
 
 
 # +
@@ -422,9 +410,8 @@ def ra_to_deg(_ra=''):
 def ra_to_hms(ra=math.nan):
     """ return RA from decimal to H:M:S """
     try:
-        _c = Angle(ra, unit=u.degree).hms
-        _h, _m, _s = int(_c.h), int(_c.m), _c.s
-        return f'{_h:02d}:{_m:02d}:{_s:06.3f}'
+        _h, _m, _s = convert.deg_to_hms(ra)
+        return f'{int(_h):02d}:{int(_m):02d}:{_s:06.3f}'
     except:
         return None
 
@@ -432,7 +419,6 @@ def ra_to_hms(ra=math.nan):
 # +
 # function: dec_to_deg()
 # -
-# noinspection PyBroadException
 def dec_to_deg(_dec=''):
 
     # check input(s)
@@ -440,12 +426,7 @@ def dec_to_deg(_dec=''):
         return float('nan')
 
     # convert
-    try:
-        if 'degrees' not in _dec.lower():
-            _dec = '{} degrees'.format(_dec)
-        return float(Angle(_dec).degree)
-    except Exception:
-        return float('nan')
+    return convert.dms_to_deg(_dec)
 
 
 # +
@@ -455,10 +436,9 @@ def dec_to_deg(_dec=''):
 def dec_to_dms(dec=math.nan):
     """ return Dec from decimal to d:m:s """
     try:
-        _c = Angle(dec, unit=u.degree).signed_dms
-        _d, _m, _s = int(_c.d), int(_c.m), _c.s
-        _sign = '+' if _c.sign == 1.0 else '-'
-        return f'{_sign}{_d:02d}:{_m:02d}:{_s:06.3f}'
+        _c, _d, _m, _s = convert.deg_to_dms(dec)
+        _sign = '+' if _c == 1.0 else '-'
+        return f'{_sign}{int(_d):02d}:{int(_m):02d}:{_s:06.3f}'
     except:
         return None
 
@@ -68,7 +68,7 @@ def orp_api_getobsreq():
 
     if len(filter):
         obs = db.session.query(ObsReq2).filter(*filter).all()
-        ret = [x.serialized() for x in obs]
+        ret = ObsReq2.serialize_list(obs)
         return jsonify(ret)
     
     return jsonify('Must specify a filter')
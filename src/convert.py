@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from datetime import datetime, timedelta, timezone
+
+import math
+import numpy as np
+import re
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    Fast sexagesimal and ISO time conversions without astropy string parsing. Anything the fast
+    path does not recognise falls back to astropy so results (and failures) match Angle() and Time().
+
+    from src.convert import *
+    hms_to_deg('12:34:56.7')                  # 188.73625
+    dms_to_deg('-05:06:07.8')                 # -5.1021666...
+    iso_to_mjd('2020-07-26T00:00:00.000000')  # 59056.0
+    mjd_to_iso(59056.0)                       # '2020-07-26 00:00:00.000000'
+    hms_to_deg_array(['12:34:56.7', ...])     # np.ndarray
+
+"""
+
+
+# +
+# constant(s)
+# -
+CNV__JD_OFFSET = 2400000.5
+CNV__MJD_EPOCH = datetime(1858, 11, 17)
+CNV__MJD_ORDINAL = CNV__MJD_EPOCH.toordinal()
+CNV__ISO_RULE = re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}(?:\.\d*)?))?)?\s*$')
+CNV__SEX_RULE = re.compile(r'^\s*([+-])?\s*(\d+(?:\.\d*)?)(?:[:\s]\s*(\d+(?:\.\d*)?)(?:[:\s]\s*(\d+(?:\.\d*)?))?)?\s*$')
+
+
+# +
+# function: _sexagesimal()
+# -
+def _sexagesimal(value=''):
+    """ returns (sign, a, b, c) for [+-]a[:b[:c]] or None """
+    _m = CNV__SEX_RULE.match(value)
+    if _m is None:
+        return None
+    _b = float(_m.group(3)) if _m.group(3) else 0.0
+    _c = float(_m.group(4)) if _m.group(4) else 0.0
+    if _b >= 60.0 or _c >= 60.0:
+        return None
+    return -1.0 if _m.group(1) == '-' else 1.0, float(_m.group(2)), _b, _c
+
+
+# +
+# function: _angle()
+# -
+# noinspection PyBroadException
+def _angle(value='', unit='degrees'):
+    """ astropy fallback for anything the fast path does not recognise """
+    try:
+        from astropy.coordinates import Angle
+        return float(Angle(value if unit in value.lower() else f'{value} {unit}').degree)
+    except Exception:
+        return math.nan
+
+
+# +
+# function: hms_to_deg()
+# -
+def hms_to_deg(hms=''):
+    """ converts [+-]hh:mm:ss.sss (hours) to decimal degrees, nan on failure """
+    if not isinstance(hms, str) or hms.strip() == '':
+        return math.nan
+    _p = _sexagesimal(hms)
+    if _p is None:
+        return _angle(hms, 'hours')
+    return _p[0] * (_p[1] + _p[2] / 60.0 + _p[3] / 3600.0) * 15.0
+
+
+# +
+# function: dms_to_deg()
+# -
+def dms_to_deg(dms=''):
+    """ converts [+-]dd:mm:ss.sss (degrees) to decimal degrees, nan on failure """
+    if not isinstance(dms, str) or dms.strip() == '':
+        return math.nan
+    _p = _sexagesimal(dms)
+    if _p is None:
+        return _angle(dms, 'degrees')
+    return _p[0] * (_p[1] + _p[2] / 60.0 + _p[3] / 3600.0)
+
+
+# +
+# function: deg_to_hms()
+# -
+def deg_to_hms(deg=math.nan):
+    """ converts decimal degrees to an (h, m, s) tuple, negative angles have negative components """
+    _hours = float(deg) / 15.0
+    _sign = -1.0 if _hours < 0.0 else 1.0
+    _h, _rem = divmod(abs(_hours), 1.0)
+    _m, _rem = divmod(_rem * 60.0, 1.0)
+    return _sign * _h, _sign * _m, _sign * _rem * 60.0
+
+
+# +
+# function: deg_to_dms()
+# -
+def deg_to_dms(deg=math.nan):
+    """ converts decimal degrees to a (sign, d, m, s) tuple with unsigned components """
+    _deg = float(deg)
+    _sign = -1.0 if _deg < 0.0 else 1.0
+    _d, _rem = divmod(abs(_deg), 1.0)
+    _m, _rem = divmod(_rem * 60.0, 1.0)
+    return _sign, _d, _m, _rem * 60.0
+
+
+# +
+# function: hms_to_deg_array()
+# -
+def hms_to_deg_array(values=None):
+    """ vectorized hms_to_deg() """
+    return _sexagesimal_array(values, 15.0, 'hours')
+
+
+# +
+# function: dms_to_deg_array()
+# -
+def dms_to_deg_array(values=None):
+    """ vectorized dms_to_deg() """
+    return _sexagesimal_array(values, 1.0, 'degrees')
+
+
+# +
+# function: _sexagesimal_array()
+# -
+def _sexagesimal_array(values=None, scale=1.0, unit='degrees'):
+    """ parses every value once, does the arithmetic in numpy and falls back per element """
+    _values = [] if values is None else list(values)
+
+    # common case: every value is [+-]a:b:c so one split of the joined column does the lot
+    # noinspection PyBroadException
+    try:
+        if _values and all(_v.count(':') == 2 for _v in _values):
+            _abc = np.array(' '.join(_values).replace(':', ' ').split(), dtype=float).reshape(-1, 3)
+            if np.all(np.isfinite(_abc)) and np.all(_abc[:, 1:] < 60.0) and np.all(_abc[:, 1:] >= 0.0):
+                _sign = np.where(np.signbit(_abc[:, 0]), -1.0, 1.0)
+                return _sign * (np.abs(_abc[:, 0]) + _abc[:, 1] / 60.0 + _abc[:, 2] / 3600.0) * scale
+    except Exception:
+        pass
+
+    _parts = np.full((len(_values), 4), np.nan)
+    _fallback = []
+    for _i, _v in enumerate(_values):
+        _p = _sexagesimal(_v) if isinstance(_v, str) else None
+        if _p is None:
+            _fallback.append(_i)
+        else:
+            _parts[_i] = _p
+    _deg = _parts[:, 0] * (_parts[:, 1] + _parts[:, 2] / 60.0 + _parts[:, 3] / 3600.0) * scale
+    for _i in _fallback:
+        _v = _values[_i]
+        _deg[_i] = _angle(_v, unit) if isinstance(_v, str) and _v.strip() != '' else math.nan
+    return _deg
+
+
+# +
+# function: _time()
+# -
+# noinspection PyBroadException
+def _time(value=None):
+    """ astropy fallback, returns the utc mjd or nan """
+    try:
+        from astropy.time import Time
+        return float(Time(value).utc.mjd)
+    except Exception:
+        return math.nan
+
+
+# +
+# function: iso_to_mjd()
+# -
+def iso_to_mjd(iso=''):
+    """ converts YYYY-MM-DD[ T]HH:MM[:SS.ssssss] (or a datetime) to a utc mjd, nan on failure """
+    if isinstance(iso, datetime):
+        if iso.tzinfo is not None:
+            iso = iso.astimezone(timezone.utc).replace(tzinfo=None)
+        return (iso.toordinal() - CNV__MJD_ORDINAL) + \
+            (iso.hour * 3600.0 + iso.minute * 60.0 + iso.second + iso.microsecond / 1.0e6) / 86400.0
+    if not isinstance(iso, str) or iso.strip() == '':
+        return math.nan
+    _m = CNV__ISO_RULE.match(iso)
+    if _m is None:
+        return _time(iso)
+    _y, _mo, _d, _hh, _mm, _ss = _m.groups()
+    try:
+        _days = datetime(int(_y), int(_mo), int(_d)).toordinal() - CNV__MJD_ORDINAL
+    except ValueError:
+        return math.nan
+    _seconds = (int(_hh) * 3600.0 + int(_mm) * 60.0 if _hh else 0.0) + (float(_ss) if _ss else 0.0)
+    if _hh and (int(_hh) > 23 or int(_mm) > 59 or (_ss and float(_ss) >= 60.0)):
+        return _time(iso)
+    return _days + _seconds / 86400.0
+
+
+# +
+# function: iso_to_jd()
+# -
+def iso_to_jd(iso=''):
+    """ converts an iso string to a utc jd, nan on failure """
+    return iso_to_mjd(iso) + CNV__JD_OFFSET
+
+
+# +
+# function: mjd_to_datetime()
+# -
+def mjd_to_datetime(mjd=math.nan):
+    """ converts an mjd to a naive utc datetime rounded to the microsecond """
+    _mjd = (float(mjd) + CNV__JD_OFFSET) - CNV__JD_OFFSET
+    _days = math.floor(_mjd)
+    return CNV__MJD_EPOCH + timedelta(days=_days, microseconds=round((_mjd - _days) * 86400.0e6))
+
+
+# +
+# function: mjd_to_iso()
+# -
+def mjd_to_iso(mjd=math.nan, sep=' '):
+    """ converts an mjd to YYYY-MM-DD HH:MM:SS.ffffff """
+    return mjd_to_datetime(mjd).isoformat(sep=sep, timespec='microseconds')
+
+
+# +
+# function: jd_to_iso()
+# -
+def jd_to_iso(jd=math.nan, sep='T'):
+    """ converts a jd to YYYY-MM-DDTHH:MM:SS.ffffff """
+    return mjd_to_iso(float(jd) - CNV__JD_OFFSET, sep)
+
+
+# +
+# function: iso_to_mjd_array()
+# -
+def iso_to_mjd_array(values=None):
+    """ vectorized iso_to_mjd() via numpy datetime64, falls back per element """
+    _values = [] if values is None else list(values)
+    _mjd = np.full(len(_values), np.nan)
+    _ok = np.array([isinstance(_v, str) and CNV__ISO_RULE.match(_v) is not None for _v in _values], dtype=bool)
+    if _ok.any():
+        # noinspection PyBroadException
+        try:
+            _dt = np.array([_values[_i].strip().replace(' ', 'T') for _i in np.flatnonzero(_ok)],
+                           dtype='datetime64[us]')
+            _mjd[_ok] = (_dt - np.datetime64(CNV__MJD_EPOCH, 'us')) / np.timedelta64(86400000000, 'us')
+        except Exception:
+            _ok[:] = False
+    for _i in np.flatnonzero(~_ok):
+        _mjd[_i] = iso_to_mjd(_values[_i])
+    return _mjd
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+import mmap
+import os
+import re
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    Reads keywords from the primary header of a FITS file without building an HDU list: the file is
+    memory-mapped and only the 2880-byte header blocks up to the END card are scanned. Values are
+    typed as astropy would (bool, int, float, str) and anything unusual (no SIMPLE card, no END card,
+    long-string CONTINUE values, complex numbers) is handed to astropy.io.fits instead.
+
+    from src.fitsheader import fits_header
+    fits_header('/rts2data/Kuiper/Mont4k/20230418/object/a.fits', ['OBJECT', 'JULIAN'])
+    # {'OBJECT': 'M31', 'JULIAN': 2460053.7}
+
+"""
+
+
+# +
+# constant(s)
+# -
+FITS__BLOCK = 2880
+FITS__CARD = 80
+FITS__END = b'END' + b' ' * (FITS__CARD - 3)
+FITS__FLOAT_RULE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([EeDd][+-]?\d+)?$')
+FITS__INT_RULE = re.compile(r'^[+-]?\d+$')
+
+
+# +
+# function: _value()
+# -
+def _value(card=''):
+    """ returns the typed value of a 'KEYWORD = value / comment' card or raises ValueError """
+    _v = card[10:].lstrip()
+    if _v.startswith("'"):
+        # string: '' is an escaped quote, trailing blanks are not significant
+        _i, _out = 1, []
+        while True:
+            _j = _v.find("'", _i)
+            if _j < 0:
+                raise ValueError(card)
+            _out.append(_v[_i:_j])
+            if _v[_j + 1:_j + 2] == "'":
+                _out.append("'")
+                _i = _j + 2
+                continue
+            break
+        _s = ''.join(_out).rstrip()
+        if _s.endswith('&'):
+            raise ValueError(card)
+        return _s
+    _v = _v.split('/', 1)[0].strip()
+    if _v == 'T':
+        return True
+    if _v == 'F':
+        return False
+    if FITS__INT_RULE.match(_v):
+        return int(_v)
+    if FITS__FLOAT_RULE.match(_v):
+        return float(_v.replace('D', 'E').replace('d', 'e'))
+    raise ValueError(card)
+
+
+# +
+# function: _scan()
+# -
+def _scan(buf=None, keys=None):
+    """ returns {keyword: value} for keys found before END (pages past the header are never touched) """
+    _want, _out = set(keys), {}
+    if buf[:9] != b'SIMPLE  =':
+        raise ValueError('SIMPLE')
+    for _off in range(0, len(buf) - FITS__CARD + 1, FITS__CARD):
+        _card = buf[_off:_off + FITS__CARD]
+        if _card == FITS__END:
+            return _out
+        _key = _card[:8].rstrip().decode('ascii')
+        if _key in _want and _key not in _out and _card[8:10] == b'= ':
+            _out[_key] = _value(_card.decode('ascii'))
+    raise ValueError('END')
+
+
+# +
+# function: _astropy()
+# -
+def _astropy(path='', keys=None):
+    """ astropy fallback for anything the fast path does not handle """
+    from astropy.io import fits
+    _hdr = fits.getheader(path, 0)
+    return {_k: _hdr[_k] for _k in keys if _k in _hdr}
+
+
+# +
+# function: fits_header()
+# -
+# noinspection PyBroadException
+def fits_header(path='', keys=None):
+    """ returns {keyword: value} for the requested keys present in the primary header """
+    _keys = list(keys or [])
+    try:
+        with open(path, 'rb') as _fd:
+            _size = os.fstat(_fd.fileno()).st_size
+            if _size < FITS__BLOCK or _size % FITS__BLOCK:
+                raise ValueError('size')
+            with mmap.mmap(_fd.fileno(), 0, access=mmap.ACCESS_READ) as _mm:
+                return _scan(_mm, _keys)
+    except Exception:
+        return _astropy(path, _keys)
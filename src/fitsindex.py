@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from src import ARTN_DATA_ROOT, ARTN_FITS_HEADERS
+from src.fitsheader import fits_header
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    A persistent index of the ARTN_FITS_HEADERS keywords of every image, keyed by path with the mtime
+    and size seen when the header was read. Scanning only opens files that are new or have changed, so
+    the nightlog and history pages become queries against the index rather than walks of the archive.
+    Directories are walked concurrently (os.scandir, one stat per file) in a thread pool and large
+    batches of headers are read by ORP_FITS_WORKERS (default: cpu count) threads or, for the command
+    line / cron scan only, processes (spawned processes need a __main__ guard and a python executable,
+    neither of which a mod_wsgi request handler can promise).
+
+    from src.fitsindex import FitsIndex
+    _fi = FitsIndex()
+    _fi.scan('/rts2data/Kuiper/Mont4k/20230418')          # {'seen': ..., 'read': ..., 'removed': ...}
+    _fi.scan_many(['/rts2data/.../bias', '/rts2data/.../object'], workers=8)
+    _fi.query('/rts2data/Kuiper/Mont4k/20230418/object', 'stitched')
+    _fi.headers(['/rts2data/Kuiper/Mont4k/20230418/object/a.fits', ...])
+
+    % python3 -m src.fitsindex scan --help
+
+"""
+
+
+# +
+# constant(s)
+# -
+FITS__BATCH = 500
+FITS__COLUMNS = tuple(_h.replace('-', '') for _h in ARTN_FITS_HEADERS)
+FITS__QUOTED = ', '.join(f'"{_c}"' for _c in FITS__COLUMNS)
+FITS__INDEX = os.getenv('ORP_FITS_INDEX', f"{os.getenv('ORP_HOME', '.')}/instance/fits_index.sqlite")
+FITS__INCLUDE = ('all', 'raw', 'stitched', 'unstitched')
+FITS__PARALLEL = 256
+FITS__WORKERS = int(os.getenv('ORP_FITS_WORKERS', os.cpu_count() or 1))
+FITS__COLUMNS_DDL = ',\n    '.join(f'"{_c}" TEXT NOT NULL DEFAULT \'\'' for _c in FITS__COLUMNS)
+FITS__SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS fits_headers (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    file TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    jd REAL,
+    {FITS__COLUMNS_DDL}
+);
+CREATE INDEX IF NOT EXISTS fits_headers_directory ON fits_headers (directory);
+"""
+
+
+# +
+# class: FitsIndex()
+# -
+class FitsIndex(object):
+    """ incremental FITS header index over a SQLite table """
+
+    def __init__(self, path=FITS__INDEX):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.__insert = f"INSERT OR REPLACE INTO fits_headers (path, directory, file, mtime, size, jd, " \
+                        f"{FITS__QUOTED}) VALUES ({', '.join('?' * (6 + len(FITS__COLUMNS)))})"
+        with self.__connect() as _c:
+            _c.execute('PRAGMA journal_mode=WAL')
+            _c.executescript(FITS__SCHEMA)
+
+    @contextmanager
+    def __connect(self):
+        _c = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        _c.row_factory = sqlite3.Row
+        try:
+            yield _c
+        finally:
+            _c.close()
+
+    # +
+    # method: read()
+    # -
+    @staticmethod
+    def read(path=''):
+        """ returns {column: value} for the primary header, missing keywords are '' """
+        _hdr = fits_header(path, ARTN_FITS_HEADERS)
+        return {_c: str(_hdr.get(_h, '')).strip() for _h, _c in zip(ARTN_FITS_HEADERS, FITS__COLUMNS)}
+
+    # +
+    # method: scan()
+    # -
+    def scan(self, root='', workers=FITS__WORKERS, processes=False):
+        """ brings the index for every .fits file below root up to date, returns counts """
+        return self.scan_many([root], workers, processes)
+
+    # +
+    # method: scan_many()
+    # -
+    def scan_many(self, roots=None, workers=FITS__WORKERS, processes=False):
+        """ scan() for several directories at once, walking them concurrently """
+        _roots = [_r for _r in dict.fromkeys(os.path.abspath(os.path.expanduser(f'{_r}')) for _r in (roots or []))
+                  if os.path.isdir(_r)]
+        if not _roots:
+            return {'seen': 0, 'read': 0, 'removed': 0}
+
+        # stat the trees (no file is opened here)
+        _found = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(len(_roots), int(workers)))) as _ex:
+            for _f in _ex.map(_walk, _roots):
+                _found.update(_f)
+
+        # compare with the index
+        _known = {}
+        with self.__connect() as _c:
+            for _root in _roots:
+                _known.update({_r['path']: (_r['mtime'], _r['size']) for _r in _c.execute(
+                    'SELECT path, mtime, size FROM fits_headers WHERE path >= ? AND path < ?', self.__range(_root))})
+        _stale = [(_p, _s) for _p, _s in _found.items() if _known.get(_p) != _s]
+        _gone = [_p for _p in _known if _p not in _found]
+
+        # update
+        self.__update(_stale, _gone, workers, processes)
+        return {'seen': len(_found), 'read': len(_stale), 'removed': len(_gone)}
+
+    # +
+    # method: headers()
+    # -
+    def headers(self, paths=None):
+        """ returns {path: row} for the given files, (re-)reading any that are missing or changed """
+        _paths = list(dict.fromkeys(os.path.abspath(f'{_p}') for _p in (paths or [])))
+        _rows = self.__select(_paths)
+        _stale = []
+        for _p in _paths:
+            # noinspection PyBroadException
+            try:
+                _st = os.stat(_p)
+            except Exception:
+                continue
+            _r = _rows.get(_p)
+            if _r is None or (_r['mtime'], _r['size']) != (_st.st_mtime, _st.st_size):
+                _stale.append((_p, (_st.st_mtime, _st.st_size)))
+        if _stale:
+            self.__update(_stale, [], FITS__WORKERS)
+            _rows.update(self.__select([_p for _p, _ in _stale]))
+        return {_p: _rows[_p] for _p in _paths if _p in _rows}
+
+    # +
+    # method: query()
+    # -
+    def query(self, directory='', include='all'):
+        """ returns [row] for the indexed files below directory ordered by julian date """
+        return list(self.stream(directory, include))
+
+    # +
+    # method: stream()
+    # -
+    def stream(self, directory='', include='all'):
+        """ yields the indexed rows below directory in julian date order """
+        _include = f'{include}'.lower().strip()
+        if _include not in FITS__INCLUDE:
+            return
+        _sql = 'SELECT * FROM fits_headers WHERE path >= ? AND path < ?'
+        if _include == 'stitched':
+            _sql += " AND instr(path, 'stitched') > 0"
+        elif _include in ('raw', 'unstitched'):
+            _sql += " AND instr(path, 'stitched') = 0"
+        _root = os.path.abspath(os.path.expanduser(f'{directory}'))
+        with self.__connect() as _c:
+            for _r in _c.execute(f'{_sql} ORDER BY jd, path', self.__range(_root)):
+                yield self.__row(_r)
+
+    # +
+    # method: __update()
+    # -
+    def __update(self, stale=None, gone=None, workers=1, processes=False):
+        """ reads headers for stale [(path, (mtime, size))], drops gone [path], commits every FITS__BATCH rows """
+        _paths = [_p for _p, _ in stale]
+        _workers = max(1, min(int(workers), len(_paths) // FITS__PARALLEL))
+        if _workers > 1 and processes:
+            # spawn, the parent may be running threads
+            with ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context('spawn')) as _ex:
+                self.__store(stale, _ex.map(_read, _paths, chunksize=max(1, len(_paths) // (_workers * 8))), gone)
+        elif _workers > 1:
+            with ThreadPoolExecutor(max_workers=_workers) as _ex:
+                self.__store(stale, _ex.map(_read, _paths), gone)
+        else:
+            self.__store(stale, map(_read, _paths), gone)
+
+    def __store(self, stale=None, headers=None, gone=None):
+        _values = []
+        for (_p, (_mtime, _size)), _h in zip(stale, headers):
+            try:
+                _jd = float(_h['JULIAN'])
+            except ValueError:
+                _jd = None
+            _values.append((_p, os.path.dirname(_p), os.path.basename(_p), _mtime, _size, _jd,
+                            *[_h[_c] for _c in FITS__COLUMNS]))
+            if len(_values) >= FITS__BATCH:
+                self.__write(_values, [])
+                _values = []
+        self.__write(_values, gone)
+
+    def __write(self, values=None, gone=None):
+        if not values and not gone:
+            return
+        with self.__connect() as _c:
+            _c.execute('BEGIN IMMEDIATE')
+            try:
+                _c.executemany(self.__insert, values)
+                _c.executemany('DELETE FROM fits_headers WHERE path = ?', [(_p,) for _p in gone])
+                _c.execute('COMMIT')
+            except Exception:
+                _c.execute('ROLLBACK')
+                raise
+
+    def __select(self, paths=None):
+        _rows = {}
+        with self.__connect() as _c:
+            for _i in range(0, len(paths), FITS__BATCH):
+                _chunk = paths[_i:_i + FITS__BATCH]
+                for _r in _c.execute(f"SELECT * FROM fits_headers WHERE path IN ({', '.join('?' * len(_chunk))})",
+                                     _chunk):
+                    _rows[_r['path']] = self.__row(_r)
+        return _rows
+
+    @staticmethod
+    def __range(root=''):
+        """ primary key range covering every path below root """
+        return f'{root.rstrip(os.sep)}{os.sep}', f'{root.rstrip(os.sep)}{chr(ord(os.sep) + 1)}'
+
+    @staticmethod
+    def __row(row=None):
+        return {'path': row['path'], 'file': row['file'], 'directory': row['directory'], 'size': row['size'],
+                'mtime': row['mtime'], **{_c: row[_c] for _c in FITS__COLUMNS}}
+
+
+# +
+# function: _read()
+# -
+# noinspection PyBroadException
+def _read(path=''):
+    """ FitsIndex.read() that never raises, module level so a process pool can run it """
+    try:
+        return FitsIndex.read(path)
+    except Exception:
+        return {_c: '' for _c in FITS__COLUMNS}
+
+
+# +
+# function: _walk()
+# -
+def _walk(root=''):
+    """ returns {path: (mtime, size)} for every non-empty .fits file below root, symbolic links are skipped """
+    _found, _stack = {}, [root]
+    while _stack:
+        try:
+            with os.scandir(_stack.pop()) as _it:
+                for _e in _it:
+                    try:
+                        if _e.is_dir(follow_symlinks=False):
+                            _stack.append(_e.path)
+                        elif _e.name.endswith('.fits') and _e.is_file(follow_symlinks=False):
+                            _st = _e.stat(follow_symlinks=False)
+                            if _st.st_size > 2:
+                                _found[_e.path] = (_st.st_mtime, _st.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return _found
+
+
+# +
+# command line wrappers()
+# -
+def _fitsindex_scan(iargs=None):
+    if iargs is not None:
+        _t = time.perf_counter()
+        _r = FitsIndex(path=iargs.database).scan(iargs.path, int(iargs.workers), True)
+        print(f"{json.dumps(_r)} in {time.perf_counter() - _t:.3f}s")
+
+
+def _fitsindex_query(iargs=None):
+    if iargs is not None:
+        _t = time.perf_counter()
+        _r = FitsIndex(path=iargs.database).query(iargs.path, iargs.include)
+        for _e in _r:
+            print(f"{_e['path']} {_e['JULIAN']} {_e['OBJECT']} {_e['FILTER']} {_e['EXPTIME']}")
+        print(f"{len(_r)} row(s) in {1000.0 * (time.perf_counter() - _t):.3f}ms")
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'FITS Header Index', formatter_class=argparse.RawTextHelpFormatter)
+    _sp = _p.add_subparsers()
+
+    # add sub-parser for FitsIndex().scan(root)
+    _sp_0 = _sp.add_parser('scan', description="Index new or changed .fits files below a directory",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_0.add_argument(f'--database', default=FITS__INDEX, help=f"Index database, default=%(default)s")
+    _sp_0.add_argument(f'--path', default=ARTN_DATA_ROOT, help=f"Directory, default=%(default)s")
+    _sp_0.add_argument(f'--workers', default=FITS__WORKERS, help=f"Header reader processes, default=%(default)s")
+    _sp_0.set_defaults(func=_fitsindex_scan)
+
+    # add sub-parser for FitsIndex().query(directory, include)
+    _sp_1 = _sp.add_parser('query', description="List indexed files below a directory",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_1.add_argument(f'--database', default=FITS__INDEX, help=f"Index database, default=%(default)s")
+    _sp_1.add_argument(f'--include', default='all', help=f"One of {FITS__INCLUDE}, default=%(default)s")
+    _sp_1.add_argument(f'--path', default=os.getcwd(), help=f"Directory, default=%(default)s")
+    _sp_1.set_defaults(func=_fitsindex_query)
+
+    # noinspection PyBroadException
+    try:
+        args = _p.parse_args()
+        args.func(args)
+    except Exception:
+        print(f'Use: python3 {sys.argv[0]}\n--help for more information')
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from contextlib import contextmanager
+
+import argparse
+import json
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    A small durable job queue: jobs are rows in a SQLite table and a fixed pool of worker threads
+    runs them, so work survives a worker recycle and can be inspected via /jobs/<id>.
+
+    from src.jobs import JobQueue
+    jobs = JobQueue(context=app.app_context)
+    jobs.register('mail', lambda payload, progress: ...)
+    jobs.start()
+    _id = jobs.submit('mail', {'subject': ...}, username='demo1')
+    jobs.get(_id)
+
+    % python3 -m src.jobs bench --help
+
+"""
+
+
+# +
+# constant(s)
+# -
+JOBS__DB = os.getenv('ORP_JOBS', f"{os.getenv('ORP_HOME', '.')}/instance/jobs.sqlite")
+JOBS__POLL = 5.0
+JOBS__STATES = ('queued', 'running', 'done', 'failed')
+JOBS__WORKERS = int(os.getenv('ORP_JOBS_WORKERS', 2))
+JOBS__SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    username TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress REAL NOT NULL DEFAULT 0.0,
+    message TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+
+# +
+# class: JobBusy()
+# -
+class JobBusy(Exception):
+    """ raised by submit() when a single-flight kind already has a queued or running job """
+    pass
+
+
+# +
+# class: JobQueue()
+# -
+class JobQueue(object):
+    """ bounded worker pool over a durable SQLite job table """
+
+    def __init__(self, path=JOBS__DB, workers=JOBS__WORKERS, context=None, poll=JOBS__POLL):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.workers = max(1, int(workers))
+        self.context = context
+        self.poll = poll
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.__handlers = {}
+        self.__retries = {}
+        self.__recover = {}
+        self.__single = {}
+        self.__pending = queue.Queue()
+        self.__threads = []
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.__connect() as _c:
+            _c.execute('PRAGMA journal_mode=WAL')
+            _c.executescript(JOBS__SCHEMA)
+
+    @contextmanager
+    def __connect(self):
+        _c = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            yield _c
+        finally:
+            _c.close()
+
+    # +
+    # method: register()
+    # -
+    def register(self, kind='', func=None, retries=0, recover=True, single=False):
+        """ registers func(payload, progress) -> result for jobs of this kind, only idempotent work should retry
+            or recover, single allows at most one queued or running job of this kind at a time """
+        self.__handlers[kind] = func
+        self.__retries[kind] = max(0, int(retries))
+        self.__recover[kind] = bool(recover)
+        self.__single[kind] = bool(single)
+        return func
+
+    # +
+    # method: submit()
+    # -
+    def submit(self, kind='', payload=None, username=''):
+        """ records a queued job and returns its id """
+        if kind not in self.__handlers:
+            raise Exception(f'Invalid input, kind={kind}')
+        _id = uuid.uuid4().hex
+        with self.__connect() as _c:
+            _c.execute('BEGIN IMMEDIATE')
+            try:
+                if self.__single.get(kind, False) and _c.execute(
+                        "SELECT 1 FROM jobs WHERE kind = ? AND status IN ('queued', 'running')", (kind,)).fetchone():
+                    raise JobBusy(f'A {kind} job is already queued or running')
+                _c.execute('INSERT INTO jobs (id, kind, username, payload, created) VALUES (?, ?, ?, ?, ?)',
+                           (_id, kind, username, json.dumps(payload if payload is not None else {}), time.time()))
+                _c.execute('COMMIT')
+            except Exception:
+                _c.execute('ROLLBACK')
+                raise
+        self.__pending.put(_id)
+        return _id
+
+    # +
+    # method: get()
+    # -
+    def get(self, job_id='', payload=False):
+        """ returns the job record as a dictionary (or None) """
+        with self.__connect() as _c:
+            _c.row_factory = sqlite3.Row
+            _r = _c.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if _r is None:
+            return None
+        _d = dict(_r)
+        _d['result'] = json.loads(_d['result']) if _d['result'] else None
+        if payload:
+            _d['payload'] = json.loads(_d['payload'])
+        else:
+            _d.pop('payload')
+        return _d
+
+    # +
+    # method: progress()
+    # -
+    def progress(self, job_id='', fraction=0.0, message=''):
+        """ updates a running job's progress (0.0 - 1.0) """
+        with self.__connect() as _c:
+            _c.execute('UPDATE jobs SET progress = ?, message = ? WHERE id = ?',
+                       (max(0.0, min(1.0, float(fraction))), f'{message}', job_id))
+
+    # +
+    # method: start()
+    # -
+    def start(self):
+        """ re-queues work orphaned by dead processes on this host and starts the workers """
+        with self.__lock:
+            if self.__threads:
+                return self
+            self.recover()
+            self.__stop.clear()
+            for _i in range(self.workers):
+                _t = threading.Thread(name=f'jobs_worker_{_i}', target=self.__work, daemon=True)
+                _t.start()
+                self.__threads.append(_t)
+        return self
+
+    # +
+    # method: stop()
+    # -
+    def stop(self, wait=True):
+        """ stops the workers after their current job """
+        self.__stop.set()
+        for _ in self.__threads:
+            self.__pending.put(None)
+        if wait:
+            for _t in self.__threads:
+                _t.join()
+        self.__threads = []
+
+    # +
+    # method: recover()
+    # -
+    def recover(self):
+        """ marks running jobs whose owner process has gone as queued again (or failed, for kinds registered with
+            recover=False), returns their number """
+        _host = socket.gethostname()
+        with self.__connect() as _c:
+            _rows = _c.execute("SELECT id, kind, owner FROM jobs WHERE status = 'running'").fetchall()
+            _orphans = [(_id, _kind) for _id, _kind, _owner in _rows if _owner.startswith(f'{_host}:') and
+                        not _alive(int(_owner.split(':')[-1]))]
+            _c.executemany("UPDATE jobs SET status = 'queued', owner = '' WHERE id = ? AND status = 'running'",
+                           [(_id,) for _id, _kind in _orphans if self.__recover.get(_kind, True)])
+            _c.executemany("UPDATE jobs SET status = 'failed', owner = '', finished = ?, "
+                           "message = 'Abandoned by a stopped worker, not re-run' WHERE id = ? AND status = 'running'",
+                           [(time.time(), _id) for _id, _kind in _orphans if not self.__recover.get(_kind, True)])
+        return len(_orphans)
+
+    # +
+    # method: __claim()
+    # -
+    def __claim(self, job_id=None):
+        """ atomically moves a queued job to running, returns (id, kind, payload, attempts) or None """
+        with self.__connect() as _c:
+            if job_id is None:
+                _r = _c.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if _r is None:
+                    return None
+                job_id = _r[0]
+            _n = _c.execute("UPDATE jobs SET status = 'running', owner = ?, started = ?, attempts = attempts + 1 "
+                            "WHERE id = ? AND status = 'queued'", (self.owner, time.time(), job_id)).rowcount
+            if _n != 1:
+                return None
+            _kind, _payload, _attempts = _c.execute('SELECT kind, payload, attempts FROM jobs WHERE id = ?',
+                                                    (job_id,)).fetchone()
+        return job_id, _kind, json.loads(_payload), _attempts
+
+    # +
+    # method: __finish()
+    # -
+    def __finish(self, job_id='', status='done', result=None, message=''):
+        with self.__connect() as _c:
+            _c.execute('UPDATE jobs SET status = ?, result = ?, message = ?, finished = ?, '
+                       'progress = CASE WHEN ? = \'done\' THEN 1.0 ELSE progress END WHERE id = ?',
+                       (status, json.dumps(result), f'{message}', time.time(), status, job_id))
+
+    # +
+    # method: __work()
+    # -
+    def __work(self):
+        while not self.__stop.is_set():
+
+            # take the next local submission or, when idle, anything left queued in the table
+            try:
+                _next = self.__pending.get(timeout=self.poll)
+                if _next is None:
+                    continue
+                _job = self.__claim(_next)
+            except queue.Empty:
+                _job = self.__claim()
+            except Exception:
+                _job = None
+            if _job is None:
+                continue
+
+            # run it (inside the application context when one is given)
+            _id, _kind, _payload, _attempts = _job
+            # noinspection PyBroadException
+            try:
+                _func = self.__handlers[_kind]
+                _progress = lambda _f, _m='': self.progress(_id, _f, _m)
+                if self.context is not None:
+                    with self.context():
+                        _result = _func(_payload, _progress)
+                else:
+                    _result = _func(_payload, _progress)
+            except Exception as _e:
+                if _attempts <= self.__retries.get(_kind, 0):
+                    with self.__connect() as _c:
+                        _c.execute("UPDATE jobs SET status = 'queued', owner = '', message = ? WHERE id = ?",
+                                   (f'{_e}', _id))
+                else:
+                    self.__finish(_id, 'failed', None, f'{_e}')
+            else:
+                self.__finish(_id, 'done', _result, '')
+
+
+# +
+# function: _alive()
+# -
+def _alive(pid=0):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except Exception:
+        return True
+    return True
+
+
+# +
+# function: jobs_bench()
+# -
+def jobs_bench(njobs=1000, workers=JOBS__WORKERS, work=0.0):
+    """ measures submit rate, queue latency and throughput against a temporary database """
+
+    with tempfile.TemporaryDirectory() as _tmp:
+        _q = JobQueue(path=os.path.join(_tmp, 'jobs.sqlite'), workers=workers, poll=0.1)
+        _q.register('bench', lambda _p, _progress: time.sleep(work) or {'n': _p['n']})
+        _q.start()
+
+        # submit
+        _t0 = time.perf_counter()
+        _ids = [_q.submit('bench', {'n': _i}) for _i in range(njobs)]
+        _t1 = time.perf_counter()
+
+        # wait
+        while True:
+            _jobs = [_q.get(_id) for _id in _ids]
+            if all(_j['status'] in ('done', 'failed') for _j in _jobs):
+                break
+            time.sleep(0.05)
+        _t2 = time.perf_counter()
+        _q.stop()
+
+    # report
+    _wait = sorted(_j['started'] - _j['created'] for _j in _jobs)
+    _total = sorted(_j['finished'] - _j['created'] for _j in _jobs)
+    return {
+        'jobs': njobs, 'workers': workers, 'failed': sum(1 for _j in _jobs if _j['status'] == 'failed'),
+        'submit_per_s': njobs / (_t1 - _t0), 'throughput_per_s': njobs / (_t2 - _t0),
+        'queue_p50_ms': 1000.0 * _wait[len(_wait) // 2], 'queue_p95_ms': 1000.0 * _wait[int(len(_wait) * 0.95)],
+        'total_p50_ms': 1000.0 * _total[len(_total) // 2], 'total_p95_ms': 1000.0 * _total[int(len(_total) * 0.95)]}
+
+
+# +
+# command line wrappers()
+# -
+def _jobs_bench(iargs=None):
+    if iargs is not None:
+        for _k, _v in jobs_bench(int(iargs.jobs), int(iargs.workers), float(iargs.work)).items():
+            print(f'{_k:>18s} = {_v:.3f}' if isinstance(_v, float) else f'{_k:>18s} = {_v}')
+
+
+def _jobs_show(iargs=None):
+    if iargs is not None:
+        print(json.dumps(JobQueue(path=iargs.database, workers=1).get(iargs.id, True), indent=2))
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'Job Queue', formatter_class=argparse.RawTextHelpFormatter)
+    _sp = _p.add_subparsers()
+
+    # add sub-parser for jobs_bench(njobs=1000, workers=JOBS__WORKERS, work=0.0)
+    _sp_0 = _sp.add_parser('bench', description="Measure queue throughput and latency (no network)",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_0.add_argument(f'--jobs', default=1000, help=f"Number of jobs, default=%(default)s")
+    _sp_0.add_argument(f'--workers', default=JOBS__WORKERS, help=f"Number of workers, default=%(default)s")
+    _sp_0.add_argument(f'--work', default=0.0, help=f"Seconds of work per job, default=%(default)s")
+    _sp_0.set_defaults(func=_jobs_bench)
+
+    # add sub-parser for JobQueue().get(id)
+    _sp_1 = _sp.add_parser('show', description="Show a job", formatter_class=argparse.RawTextHelpFormatter)
+    _sp_1.add_argument(f'--database', default=JOBS__DB, help=f"Job database, default=%(default)s")
+    _sp_1.add_argument(f'--id', default='', help=f"Job id")
+    _sp_1.set_defaults(func=_jobs_show)
+
+    # noinspection PyBroadException
+    try:
+        args = _p.parse_args()
+        args.func(args)
+    except Exception:
+        print(f'Use: python3 {sys.argv[0]}\n--help for more information')
@@ -13,15 +13,21 @@ from src.telescopes.vatt import *
 from astropy.time import Time
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from sqlalchemy import not_
+from sqlalchemy import bindparam, cast, column, not_, values
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
 from time import time
 from werkzeug.security import generate_password_hash
 from werkzeug.security import check_password_hash
 
+import base64
+import itertools
 import secrets
 import json
 import jwt
+import threading
+from collections import OrderedDict
 from . import validator
 
 # +
@@ -42,7 +48,17 @@ __doc__ = """
 # constant(s)
 # -
 FALSE_VALUES = ['false', 'f', '0']
+OBSREQ__COUNT_MODES = ('estimate', 'exact', 'none')
+OBSREQ__INSERT_CHUNK = 1000
 TRUE_VALUES = ['true', 't', '1']
+OBSREQ__OWNER_CACHE_SIZE = 65536
+OBSREQ__OWNER_CACHE_TTL = 3600.0
+OBSREQ__STREAM_CHUNK = 1000
+USER__CACHE_SIZE = 1024
+USER__CACHE_TTL = 300.0
+USER__LAST_SEEN_FLUSH = 30.0
+USER__LAST_SEEN_INTERVAL = 60.0
+USER__LAST_SEEN_THRESHOLD = 256
 
 
 # +
@@ -200,8 +216,16 @@ class ObsReq2(UserMixin, db.Model):
     # member variable(s)
     # -
 
-    # define table name
+    # define table name and index(es), see bin/artn.indexes.sh
     __tablename__ = 'obsreq2'
+    __table_args__ = (
+        db.Index('obsreq2_username_idx', 'username', postgresql_ops={'username': 'varchar_pattern_ops'}),
+        db.Index('obsreq2_observation_id_idx', 'observation_id',
+                 postgresql_ops={'observation_id': 'varchar_pattern_ops'}),
+        db.Index('obsreq2_rts2_id_idx', 'rts2_id'),
+        db.Index('obsreq2_queued_completed_idx', 'queued', 'completed', 'queued_iso'),
+        db.Index('obsreq2_begin_end_mjd_idx', 'begin_mjd', 'end_mjd'),
+    )
     _iso = get_iso()
     _mjd = float(iso_to_mjd(_iso))
 
@@ -521,8 +545,10 @@ class ObsReq2(UserMixin, db.Model):
     # +
     # method: serialized()
     # -
-    def serialized(self, queuedonly=False):
-        _exposures = ObsExposure.query.filter_by(obsreqid=self.id).all()
+    def serialized(self, queuedonly=False, _exposures=None):
+
+        if _exposures is None:
+            _exposures = ObsExposure.query.filter_by(obsreqid=self.id).all()
         
         if queuedonly:
             _exposures_serialized = [x.serialized() for x in _exposures if x.queued and not x.completed]
@@ -579,6 +605,10 @@ class ObsReq2(UserMixin, db.Model):
 
         if _exposures == None:
             _exposures = ObsExposure.query.filter_by(obsreqid=self.id, queued=True, completed=False).all()
+        self.rts2_doc = self.stellar_doc(_exposures)
+
+    def stellar_doc(self, _exposures=None):
+        """ returns the rts2_doc for this record and its (queued) exposures, without touching the database """
         thedict = {
             "name"  : self.object_name,
             "ra"    : self.ra_hms,
@@ -593,8 +623,7 @@ class ObsReq2(UserMixin, db.Model):
                 "exptime" : obs.exp_time,
                 "amount"  : obs.num_exp,
             })
-
-        self.rts2_doc = thedict
+        return thedict
     
     
     # +
@@ -607,15 +636,113 @@ class ObsReq2(UserMixin, db.Model):
     # (overload) method: __repr__()
     # -
     def __repr__(self):
-        _s = self.serialized()
-        return f'<ObsReq {_s}>'
+        return f'<ObsReq2 id={self.id}, object_name={self.object_name}, username={self.username}>'
 
     # +
     # (static) method: serialize_list()
     # -
     @staticmethod
-    def serialize_list(s_records):
-        return [_s.serialized() for _s in s_records]
+    def serialize_list(s_records, queuedonly=False):
+        """ serializes a page of records with one IN query for all of their exposures """
+        s_records = list(s_records)
+        _exposures = ObsExposure.serialize_grouped([_s.id for _s in s_records], queuedonly)
+        _results = []
+        for _s in s_records:
+            _d = _s.serialized(queuedonly, _exposures=[])
+            _d['exposures'] = _exposures.get(_s.id, [])
+            _results.append(_d)
+        return _results
+
+    # +
+    # (static) method: serialize_stream()
+    # -
+    @staticmethod
+    def serialize_stream(query=None, queuedonly=False, chunk=OBSREQ__STREAM_CHUNK):
+        """ yields serialize_list() pages of at most chunk records read through a server-side cursor """
+        _rows = iter(query.yield_per(chunk))
+        while True:
+            _page = list(itertools.islice(_rows, chunk))
+            if not _page:
+                return
+            yield ObsReq2.serialize_list(_page, queuedonly)
+
+    # +
+    # (static) method: insert_many()
+    # -
+    @staticmethod
+    def insert_many(records=None, exposures=None, chunk=OBSREQ__INSERT_CHUNK):
+        """ inserts obsreq2 rows (RETURNING id) then their exposures in one transaction, returns (ids, {index: error}) """
+
+        # check input(s)
+        records = list(records) if records is not None else []
+        exposures = list(exposures) if exposures is not None else [None for _ in records]
+        _ids, _errors = [None for _ in records], {}
+        _obsreq, _obsexp = ObsReq2.__table__, ObsExposure.__table__
+
+        # one multi-row insert per statement, ids are matched back on the (unique) observation_id
+        def _insert(_idx):
+            _rows = db.session.execute(_obsreq.insert().values([records[_i] for _i in _idx]).returning(
+                _obsreq.c.id, _obsreq.c.observation_id)).fetchall()
+            _new = {_oid: _id for _id, _oid in _rows}
+            _exps = [dict(exposures[_i], obsreqid=_new[records[_i]['observation_id']]) for _i in _idx if exposures[_i]]
+            if _exps:
+                db.session.execute(_obsexp.insert().values(_exps))
+            for _i in _idx:
+                _ids[_i] = _new[records[_i]['observation_id']]
+
+        # a failing chunk is rolled back to its savepoint and retried row by row
+        try:
+            for _j in range(0, len(records), chunk):
+                _idx = list(range(_j, min(_j + chunk, len(records))))
+                try:
+                    with db.session.begin_nested():
+                        _insert(_idx)
+                except Exception:
+                    for _i in _idx:
+                        try:
+                            with db.session.begin_nested():
+                                _insert([_i])
+                        except Exception as _e:
+                            _errors[_i] = f'{_e}'
+            db.session.commit()
+        except Exception as _e:
+            db.session.rollback()
+            _errors.update({_i: f'{_e}' for _i in range(len(records)) if _ids[_i] is not None})
+            _ids = [None for _ in records]
+
+        # return result
+        return _ids, _errors
+
+    # +
+    # (static) method: update_rts2_docs()
+    # -
+    @staticmethod
+    def update_rts2_docs(records=None, exposures=None, chunk=OBSREQ__INSERT_CHUNK):
+        """ writes stellar_doc() for all records in one UPDATE ... FROM (VALUES ...) per chunk, exposures from
+            ObsExposure.query_grouped(), returns the number of rows; the caller commits """
+        _records = sorted(records if records is not None else [], key=lambda _r: _r.id)
+        exposures = exposures if exposures is not None else {}
+        _table = ObsReq2.__table__
+        _n = 0
+        for _j in range(0, len(_records), chunk):
+            _page = _records[_j:_j + chunk]
+            _docs = [(_r.id, _r.stellar_doc(exposures.get(_r.id, []))) for _r in _page]
+            _values = values(column('id', db.Integer), column('doc', JSONB), name='v').data(_docs)
+            db.session.execute(_table.update().where(_table.c.id == _values.c.id).values(
+                rts2_doc=cast(_values.c.doc, JSONB)))
+            # keep the loaded objects in step without the session issuing its own per-row UPDATE
+            for _r, (_id, _doc) in zip(_page, _docs):
+                set_committed_value(_r, 'rts2_doc', _doc)
+            _n += len(_page)
+        return _n
+
+    # +
+    # (static) method: owner_map()
+    # -
+    @staticmethod
+    def owner_map(observation_ids=None):
+        """ returns {observation_id: username ('' if unknown)}, one exact-match IN query for any cache misses """
+        return _cached_map(owner_cache, ObsReq2.observation_id, ObsReq2.username, observation_ids)
 
 
 # +
@@ -626,8 +753,9 @@ class ObsExposure(UserMixin, db.Model):
     # member variable(s)
     # -
 
-    # define table name
+    # define table name and index(es), see bin/artn.indexes.sh
     __tablename__ = 'obsexposure'
+    __table_args__ = (db.Index('obsexposure_obsreqid_idx', 'obsreqid'),)
     _iso = get_iso()
     _mjd = float(iso_to_mjd(_iso))
 
@@ -712,6 +840,57 @@ class ObsExposure(UserMixin, db.Model):
         }
         return _d
 
+    # +
+    # (static) method: group_by_obsreqid()
+    # -
+    @staticmethod
+    def group_by_obsreqid(exposures=None):
+        """ buckets exposures by obsreqid in one pass, keeping their order """
+        _grouped = {}
+        for _e in (exposures if exposures is not None else []):
+            _grouped.setdefault(_e.obsreqid, []).append(_e)
+        return _grouped
+
+    # +
+    # (static) method: query_grouped()
+    # -
+    @staticmethod
+    def query_grouped(obsreqids=None, *criterion):
+        """ fetches exposures for all obsreqids in one query, grouped by obsreqid """
+        if not obsreqids:
+            return {}
+        return ObsExposure.group_by_obsreqid(
+            ObsExposure.query.filter(ObsExposure.obsreqid.in_(list(obsreqids)), *criterion).order_by(
+                ObsExposure.obsreqid, ObsExposure.id).all())
+
+    # +
+    # (static) method: serialize_grouped()
+    # -
+    @staticmethod
+    def serialize_grouped(obsreqids=None, queuedonly=False):
+        """ serializes exposures for all obsreqids straight from column tuples, grouped by obsreqid """
+        if not obsreqids:
+            return {}
+        _query = db.session.query(
+            ObsExposure.id, ObsExposure.obsreqid, ObsExposure.filter_name, ObsExposure.exp_time,
+            ObsExposure.num_exp, ObsExposure.completed, ObsExposure.queued).filter(
+            ObsExposure.obsreqid.in_(list(obsreqids)))
+        if queuedonly:
+            _query = _query.filter(ObsExposure.queued == True, ObsExposure.completed == False)
+        _grouped = {}
+        for _id, _obsreqid, _filter_name, _exp_time, _num_exp, _completed, _queued in \
+                _query.order_by(ObsExposure.obsreqid, ObsExposure.id):
+            _grouped.setdefault(_obsreqid, []).append({
+                'id': _id,
+                'obsreqid': _obsreqid,
+                'filter_name': _filter_name,
+                'exp_time': _exp_time,
+                'num_exp': _num_exp,
+                'completed': str(_completed),
+                'queued': str(_queued)
+            })
+        return _grouped
+
     @staticmethod
     def ObsExposuresFromPage(form):
         exposures = []
@@ -922,6 +1101,14 @@ class ObsReq(UserMixin, db.Model):
     def serialize_list(s_records):
         return [_s.serialized() for _s in s_records]
 
+    # +
+    # (static) method: object_map()
+    # -
+    @staticmethod
+    def object_map(group_ids=None):
+        """ returns {group_id: object_name ('' if unknown)}, one exact-match IN query for any cache misses """
+        return _cached_map(object_cache, ObsReq.group_id, ObsReq.object_name, group_ids)
+
 
 # +
 # class: User(), inherits from UserMixin, db.Model
@@ -1092,6 +1279,214 @@ class User(UserMixin, db.Model):
     def serialize_list(s_records):
         return [_s.serialized() for _s in s_records]
 
+    # +
+    # (static) method: user_map()
+    # -
+    @staticmethod
+    def user_map(usernames=None, size=16):
+        """ returns {username: (avatar, display name)} for usernames, one query for any cache misses """
+        _usernames = set(_n for _n in (usernames if usernames is not None else []) if _n)
+        _map, _misses = user_cache.get_many(_usernames)
+        if _misses:
+            for _username, _avatar, _firstname, _lastname in db.session.query(
+                    User.username, User.avatar, User.firstname, User.lastname).filter(User.username.in_(_misses)):
+                _map[_username] = (_avatar, f'{_firstname} {_lastname}'.strip())
+                user_cache.put(_username, _map[_username])
+        return {_k: (f'{_v[0]}?d=identicon&s={size}', _v[1]) for _k, _v in _map.items()}
+
+
+# +
+# class: _UserCache()
+# -
+class _UserCache(object):
+    """ process-level LRU with time-to-live, eg username -> (avatar, display name) """
+
+    def __init__(self, maxsize=USER__CACHE_SIZE, ttl=USER__CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_many(self, usernames=None):
+        _hits, _misses, _now = {}, [], time()
+        with self.__lock:
+            for _n in usernames:
+                _entry = self.__entries.get(_n)
+                if _entry is not None and _now - _entry[0] < self.ttl:
+                    self.__entries.move_to_end(_n)
+                    _hits[_n] = _entry[1]
+                else:
+                    _misses.append(_n)
+        return _hits, _misses
+
+    def put(self, username='', value=None):
+        with self.__lock:
+            self.__entries[username] = (time(), value)
+            self.__entries.move_to_end(username)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, username=None):
+        with self.__lock:
+            if username is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(username, None)
+
+
+user_cache = _UserCache()
+owner_cache = _UserCache(OBSREQ__OWNER_CACHE_SIZE, OBSREQ__OWNER_CACHE_TTL)
+object_cache = _UserCache(OBSREQ__OWNER_CACHE_SIZE, OBSREQ__OWNER_CACHE_TTL)
+
+
+# +
+# function: _cached_map()
+# -
+def _cached_map(cache=None, key=None, value=None, keys=None, chunk=OBSREQ__INSERT_CHUNK):
+    """ returns {key: value} via cache, querying misses with key IN (...) on a unique (indexed) column """
+    _map, _misses = cache.get_many(set(f'{_k}'.strip() for _k in (keys if keys is not None else []) if f'{_k}'.strip()))
+    for _j in range(0, len(_misses), chunk):
+        _chunk = _misses[_j:_j + chunk]
+        _found = dict(db.session.query(key, value).filter(key.in_(_chunk)).all())
+        for _k in _chunk:
+            _map[_k] = _found.get(_k) or ''
+            cache.put(_k, _map[_k])
+    return _map
+
+
+# +
+# class: _LastSeenWriter()
+# -
+class _LastSeenWriter(object):
+    """ coalesces user last_seen updates in memory and writes them in bulk """
+
+    def __init__(self, interval=USER__LAST_SEEN_INTERVAL, flush_every=USER__LAST_SEEN_FLUSH,
+                 threshold=USER__LAST_SEEN_THRESHOLD):
+        self.interval = interval
+        self.flush_every = flush_every
+        self.threshold = threshold
+        self.__pending = {}
+        self.__written = {}
+        self.__flushed = time()
+        self.__lock = threading.Lock()
+
+    def record(self, user_id=None, when=None):
+        """ notes a visit, returns True when the caller should flush() """
+        _now = time()
+        _when = when if isinstance(when, datetime) else datetime.now(ARTN_TIMEZONE).replace(tzinfo=None)
+        with self.__lock:
+            if _now - self.__written.get(user_id, 0.0) >= self.interval:
+                self.__pending[user_id] = _when
+            return len(self.__pending) >= self.threshold or \
+                (len(self.__pending) > 0 and _now - self.__flushed >= self.flush_every)
+
+    def flush(self):
+        """ writes all pending last_seen values in one executemany, returns the number of rows """
+        _now = time()
+        with self.__lock:
+            _pending, self.__pending, self.__flushed = self.__pending, {}, _now
+            for _id in _pending:
+                self.__written[_id] = _now
+        if not _pending:
+            return 0
+
+        # same (local, naive) timestamp semantics as get_iso()/iso_to_mjd() without astropy
+        _rows = [{'_id': _id, '_iso': _when.isoformat()[:26], '_mjd': last_seen_mjd(_when)}
+                 for _id, _when in _pending.items()]
+        _table = User.__table__
+        # noinspection PyBroadException
+        try:
+            db.session.execute(_table.update().where(_table.c.id == bindparam('_id')).values(
+                last_seen_iso=bindparam('_iso'), last_seen_mjd=bindparam('_mjd')), _rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self.__lock:
+                for _id, _when in _pending.items():
+                    self.__pending.setdefault(_id, _when)
+                    self.__written.pop(_id, None)
+            raise
+        return len(_rows)
+
+
+# +
+# function: last_seen_mjd()
+# -
+def last_seen_mjd(when=None):
+    """ returns the MJD of a naive datetime as iso_to_mjd() would """
+    return float(ARTN_MJD_FORMAT.format((when - datetime(1858, 11, 17)).total_seconds() / 86400.0))
+
+
+last_seen_writer = _LastSeenWriter()
+
+
+# +
+# function: keyset_cursor()
+# -
+def keyset_cursor(last_id=None):
+    """ returns the opaque cursor for the rows after last_id """
+    return base64.urlsafe_b64encode(json.dumps({'id': int(last_id)}).encode()).decode().rstrip('=')
+
+
+# +
+# function: keyset_id()
+# -
+# noinspection PyBroadException
+def keyset_id(cursor=''):
+    """ returns the id inside an opaque cursor, None for '' (the first page), ValueError if it is not one """
+    _cursor = f'{cursor}'.strip()
+    if _cursor == '':
+        return None
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(_cursor + '=' * (-len(_cursor) % 4)))['id'])
+    except Exception:
+        raise ValueError(f'Invalid input, cursor={cursor}')
+
+
+# +
+# function: keyset_page()
+# -
+def keyset_page(query=None, column=None, cursor='', per_page=ARTN_RESULTS_PER_PAGE, descending=True):
+    """ returns (rows, next cursor or '') seeking on column < (or >) the cursor id rather than OFFSET """
+    _id = keyset_id(cursor)
+    if _id is not None:
+        query = query.filter(column < _id if descending else column > _id)
+    query = query.order_by(None).order_by(column.desc() if descending else column.asc())
+    _rows = query.limit(per_page + 1).all()
+    if len(_rows) <= per_page:
+        return _rows, ''
+    return _rows[:per_page], keyset_cursor(getattr(_rows[per_page - 1], column.key))
+
+
+# +
+# function: query_count()
+# -
+def query_count(query=None, mode='estimate'):
+    """ returns (count, exact) via COUNT(*) ('exact'), the planner's row estimate ('estimate') or (-1, False),
+        ValueError for any other mode """
+    if mode not in OBSREQ__COUNT_MODES:
+        raise ValueError(f'Invalid input, count={mode}')
+    if mode == 'none':
+        return -1, False
+    query = query.order_by(None)
+    if mode == 'exact':
+        return query.count(), True
+
+    # unfiltered this is pg_class.reltuples, filtered it uses the column statistics (no rows are read)
+    _conn = db.session.connection()
+    _sql = query.statement.compile(dialect=_conn.dialect)
+    _plan = _conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {_sql}', _sql.params).scalar()
+    _plan = json.loads(_plan) if isinstance(_plan, str) else _plan
+    return int(_plan[0]['Plan']['Plan Rows']), False
+
+
+# +
+# function: like_prefix()
+# -
+def like_prefix(value=''):
+    """ returns value as a LIKE prefix pattern (escape='\\'), which a (varchar_pattern_ops) b-tree index can use """
+    return f"{value}".replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
 
 # +
 # function: obsreq_filters()
@@ -1114,6 +1509,14 @@ def obsreq2_filters(query, request_args):
     if request_args.get('username'):
         query = query.filter(ObsReq2.username.ilike(f"%{request_args['username']}%"))
 
+    # obsreq records with username = value (API: ?username__eq=demo)
+    if request_args.get('username__eq'):
+        query = query.filter(ObsReq2.username == request_args['username__eq'])
+
+    # obsreq records with username starting with value (API: ?username__prefix=dem)
+    if request_args.get('username__prefix'):
+        query = query.filter(ObsReq2.username.like(like_prefix(request_args['username__prefix']), escape='\\'))
+
     # obsreq records with username not like value (API: ?exclude_username=demo)
     if request_args.get('exclude_username'):
         query = query.filter(not_(ObsReq2.username.ilike(f"%{request_args['exclude_username']}%")))
@@ -1148,6 +1551,14 @@ def obsreq2_filters(query, request_args):
     if request_args.get('observation_id'):
         query = query.filter(ObsReq2.observation_id.ilike(f"%{request_args['observation_id']}%"))
 
+    # obsreq records with observation_id = value (API: ?observation_id__eq=abcd)
+    if request_args.get('observation_id__eq'):
+        query = query.filter(ObsReq2.observation_id == request_args['observation_id__eq'])
+
+    # obsreq records with observation_id starting with value (API: ?observation_id__prefix=abc)
+    if request_args.get('observation_id__prefix'):
+        query = query.filter(ObsReq2.observation_id.like(like_prefix(request_args['observation_id__prefix']), escape='\\'))
+
     # obsreq records with priority like value (API: ?priority=Routine)
     if request_args.get('priority'):
         query = query.filter(ObsReq2.priority.ilike(f"%{request_args['priority']}%"))
@@ -1164,6 +1575,14 @@ def obsreq2_filters(query, request_args):
     if request_args.get('object_name'):
         query = query.filter(ObsReq2.object_name.ilike(f"%{request_args['object_name']}%"))
 
+    # obsreq records with object_name = value (API: ?object_name__eq=abcd)
+    if request_args.get('object_name__eq'):
+        query = query.filter(ObsReq2.object_name == request_args['object_name__eq'])
+
+    # obsreq records with object_name starting with value (API: ?object_name__prefix=abc)
+    if request_args.get('object_name__prefix'):
+        query = query.filter(ObsReq2.object_name.like(like_prefix(request_args['object_name__prefix']), escape='\\'))
+
     # obsreq records with ra_hms like value (API: ?ra_hms=12:12:12)
     if request_args.get('ra_hms'):
         query = query.filter(ObsReq2.ra_hms.ilike(f"%{request_args['ra_hms']}%"))
@@ -1295,10 +1714,26 @@ def obsreq2_filters(query, request_args):
     if request_args.get('telescope'):
         query = query.filter(ObsReq2.telescope.ilike(f"%{request_args['telescope']}%"))
 
+    # obsreq records with telescope = value (API: ?telescope__eq=Kuiper)
+    if request_args.get('telescope__eq'):
+        query = query.filter(ObsReq2.telescope == request_args['telescope__eq'])
+
+    # obsreq records with telescope starting with value (API: ?telescope__prefix=Kuipe)
+    if request_args.get('telescope__prefix'):
+        query = query.filter(ObsReq2.telescope.like(like_prefix(request_args['telescope__prefix']), escape='\\'))
+
     # obsreq records with instrument like value (API: ?instrument=Mont4k)
     if request_args.get('instrument'):
         query = query.filter(ObsReq2.instrument.ilike(f"%{request_args['instrument']}%"))
 
+    # obsreq records with instrument = value (API: ?instrument__eq=Mont4k)
+    if request_args.get('instrument__eq'):
+        query = query.filter(ObsReq2.instrument == request_args['instrument__eq'])
+
+    # obsreq records with instrument starting with value (API: ?instrument__prefix=Mont4)
+    if request_args.get('instrument__prefix'):
+        query = query.filter(ObsReq2.instrument.like(like_prefix(request_args['instrument__prefix']), escape='\\'))
+
     # obsreq records with queued = boolean (API: ?queued=True)
     if request_args.get('queued'):
         query = query.filter(ObsReq2.queued == request_args.get('queued').lower() in TRUE_VALUES)
@@ -1311,6 +1746,10 @@ def obsreq2_filters(query, request_args):
     if request_args.get('rts2_doc__key'):
         query = query.filter(ObsReq2.rts2_doc[f"{request_args['rts2_doc__key']}"].astext != '')
 
+    # obsreq records with rts2_id = value (API: ?rts2_id=20)
+    if request_args.get('rts2_id'):
+        query = query.filter(ObsReq2.rts2_id == int(request_args['rts2_id']))
+
     # obsreq records with rts2_id <= value (API: ?rts2_id__lte=20)
     if request_args.get('rts2_id__lte'):
         query = query.filter(ObsReq2.rts2_id <= int(request_args['rts2_id__lte']))
@@ -1362,6 +1801,14 @@ def obsreq_filters(query, request_args):
     if request_args.get('username'):
         query = query.filter(ObsReq.username.ilike(f"%{request_args['username']}%"))
 
+    # obsreq records with username = value (API: ?username__eq=demo)
+    if request_args.get('username__eq'):
+        query = query.filter(ObsReq.username == request_args['username__eq'])
+
+    # obsreq records with username starting with value (API: ?username__prefix=dem)
+    if request_args.get('username__prefix'):
+        query = query.filter(ObsReq.username.like(like_prefix(request_args['username__prefix']), escape='\\'))
+
     # obsreq records with username not like value (API: ?exclude_username=demo)
     if request_args.get('exclude_username'):
         query = query.filter(not_(ObsReq.username.ilike(f"%{request_args['exclude_username']}%")))
@@ -1392,10 +1839,26 @@ def obsreq_filters(query, request_args):
     if request_args.get('group_id'):
         query = query.filter(ObsReq.group_id.ilike(f"%{request_args['group_id']}%"))
 
+    # obsreq records with group_id = value (API: ?group_id__eq=abcd)
+    if request_args.get('group_id__eq'):
+        query = query.filter(ObsReq.group_id == request_args['group_id__eq'])
+
+    # obsreq records with group_id starting with value (API: ?group_id__prefix=abc)
+    if request_args.get('group_id__prefix'):
+        query = query.filter(ObsReq.group_id.like(like_prefix(request_args['group_id__prefix']), escape='\\'))
+
     # obsreq records with observation_id like value (API: ?observation_id=abcd)
     if request_args.get('observation_id'):
         query = query.filter(ObsReq.observation_id.ilike(f"%{request_args['observation_id']}%"))
 
+    # obsreq records with observation_id = value (API: ?observation_id__eq=abcd)
+    if request_args.get('observation_id__eq'):
+        query = query.filter(ObsReq.observation_id == request_args['observation_id__eq'])
+
+    # obsreq records with observation_id starting with value (API: ?observation_id__prefix=abc)
+    if request_args.get('observation_id__prefix'):
+        query = query.filter(ObsReq.observation_id.like(like_prefix(request_args['observation_id__prefix']), escape='\\'))
+
     # obsreq records with priority like value (API: ?priority=Routine)
     if request_args.get('priority'):
         query = query.filter(ObsReq.priority.ilike(f"%{request_args['priority']}%"))
@@ -1412,6 +1875,14 @@ def obsreq_filters(query, request_args):
     if request_args.get('object_name'):
         query = query.filter(ObsReq.object_name.ilike(f"%{request_args['object_name']}%"))
 
+    # obsreq records with object_name = value (API: ?object_name__eq=abcd)
+    if request_args.get('object_name__eq'):
+        query = query.filter(ObsReq.object_name == request_args['object_name__eq'])
+
+    # obsreq records with object_name starting with value (API: ?object_name__prefix=abc)
+    if request_args.get('object_name__prefix'):
+        query = query.filter(ObsReq.object_name.like(like_prefix(request_args['object_name__prefix']), escape='\\'))
+
     # obsreq records with ra_hms like value (API: ?ra_hms=12:12:12)
     if request_args.get('ra_hms'):
         query = query.filter(ObsReq.ra_hms.ilike(f"%{request_args['ra_hms']}%"))
@@ -1619,10 +2090,26 @@ def user_filters(query, request_args=None):
     if request_args.get('username'):
         query = query.filter(User.username.ilike(f"%{request_args['username']}%"))
 
+    # user records with username = value (API: ?username__eq=demo)
+    if request_args.get('username__eq'):
+        query = query.filter(User.username == request_args['username__eq'])
+
+    # user records with username starting with value (API: ?username__prefix=dem)
+    if request_args.get('username__prefix'):
+        query = query.filter(User.username.like(like_prefix(request_args['username__prefix']), escape='\\'))
+
     # user records with email like value (API: ?email=demo@example.com)
     if request_args.get('email'):
         query = query.filter(User.email.ilike(f"%{request_args['email']}%"))
 
+    # user records with email = value (API: ?email__eq=demo@example.com)
+    if request_args.get('email__eq'):
+        query = query.filter(User.email == request_args['email__eq'])
+
+    # user records with email starting with value (API: ?email__prefix=demo@example.co)
+    if request_args.get('email__prefix'):
+        query = query.filter(User.email.like(like_prefix(request_args['email__prefix']), escape='\\'))
+
     # user records with affiliation like value (API: ?affiliation='Example Inc')
     if request_args.get('affiliation'):
         query = query.filter(User.affiliation.ilike(f"%{request_args['affiliation']}%"))
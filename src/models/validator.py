@@ -5,6 +5,7 @@
 # import(s)
 # -
 from src import *
+from src.convert import deg_to_dms, deg_to_hms, dms_to_deg, hms_to_deg
 from astropy.coordinates import Angle
 from astropy.coordinates import SkyCoord
 from astropy.time import Time
@@ -26,7 +27,6 @@ import re
 # +
 # function: ra_to_decimal()
 # -
-# noinspection PyBroadException
 def _ra_to_decimal(_ra=''):
 
     # check input(s)
@@ -34,12 +34,8 @@ def _ra_to_decimal(_ra=''):
         return None
 
     # convert
-    try:
-        if 'hours' not in _ra.lower():
-            _ra = f'{_ra} hours'
-        return float(Angle(_ra).degree)
-    except Exception:
-        return None
+    _deg = hms_to_deg(_ra)
+    return None if math.isnan(_deg) else _deg
 
 
 # +
@@ -49,9 +45,8 @@ def _ra_to_decimal(_ra=''):
 def _ra_to_hms(ra=math.nan):
     """ return RA from decimal to H:M:S """
     try:
-        _c = Angle(ra, unit=u.degree).hms
-        _h, _m, _s = int(_c.h), int(_c.m), _c.s
-        return f'{_h:02d}:{_m:02d}:{_s:06.3f}'
+        _h, _m, _s = deg_to_hms(ra)
+        return f'{int(_h):02d}:{int(_m):02d}:{_s:06.3f}'
     except:
         return None
 
@@ -59,7 +54,6 @@ def _ra_to_hms(ra=math.nan):
 # +
 # function: dec_to_decimal()
 # -
-# noinspection PyBroadException
 def _dec_to_decimal(_dec=''):
 
     # check input(s)
@@ -67,12 +61,8 @@ def _dec_to_decimal(_dec=''):
         return None
 
     # convert
-    try:
-        if 'degrees' not in _dec.lower():
-            _dec = f'{_dec} degrees'
-        return float(Angle(_dec).degree)
-    except Exception:
-        return None
+    _deg = dms_to_deg(_dec)
+    return None if math.isnan(_deg) else _deg
 
 
 # +
@@ -82,10 +72,9 @@ def _dec_to_decimal(_dec=''):
 def _dec_to_dms(dec=math.nan):
     """ return Dec from decimal to d:m:s """
     try:
-        _c = Angle(dec, unit=u.degree).signed_dms
-        _d, _m, _s = int(_c.d), int(_c.m), _c.s
-        _sign = '+' if _c.sign == 1.0 else '-'
-        return f'{_sign}{_d:02d}:{_m:02d}:{_s:06.3f}'
+        _c, _d, _m, _s = deg_to_dms(dec)
+        _sign = '+' if _c == 1.0 else '-'
+        return f'{_sign}{int(_d):02d}:{int(_m):02d}:{_s:06.3f}'
     except:
         return None
 
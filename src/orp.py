@@ -4,10 +4,10 @@
 # +
 # import(s)
 # -
-from astropy.io import fits
-from flask import Flask, jsonify, copy_current_request_context, request, \
+from flask import Flask, jsonify, request, \
     render_template, redirect, send_from_directory, url_for, make_response, \
-    jsonify, Response
+    jsonify, Response, has_request_context, stream_with_context
+from flask.json import dumps as flask_dumps
 from flask_bootstrap import Bootstrap
 from flask_mail import Mail, Message
 from flask_login import LoginManager, current_user, login_user, login_required, logout_user
@@ -15,7 +15,6 @@ from flask_paginate import Pagination, get_page_args
 from operator import itemgetter, attrgetter
 from hashlib import md5
 from src.orp_history import *
-from threading import Thread
 from urllib.parse import urlencode
 from werkzeug.urls import url_parse
 from werkzeug.utils import secure_filename
@@ -23,17 +22,24 @@ from src.forms.Forms import ConfirmDeleteForm, ConfirmRegistrationForm, Feedback
     LoginForm, OldUserHistoryForm, NightLogForm, OldNightLogForm, ObsReqForm, ProfileForm, \
     RegistrationForm, ResetPasswordForm, ResetPasswordRequestForm, UpdateObsReqForm, UploadJSONForm, UploadTSVForm, \
     UserHistoryForm, OBSERVATION_TYPES
-from src.models.Models import db, obsreq_filters, ObsReq, User, user_filters
+from src.upload import UPL__SYNC, upload_batches, upload_check, upload_header
+from src.fitsheader import fits_header
+from src.fitsindex import FITS__COLUMNS, FitsIndex
+from src.jobs import JobBusy, JobQueue
+from src.rts2state import Rts2State
+from src.models.Models import db, last_seen_writer, obsreq_filters, ObsReq, User, user_cache, user_filters
 from src.models.Models import obsreq2_filters, ObsReq2, ObsExposure, NightlyQueue, NightlyQueueExposure
+from src.models.Models import keyset_page, query_count
 from src.telescopes.factory import *
 from src.telescopes.bok import *
 from src.telescopes.kuiper import *
 from src.telescopes.vatt import *
 from src.telescopes.artn_scheduler import *
-from rts2solib import rts2comm
+from src.telescopes.rts2 import rts2comm
 
 from src import *
 
+import atexit
 import csv
 import glob
 import itertools
@@ -129,6 +135,39 @@ mail = Mail(app)
 from . import api
 
 
+# +
+# initialize job queue (workers start in start_workers(), not on import)
+# -
+jobs = JobQueue(context=app.app_context)
+
+
+# +
+# initialize fits header index (nightlog, history)
+# -
+fits_index = FitsIndex()
+
+
+# +
+# function: rts2_fetch()
+# -
+def rts2_fetch(_telescope='Kuiper'):
+    """ reads the plan / target state and queue from RTS2, only ever called by rts2_state """
+    _sel = rts2comm()._getall()['SEL']['d']
+    _current = _sel['current_target'][1]
+    return {
+        'executed_ids': [_x for _x in _sel['plan_executed_ids'][1] if _x != _current],
+        'current_id': _current,
+        'plan_ids': list(_sel['plan_ids'][1]),
+        'queue_ids': [_x.id for _x in getCurrentQueue(telescope=_telescope)]
+    }
+
+
+# +
+# initialize rts2 state snapshot (one leased poller across all workers, started in start_workers())
+# -
+rts2_state = Rts2State(fetch=rts2_fetch)
+
+
 def create_gmail(subject='', sender='', recipients=None, text_body='', html_body=''):
     if not isinstance(subject, str) or subject.strip() == '':
         raise Exception(f'Invalid input, subject={subject}')
@@ -144,13 +183,18 @@ def create_gmail(subject='', sender='', recipients=None, text_body='', html_body
 
 
 def send_gmail_async(_msg=None):
-    @copy_current_request_context
-    def send_gmail_in_thread(_msg):
-        mail.send(_msg)
-
     if _msg is not None:
-        logger.info(f'Calling asynchronous mail.send()')
-        Thread(name='gmail_send_async', target=send_gmail_in_thread, args=(_msg,)).start()
+        logger.info(f'Queueing asynchronous mail.send()')
+        return jobs.submit('mail', {'subject': _msg.subject, 'sender': _msg.sender, 'recipients': list(_msg.recipients),
+                                    'text_body': _msg.body, 'html_body': _msg.html})
+
+
+def send_gmail_job(_payload=None, _progress=None):
+    mail.send(create_gmail(**_payload))
+    return {'recipients': _payload['recipients']}
+
+
+jobs.register('mail', send_gmail_job, retries=2)
 
 
 def send_gmail(_msg=None):
@@ -189,10 +233,35 @@ def request_wants_json():
         return best == 'application/json' and request.accept_mimetypes[best] > request.accept_mimetypes['text/html']
 
 
+def obsreq2_page(_query=None, _args=None):
+    """ returns (response, page) for a filtered ObsReq2 query, keyset pages for ?cursor= (id sort) else OFFSET pages """
+    _sf, _so = _args.get('sort_field') or 'id', _args.get('sort_order') or 'descending'
+    if 'cursor' in _args and _sf == 'id':
+        _cursor = _args.get('cursor', '').strip()
+        _rows, _next = keyset_page(_query, ObsReq2.id, _cursor, ARTN_RESULTS_PER_PAGE, _so.lower() == 'descending')
+        _total, _exact = query_count(_query, _args.get('count', 'estimate').strip().lower())
+        return {
+            'total': _total,
+            'exact': _exact,
+            'next': _next,
+            'has_next': _next != '',
+            'has_prev': _cursor != '',
+            'results': ObsReq2.serialize_list(_rows)
+        }, 0
+    _paginator = _query.paginate(_args.get('page', 1, type=int), ARTN_RESULTS_PER_PAGE, True)
+    return {
+        'total': _paginator.total,
+        'pages': _paginator.pages,
+        'has_next': _paginator.has_next,
+        'has_prev': _paginator.has_prev,
+        'results': ObsReq2.serialize_list(_paginator.items)
+    }, _paginator.page
+
+
 def msg_out(_text='', _logger_msg=True, _flash_msg=True):
     if _logger_msg:
         logger.debug(_text)
-    if _flash_msg:
+    if _flash_msg and has_request_context():
         flash(_text)
 
 
@@ -210,188 +279,95 @@ def get_client_ip(_request=None):
 # check TSV is valid
 # -
 def check_upload_format(_infil=''):
+    """ validates a CSV/TSV upload in one streaming pass, returns (number of valid rows, {line: error}) or (-1, {}) """
+
     # check input(s)
     if not isinstance(_infil, str) or _infil.strip() == '':
         msg_out(f'ERROR: Invalid argument, infil={_infil}', True, True)
         return -1, {}
     msg_out(f"check_upload_format> entry, _infil={_infil}", True, False)
 
-    # does infil file exist?
-    _file = os.path.abspath(os.path.expanduser(_infil))
-    if not os.path.isfile(_file):
-        msg_out(f'ERROR: File not found, _file={_file}', True, True)
-        return -1, {}
-    msg_out(f"check_upload_format> found _file={_file}", True, False)
-
-    # get number of lines in file
-    _num = 0
-    with open(_file, 'r') as _fd:
-        _num = sum(1 for _l in _fd if (_l.strip() != '' and _l.strip()[0] not in r'#%!<>+\/'))
-    msg_out(f"check_upload_format> file {_file} has {_num} non-comment entries", True, False)
-
-    # check file type is supported
-    _delimiter = ''
-    if _file.lower().endswith('csv'):
-        _delimiter = ','
-        msg_out(f"check_upload_format> file {_file} has {_num} non-comment entries in CSV format", True, False)
-    elif _file.lower().endswith('tsv'):
-        _delimiter = '\t'
-        msg_out(f"check_upload_format> file {_file} has {_num} non-comment entries in TSV format", True, False)
-    else:
-        msg_out(f'ERROR: Unsupported file type (not .csv, .tsv)', True, True)
-        return -1, {}
-
-    # read the file, expect columns:
-    #   v1: username, telescope, instrument, object_name, ra, dec, filter, exp_time, num_exp, airmass, lunarphase,
-    #   priority, photometric, guiding, non_sidereal, begin, end, binning, dither, cadence
-    #   v2: username, telescope, instrument, object_name, ra, dec, filter, exp_time, num_exp, airmass, lunarphase,
-    #   priority, photometric, guiding, non_sidereal, begin, end, binning, dither, cadence, non_sidereal_json
-    _columns = {}
-    with open(_file, 'r') as _fd:
-        _r = csv.reader(_fd, delimiter=_delimiter)
-        _headers = next(_r, None)
-        # separate header line into column headings
-        for _h in _headers:
-            _columns[_h] = []
-        # read rest of file into lists associated with each column heading
-        for _row in _r:
-            # ignore comment rows
-            if _row[0][0] != '' and _row[0][0] in r'#%!<>+\/':
-                continue
-            # load valid rows
-            for _h, _v in zip(_headers, _row):
-                _columns[_h].append(_v.strip())
-
-    # sanity check
-    if len(_columns)*_num != sum([len(_v) for _v in _columns.values()]):
-        msg_out(f'ERROR: Irregular number of elements in {_file}, please check {_file}', True, True)
+    # validate header and row(s)
+    try:
+        _num, _version, _errors = upload_check(_infil)
+    except Exception as _e:
+        msg_out(f'ERROR: {_e}, please check {_infil}', True, True)
         return -1, {}
-    msg_out(f"check_upload_format> file {_file} has passed the sanity check", True, False)
-
-    # change the dictionary keys to remove unwanted characters
-    for _k in list(_columns.keys()):
-        _columns[_k.translate({ord(i): None for i in ' !@#$'})] = _columns.pop(_k)
-
-    # check V2 headers and JSON
-    if all(_k in _columns for _k in ARTN_ALLOWED_HEADERS_V2):
-        msg_out(f"check_upload_format> File {_file} supports V2 format (non-sidereal enabled)", True, False)
-        msg_out(f"check_upload_format> _num={_num}, _columns={_columns}", True, False)
+    msg_out(f"check_upload_format> file {_infil} is V{_version} with {_num} valid and {len(_errors)} invalid "
+            f"row(s)", True, False)
+    for _line in sorted(_errors):
+        msg_out(f"check_upload_format> line {_line}: {_errors[_line]}", True, False)
 
-    # check V1 headers and JSON
-    elif all(_k in _columns for _k in ARTN_ALLOWED_HEADERS_V1):
-        msg_out(f"check_upload_format> File {_file} supports V1 format (non-sidereal disabled)", True, False)
-        msg_out(f"check_upload_format> _num={_num}, _columns={_columns}", True, False)
-        return _num, _columns
+    # return
+    return _num, _errors
 
-    # invalid headers
-    else:
-        msg_out(f'ERROR: Failed to get all allowed headers, please check {_file}', True, True)
-        return -1, {}
 
-    # check the json
-    if 'non_sidereal_json' in _columns:
-        _nsj = _columns['non_sidereal_json']
-        msg_out(f'_nsj = {_nsj}', True, False)
+def upload_file_async(_pathname='', _user=None):
+    if _pathname and _user is not None:
+        return jobs.submit('upload', {'pathname': _pathname, 'user_id': _user.id}, _user.username)
 
-        for _e in _nsj:
-            _e = _e.replace("'", "")
-            msg_out(f'checking for valid JSON in {_nsj}', True, False)
-            if "{}" in _e:
-                continue
-            else:
-                if not check_json(f"{_e}",  True):
-                    msg_out(f'ERROR: Failed to validate JSON, please check {_file}', True, True)
-                    return -1, {}
-                else:
-                    msg_out(f'JSON is validated in {_nsj}', True, False)
 
-    # return
-    return _num, _columns
+# +
+# function: upload_start()
+# -
+def upload_start(_pathname='', _user=None):
+    """ reads at most UPL__SYNC valid rows: a file with fewer is loaded from that same pass and (result, None)
+        returned, a larger one becomes an upload job and (None, job id) is returned; raises for an invalid header """
+    upload_header(_pathname)
+    _batches = upload_batches(_pathname, UPL__SYNC)
+    try:
+        _first = next(_batches, None)
+        if _first is None or len(_first[0]['line']) < UPL__SYNC:
+            return upload_file(_pathname, _user, [_first] if _first is not None else []), None
+    finally:
+        _batches.close()
+    return None, upload_file_async(_pathname, _user)
 
+# +
+# function: upload_validate()
+# -
+def upload_validate(_columns=None, _user=None):
+    """ checks one batch from upload_batches(), returns (obsreq2 records, obsexposure records, lines, {line: error}) """
 
-def upload_file_async(_columns=None, _num=0, _user=None):
-    @copy_current_request_context
-    def upload_file_in_thread(_columns, _num, _user):
-        upload_file(_columns, _num, _user)
+    # check input(s)
+    _records, _exposures, _lines, _errors = [], [], [], {}
+    _num = len(_columns['line'])
+    if _user is None:
+        return _records, _exposures, _lines, {int(_l): 'no authorization to create an ObsReq2()' for _l in _columns['line']}
 
-    if _columns is not None:
-        Thread(name='upload_file_async', target=upload_file_in_thread, args=(_columns, _num, _user,)).start()
+    # set default(s)
+    _iso = get_iso()
+    _mjd = float(iso_to_mjd(_iso))
+    _pi = f'{_user.firstname} {_user.lastname}, {_user.affiliation}'
 
-# +
-# since the introduction of ObsReq2, this is broken??!!!
-# fixed: pnd, 20230418
-# -
-def upload_file(_columns=None, _num=0, _user=None):
-    for _i in range(0, _num):
-        msg_out(f"upload_file> creating observation request {_columns['object_name'][_i]} for "
-                f"{_columns['username'][_i]}", True, False)
+    for _i in range(_num):
 
         # get data
+        _line = int(_columns['line'][_i])
         _username = _columns['username'][_i]
         _telescope = _columns['telescope'][_i]
         _instrument = _columns['instrument'][_i]
-        _object_name = _columns['object_name'][_i]
-        _ra_hms = _columns['ra'][_i]
-        _dec_dms = _columns['dec'][_i]
-        _filter_name = _columns['filter'][_i]
-        _exp_time = _columns['exp_time'][_i]
-        _num_exp = _columns['num_exp'][_i]
-        _airmass = _columns['airmass'][_i]
         _lunarphase = _columns['lunarphase'][_i]
         _priority = _columns['priority'][_i]
-        _photometric = _columns['photometric'][_i]
-        _photometric = True if str(_photometric).lower() in TRUE_VALUES else False
-        _guiding = _columns['guiding'][_i]
-        _guiding = True if str(_guiding).lower() in TRUE_VALUES else False
-        _non_sidereal = _columns['non_sidereal'][_i]
-        _non_sidereal = True if str(_non_sidereal).lower() in TRUE_VALUES else False
-        _begin_iso = _columns['begin'][_i]
-        _end_iso = _columns['end'][_i]
-        _binning = _columns['binning'][_i]
-        _dither = _columns['dither'][_i]
-        _cadence = _columns['cadence'][_i]
+        _ra_deg, _dec_deg = float(_columns['ra_deg'][_i]), float(_columns['dec_deg'][_i])
 
         # is user allowed to upload this request?
-        if _user is None:
-            msg_out(f"ERROR: no authorization to create an ObsReq() for {_username}", True, True)
-        else:
-            if (_user.username.strip().lower() == _username.strip().lower()) or _user.is_admin:
-                pass
-            else:
-                msg_out(f"ERROR: {_user.username} does not have permission to create an ObsReq() for {_username}", True, True)
-                continue
+        if not (_user.is_admin or _user.username.strip().lower() == _username.strip().lower()):
+            _errors[_line] = f'{_user.username} does not have permission to create an ObsReq2() for {_username}'
+            continue
 
         # check telescope / instrument pairing
-        if f'{_instrument}' not in ARTN_SUPPORTED_NODES[f'{_telescope}']:
-            msg_out(f"upload_file> invalid telescope ({_telescope}) and instrument ({_instrument}) combination", True, True)
+        if f'{_instrument}' not in ARTN_SUPPORTED_NODES.get(f'{_telescope}', []):
+            _errors[_line] = f'invalid telescope ({_telescope}) and instrument ({_instrument}) combination'
             continue
 
         # check known limit(s)
-        _d = dec_to_deg(_dec_dms)
-        if _d > TEL__DEC__LIMIT[f'{_telescope.lower()}']:
-            msg_out(f"upload_file> requested declination {_d:.3f} > {TEL__DEC__LIMIT[_telescope.lower()]} limit for {_telescope} telescope", True, False)
+        _limit = TEL__DEC__LIMIT.get(f'{_telescope.lower()}', MAX__DECLINATION)
+        if _dec_deg > _limit:
+            _errors[_line] = f'requested declination {_dec_deg:.3f} > {_limit} limit for {_telescope} telescope'
             continue
 
-        # set default(s)
-        _non_sidereal_json = None
-        if _non_sidereal:
-            _str = _columns['non_sidereal_json'][_i]
-            _str_start = _str.find('{')
-            _str_end = _str.rfind('}') + 1
-            _json = f"{_str[_str_start:_str_end]}"
-            if check_json(_json):
-                _non_sidereal_json = json.loads(_json)
-            else:
-                msg_out(f"upload_file> invalid JSON ... skipping", True, False)
-                continue
-        else:
-            _non_sidereal_json = json.loads('{}')
-
-        _iso = get_iso()
-        _mjd = iso_to_mjd(_iso)
-        _priority = _columns['priority'][_i]
-        _begin_mjd = iso_to_mjd(_begin_iso)
-        _end_mjd = iso_to_mjd(_end_iso)
+        # set moon phase
         _sign = -1.0 if random.uniform(-1.0, 1.0) < 0.0 else 1.0
         if _lunarphase == 'dark':
             _moonphase = _sign * random.uniform(0.0, 5.5)
@@ -399,98 +375,112 @@ def upload_file(_columns=None, _num=0, _user=None):
             _moonphase = _sign * random.uniform(5.5, 8.5)
         else:
             _moonphase = _sign * random.uniform(8.5, 15.0)
-        _priority_value = -_mjd if _priority == 'urgent' else _mjd
 
-        # noinspection PyArgumentList
-        msg_out(f"upload_file> instantiating ObsReq2(username={_username}, pi='{_user.firstname} {_user.lastname}, {_user.affiliation}', created_iso={_iso}, created_mjd={_mjd}, group_id={get_unique_hash()}, observation_id={get_unique_hash()}, priority={_priority}, priority_value=-{_mjd} if _priority == 'urgent' else {_mjd}, object_name={_object_name}, ra_hms={_ra_hms}, ra_deg={ra_to_deg(_ra_hms)}, dec_dms={_dec_dms}, dec_deg={dec_to_deg(_dec_dms)}, begin_iso={_begin_iso}, begin_mjd={_begin_mjd}, end_iso={_end_iso}, end_mjd={_end_mjd}, airmass={_airmass}, lunarphase={_lunarphase}, moonphase={_moonphase}, photometric={_photometric}, guiding={_guiding}, non_sidereal={_non_sidereal}, filter_name={_filter_name}, exp_time={_exp_time}, num_exp={_num_exp}, binning={_binning}, dither={_dither}, cadence={_cadence}, telescope={_telescope}, instrument={_instrument}, rts2_doc='<>', rts2_id=-1, queued=False, queued_iso={ARTN_ZERO_ISO}, queued_mjd={ARTN_ZERO_MJD}, completed_iso={ARTN_ZERO_ISO}, completed_mjd={ARTN_ZERO_MJD}, completed=False, non_sidereal_json={_non_sidereal_json})", True, False)
-        _or = None
-        try:
-            # create obsreq object
-            # noinspection PyArgumentList
-            _or = ObsReq2(
-                    username=_username, 
-                    pi=f'{_user.firstname} {_user.lastname}, {_user.affiliation}',
-                    priority=_priority,
-                    priority_value=_priority_value, 
-                    created_iso=_iso, 
-                    created_mjd=_mjd, 
-                    object_name=_object_name,
-                    ra_hms=_ra_hms, 
-                    ra_deg=ra_to_deg(_ra_hms), 
-                    dec_dms=_dec_dms, 
-                    dec_deg=dec_to_deg(_dec_dms),
-                    observation_id=get_unique_hash(), 
-                    begin_iso=_begin_iso, 
-                    begin_mjd=_begin_mjd, 
-                    end_iso=_end_iso, 
-                    end_mjd=_end_mjd,
-                    airmass=_airmass, 
-                    lunarphase=_lunarphase, 
-                    moonphase=_moonphase, 
-                    photometric=_photometric,
-                    guiding=_guiding, 
-                    non_sidereal=_non_sidereal, 
-                    telescope=_telescope,
-                    instrument=_instrument, 
-                    rts2_doc='{}', 
-                    rts2_id=-1, 
-                    queued=False, 
-                    queued_iso=ARTN_ZERO_ISO, 
-                    queued_mjd=ARTN_ZERO_MJD, 
-                    completed=False,
-                    completed_iso=ARTN_ZERO_ISO, 
-                    completed_mjd=ARTN_ZERO_MJD,
-                    binning=_binning, 
-                    dither=_dither, 
-                    cadence=_cadence, 
-                    non_sidereal_json=_non_sidereal_json, 
-                    obs_status='', 
-                    percent_completed=0.0, 
-                    user_id=_user.id)
-        except Exception as _e:
-            msg_out(f"ERROR: failed instantiating ObsReq2(), error={_e}", True, True)
-        else:
-            msg_out(f"upload_file> instantiated ObsReq2() OK, {_or.serialized()}", True, False)
-
-        # update database (admin is allowed insert any records, users on those they own)
-        if _user.is_admin or (_user.username.lower() == _username.lower()):
-            try:
-                db.session.add(_or)
-                db.session.commit()
-            except Exception as _e:
-                db.session.rollback()
-                msg_out(f"ERROR: Failed to create observation request {_columns['object_name'][_i]} for {_columns['username'][_i]}, error={_e}", True, True)
-            else:
-                db.session.flush()
-                _obsreqid = _or.serialized()['id']
-                msg_out(f"upload_file> loaded object {_columns['object_name'][_i]} for {_columns['username'][_i]}, id={_obsreqid}", True, False)
-                msg_out(f"upload_file> instantiating ObsExposure(obsreqid={_obsreqid}, filter_name='{_filter_name}', exp_time={_exp_time}, num_exp={_num_exp}, completed=False, queued=False,filename=''", True, False)
-                try:
-                    _oe = ObsExposure(
-                            obsreqid=_or.serialized()['id'],
-                            filter_name=_filter_name,
-                            exp_time=_exp_time,
-                            num_exp=_num_exp,
-                            completed=False,
-                            queued=False,
-                            filename='')
-                except Exception as _f:
-                    msg_out(f"ERROR: failed instantiating ObsExposure(), error={_f}", True, True)
-                else:
-                    msg_out(f"upload_file> instantiated ObsExposure() OK, {_oe.serialized()}", True, False)
-                    try:
-                        db.session.add(_oe)
-                        db.session.commit()
-                    except Exception as _x:
-                        db.session.rollback()
-                        msg_out(f"ERROR: Failed to create exposure request {_columns['object_name'][_i]} for {_columns['username'][_i]}, error={_x}", True, True)
-                        ObsReq2.query.filter_by(id=_obsreqid).delete()
-                        msg_out(f"ERROR: Deleted create exposure request {_columns['object_name'][_i]} for {_columns['username'][_i]}, error={_x}", True, True)
-                    else:
-                        msg_out(f"upload_file> loaded object exposure {_oe.serialized()}", True, False)
+        _records.append({
+            'username': _username, 'pi': _pi, 'priority': _priority,
+            'priority_value': -_mjd if _priority == 'urgent' else _mjd, 'created_iso': _iso, 'created_mjd': _mjd,
+            'object_name': _columns['object_name'][_i], 'ra_hms': _columns['ra'][_i], 'ra_deg': _ra_deg,
+            'dec_dms': _columns['dec'][_i], 'dec_deg': _dec_deg,
+            'observation_id': hashlib.sha256(f'{_iso}.{_line}.{random.getrandbits(64)}'.encode('utf-8')).hexdigest(),
+            'begin_iso': _columns['begin'][_i], 'begin_mjd': float(_columns['begin_mjd'][_i]),
+            'end_iso': _columns['end'][_i], 'end_mjd': float(_columns['end_mjd'][_i]),
+            'airmass': float(_columns['airmass'][_i]), 'lunarphase': _lunarphase, 'moonphase': _moonphase,
+            'photometric': bool(_columns['photometric'][_i]), 'guiding': bool(_columns['guiding'][_i]),
+            'non_sidereal': bool(_columns['non_sidereal'][_i]), 'telescope': _telescope, 'instrument': _instrument,
+            'rts2_doc': '{}', 'rts2_id': -1, 'queued': False, 'queued_iso': ARTN_ZERO_ISO, 'queued_mjd': ARTN_ZERO_MJD,
+            'completed': False, 'completed_iso': ARTN_ZERO_ISO, 'completed_mjd': ARTN_ZERO_MJD,
+            'binning': _columns['binning'][_i], 'dither': _columns['dither'][_i], 'cadence': _columns['cadence'][_i],
+            'non_sidereal_json': _columns['non_sidereal_json'][_i], 'obs_status': '', 'percent_completed': 0.0,
+            'user_id': _user.id})
+        _exposures.append({
+            'filter_name': _columns['filter'][_i], 'exp_time': float(_columns['exp_time'][_i]),
+            'num_exp': int(_columns['num_exp'][_i]), 'completed': False, 'queued': False, 'filename': ''})
+        _lines.append(_line)
+
+    # return result
+    return _records, _exposures, _lines, _errors
+
+
+# +
+# since the introduction of ObsReq2, this is broken??!!!
+# fixed: pnd, 20230418
+# bulk: stream the file in batches, validate each batch then insert obsreq2 + obsexposure
+# -
+def upload_file(_pathname='', _user=None, _batches=None):
+    msg_out(f"upload_file> reading {_pathname}", True, False)
+
+    # validate and insert batch by batch, rejected rows do not stop the others
+    _loaded, _errors = 0, {}
+    try:
+        for _columns, _bad in (_batches if _batches is not None else upload_batches(_pathname)):
+            _errors.update(_bad)
+            _records, _exposures, _lines, _invalid = upload_validate(_columns, _user)
+            _errors.update(_invalid)
+            _ids, _failed = ObsReq2.insert_many(_records, _exposures)
+            _errors.update({_lines[_k]: _v for _k, _v in _failed.items()})
+            _loaded += sum(1 for _id in _ids if _id is not None)
+    except Exception as _e:
+        msg_out(f"ERROR: Failed to read {_pathname}, error={_e}", True, True)
+        return {'loaded': _loaded, 'rejected': len(_errors), 'errors': {f'{_l}': _errors[_l] for _l in sorted(_errors)},
+                'error': f'{_e}'}
+
+    # report
+    for _l in sorted(_errors):
+        msg_out(f"ERROR: Failed to create observation request (line {_l}), error={_errors[_l]}", True, False)
+    msg_out(f"upload_file> loaded {_loaded} observation request(s)", True, True)
+    if _errors:
+        msg_out(f"ERROR: {len(_errors)} row(s) rejected, first: line {min(_errors)}, "
+                f"error={_errors[min(_errors)]}", True, True)
 
     # done
-    return redirect(url_for('orp_user', username=_user.username))
+    return {'loaded': _loaded, 'rejected': len(_errors), 'errors': {f'{_l}': _errors[_l] for _l in sorted(_errors)}}
+
+
+# +
+# function: json_upload()
+# -
+def json_upload(_filedata=None, _user=None):
+    """ validates a list of obsreq2 (+ exposures) dictionaries and commits them all or none """
+    for obs in _filedata:
+        #validate each obsreq
+        obsreq, validator, isvalid = ObsReq2.validate_json(obs, _user)
+        if not isvalid:
+            db.session.rollback()
+            raise Exception(f'Invalid Observation Request: {json.dumps(obs)}, errors: {json.dumps(validator.errors)}')
+        #look for the exposures in the keys
+        if 'exposures' not in obs.keys() or not len(obs['exposures']):
+            db.session.rollback()
+            raise Exception(f'Invalid Observation Request: {json.dumps(obs)}, errors: list of \'exposures\' is required')
+        #add and flush to get obsreqid
+        db.session.add(obsreq)
+        db.session.flush()
+        #loop over each obsexp and test their validity
+        for e in obs['exposures']:
+            e['obsreqid'] = obsreq.id
+            obsexp, validator, isvalid = ObsExposure.validate_json(e)
+            if not isvalid:
+                db.session.rollback()
+                raise Exception(f'Invalid Observation Request: {obsexp.serialized()}, '
+                                f'errors: {json.dumps(validator.errors)}')
+            db.session.add(obsexp)
+    #Everything is Kosher, submit to database
+    db.session.commit()
+    return {'loaded': len(_filedata)}
+
+
+# +
+# function(s): job handler(s), run by the job queue workers inside an application context
+# -
+def upload_file_job(_payload=None, _progress=None):
+    return upload_file(_payload['pathname'], User.query.get(int(_payload['user_id'])))
+
+
+def json_upload_job(_payload=None, _progress=None):
+    return json_upload(_payload['filedata'], User.query.get(int(_payload['user_id'])))
+
+
+jobs.register('upload', upload_file_job)
+jobs.register('json_upload', json_upload_job)
 
 
 # noinspection PyBroadException
@@ -630,17 +620,15 @@ def history_get_fits_headers(_in=None):
     if _in is None or not isinstance(_in, list) or _in is []:
         return []
 
-    # get fits data
+    # get fits data from the index (only new or changed files are opened)
     _l_out = []
+    _rows = fits_index.headers([_e['file'] for _e in _in])
     for _e in _in:
-        _d_out = {'FILE': os.path.basename(_e['file']), 'DIRECTORY': os.path.dirname(_e['file']),
-                  'SIZE': _e['size'], 'OWNER': _e['user']}
-        with fits.open(_e['file']) as _hdul:
-            for _h in ARTN_FITS_HEADERS:
-                try:
-                    _d_out[_h.replace('-', '')] = str(_hdul[0].header[_h]).strip()
-                except Exception:
-                    _d_out[_h] = ''
+        _r = _rows.get(os.path.abspath(_e['file']))
+        if _r is None:
+            continue
+        _d_out = {'FILE': _r['file'], 'DIRECTORY': _r['directory'], 'SIZE': _e['size'], 'OWNER': _e['user']}
+        _d_out.update({_h: _r[_h] for _h in FITS__COLUMNS})
 
         # append new record
         _l_out.append(_d_out)
@@ -660,14 +648,13 @@ def old_history_search(_flist=None, _lookback=0.0, _name=''):
     if not isinstance(_name, str):
         return []
 
-    # search
+    # search, object names for every distinct group id come from one query
     _udata = []
+    _objects = ObsReq.object_map(_e['gid'] for _e in _flist if 'gid' in _e)
     for _e in _flist:
         _object = ''
-        if 'gid' in _e:
-            _o = ObsReq.query.filter_by(group_id=_e['gid']).first() 
-            if _o:
-                _object = encode_verboten(_o.object_name.strip(), ARTN_ENCODE_DICT)
+        if 'gid' in _e and _objects.get(f"{_e['gid']}".strip()):
+            _object = encode_verboten(_objects[f"{_e['gid']}".strip()].strip(), ARTN_ENCODE_DICT)
 
         if 'timestamp' in _e:
             _jd = iso_to_jd(_e['timestamp'])
@@ -760,7 +747,7 @@ def get_old_history_page(_results=None, _offset=0, _per_page=ARTN_RESULTS_PER_PA
 
 
 # noinspection PyBroadException
-def nlog_seek_files(_path: str = os.getcwd(), _include: str = 'all'):
+def nlog_seek_files(_path: str = os.getcwd(), _include: str = 'all', _scan: bool = True):
 
     # get input(s)
     _path = os.path.abspath(os.path.expanduser(f'{_path}'))
@@ -770,32 +757,13 @@ def nlog_seek_files(_path: str = os.getcwd(), _include: str = 'all'):
     if _include not in ['all', 'stitched', 'raw']:
         return {}
 
-    # generator code
-    _fw = (
-        os.path.join(_root, _file)
-        for _root, _dirs, _files in os.walk(_path)
-        for _file in _files
-    )
-
-    # get file(s)
+    # bring the index up to date (stat only, new or changed files are read) then query it
     try:
-        if _include == 'all':
-            return {f'{_k}': int(os.stat(f'{_k}').st_size)
-                    for _k in _fw if (not os.path.islink(f'{_k}') and os.path.exists(f'{_k}') and
-                                      _k.endswith('.fits') and int(os.stat(f'{_k}').st_size) > 2)}
-        elif (_include == 'raw' or _include == 'unstitched'):
-            return {f'{_k}': int(os.stat(f'{_k}').st_size)
-                    for _k in _fw if (not os.path.islink(f'{_k}') and os.path.exists(f'{_k}') and
-                                      'stitched' not in _k and
-                                      _k.endswith('.fits') and int(os.stat(f'{_k}').st_size) > 2)}
-        elif _include == 'stitched':
-            return {f'{_k}': int(os.stat(f'{_k}').st_size)
-                    for _k in _fw if (not os.path.islink(f'{_k}') and os.path.exists(f'{_k}') and
-                                      'stitched' in _k and
-                                      _k.endswith('.fits') and int(os.stat(f'{_k}').st_size) > 2)}
-        else:
-            return {}
-    except Exception:
+        if _scan:
+            fits_index.scan(_path)
+        return {_r['path']: _r for _r in fits_index.stream(_path, _include)}
+    except Exception as _e:
+        msg_out(f'ERROR: nlog_seek_files> failed to index {_path}, error={_e}', True, False)
         return {}
 
 
@@ -875,39 +843,30 @@ def nlog_get_fits_headers(_in=None):
     if _in is None or not isinstance(_in, dict) or _in is {}:
         return []
 
-    # get fits data
+    # get fits data (rows from nlog_seek_files() already hold the indexed headers)
     _l_out = []
     for _k, _v in _in.items():
-        _d_out = {'file': os.path.basename(_k), 'directory': os.path.dirname(_k), 'size': _v}
-        with fits.open(_k) as _hdul:
-            for _h in ARTN_FITS_HEADERS:
-                try:
-                    _d_out[_h.replace('-', '')] = str(_hdul[0].header[_h]).strip()
-                except Exception:
-                    _d_out[_h] = ''
-
-        # +
-        # why was the ARTNGID removed from the database table
-        # as this was going to be used to identify dither member(s)?!!!
-        # -
-        try:
-            # who requested it?
-            # if _d_out['ARTNGID'].strip() != '' and _d_out['ARTNOID'].strip() != '':
-            if _d_out['ARTNOID'].strip() != '':
-                query = db.session.query(ObsReq2)
-                # query = obsreq_filters(query, {'group_id': f"{_d_out['ARTNGID']}"})
-                query = obsreq2_filters(query, {'observation_id': f"{_d_out['ARTNOID']}"})
-                _d_out['OWNER'] = query.first().username
-            else:
-                _d_out['OWNER'] = ''
-        except Exception:
-            _d_out['OWNER'] = ''
+        _d_out = {'file': _v['file'], 'directory': _v['directory'], 'size': _v['size']}
+        _d_out.update({_h: _v[_h] for _h in FITS__COLUMNS})
 
         # append new record
         _l_out.append(_d_out)
 
+    # +
+    # why was the ARTNGID removed from the database table
+    # as this was going to be used to identify dither member(s)?!!!
+    # -
+    # who requested it? one query for every distinct ARTNOID
+    try:
+        _owners = ObsReq2.owner_map(_d['ARTNOID'] for _d in _l_out)
+    except Exception as _e:
+        msg_out(f'ERROR: failed to resolve owner(s), error={_e}', True, False)
+        _owners = {}
+    for _d in _l_out:
+        _d['OWNER'] = _owners.get(_d['ARTNOID'].strip(), '')
+
     # return list sorted by Julian date key
-    msg_out(f'nlog_get_fits_headers()> _l_out={_l_out}', True, False)
+    msg_out(f'nlog_get_fits_headers()> {len(_l_out)} record(s)', True, False)
     return sorted(_l_out, key=lambda _i: _i['JULIAN'])
 
 
@@ -922,126 +881,83 @@ def get_old_nightlog_fits(_in=None):
     _l_out = []
     for _k, _v in _in.items():
         _d_out = {'file': os.path.basename(_k), 'directory': os.path.dirname(_k), 'size': _v}
-        with fits.open(_k) as _hdul:
-            for _h in ARTN_FITS_HEADERS:
-                try:
-                    _d_out[_h.replace('-', '')] = str(_hdul[0].header[_h]).strip()
-                except Exception:
-                    _d_out[_h] = ''
-
-        # +
-        # why was the ARTNGID removed from the database table
-        # as this was going to be used to identify dither member(s)?!!!
-        # -
-        try:
-            # who requested it?
-            # if _d_out['ARTNGID'].strip() != '' and _d_out['ARTNOID'].strip() != '':
-            if _d_out['ARTNOID'].strip() != '':
-                query = db.session.query(ObsReq2)
-                # query = obsreq_filters(query, {'group_id': f"{_d_out['ARTNGID']}"})
-                query = obsreq_filters(query, {'observation_id': f"{_d_out['ARTNOID']}"})
-                _d_out['OWNER'] = query.first().username
-            else:
-                _d_out['OWNER'] = ''
-        except Exception:
-            _d_out['OWNER'] = ''
+        _hdr = fits_header(_k, ARTN_FITS_HEADERS)
+        for _h in ARTN_FITS_HEADERS:
+            _d_out[_h.replace('-', '')] = str(_hdr.get(_h, '')).strip()
 
         # append new record
         _l_out.append(_d_out)
 
+    # +
+    # why was the ARTNGID removed from the database table
+    # as this was going to be used to identify dither member(s)?!!!
+    # -
+    # who requested it? one query for every distinct ARTNOID
+    try:
+        _owners = ObsReq2.owner_map(_d['ARTNOID'] for _d in _l_out)
+    except Exception as _e:
+        msg_out(f'ERROR: failed to resolve owner(s), error={_e}', True, False)
+        _owners = {}
+    for _d in _l_out:
+        _d['OWNER'] = _owners.get(_d['ARTNOID'].strip(), '')
+
     # return list sorted by Julian date key
     return sorted(_l_out, key=lambda _i: _i['JULIAN'])
 
 
-def get_current_queue_table(rts2ids, obsreqs_dict, table_class, expids, username):
+# +
+# function: queue_exposure_rows()
+# -
+def queue_exposure_rows(_exposures=None):
+    """ compact exposure rows for the queue tables """
+    return [{'id': _e['id'], 'filter': _e['filter_name'], 'exptime': _e['exp_time'], 'amount': _e['num_exp']}
+            for _e in (_exposures or [])]
+
+
+# +
+# function: current_queue_rows()
+# -
+def current_queue_rows(rts2ids=None, obsreqs_dict=None, state=''):
+    """ one row per rts2 id in queue order, targets that are not observation requests keep id -1 """
     FOCUS_FIELD_IDS = [3611, 3612, 3613, 3614, 3615, 3616, 3617, 3618, 3619, 3620, 3621, 3622, 3623, 3624]
-    html= ''
+    _rows = []
     for rts2_id in rts2ids:
-        try:
-            ob = obsreqs_dict[rts2_id]
-            t_expids = [x['id'] for x in ob['exposures']]
-            allchecked = ' checked' if all([tid in expids for tid in t_expids]) else ''
-            ob = obsreqs_dict[rts2_id]
-            nameid = ob['object_name']
-            btn_disable = ''
-            if '+' in nameid:
-                nameid = nameid.replace('+', '')
-            object_href = '<a href="/orp/obsreq2/{}?obsreqid={}&return_page=orp_manage_queue">{}</a>'.format(username,ob['id'],ob['object_name'])
-            status = ob['obs_status']
-            print(nameid,status)
-            if status == 'inprogress':
-                status = 'In Progress (%{})'.format(ob['percent_completed'])
-            elif status == 'completed':
-                status = 'Completed (%100)'
-            else:
-                status = 'Queued (%0.0)'
-        except:
-            if rts2_id == 1:
-                nameid = 'DARK FRAMES'
-            if rts2_id == 2:
-                nameid = 'FLAT FRAMES'
-            if rts2_id in FOCUS_FIELD_IDS:
-                nameid = 'FOCUS FIELD'
-
-            btn_disable = 'disabled '
-            ob = {
-                'id':-1,
-                'object_name':nameid,
-                'ra_hms':'',
-                'dec_dms':'',
-                'exposures':[]
-            }
-            allchecked = False
-            object_href=nameid
-            status = ''
-            
-        html += '''
-        <tr class="{}">
-            <td><button {}id="collbtn{}" onclick="changeCollapseButtonText(this.id)" type="button" class="btn btn-primary btn-xs arrow-right" data-toggle="collapse" data-target="#collapse{}"></button></td>
-            <td>{}</td>
-            <td>{}</td>
-            <td>{}</td>
-            <td></td>
-            <td></td>
-            <td></td>
-            <td>{}</td>
-            <td><input id="queuetarg_{}" type="checkbox" onclick="objectCheckAll(this.id)"{}></td>
-        </tr>
-        '''.format(table_class,btn_disable,nameid,nameid,object_href,ob['ra_hms'],ob['dec_dms'], status, nameid, allchecked)
-        html+= '''
-        <tr class="collapse" id="collapse{}">
-            <td colspan="999">
-                <div>
-                    <table class="table table-striped table-sm">
-                        <thead>
-                            <tr>
-                                <td><font color='blue'>Filter</font></td>
-                                <td><font color='blue'>Exptime (s)</font></td>
-                                <td><font color='blue'>Num Exp</font></td>
-                                <td><font color='blue'>Requeue</font><td>
-                            </tr>
-                        </thead>
-                        <tbody>
-        '''.format(nameid)
-        for obexp in ob['exposures']:
-            thischecked = ' checked' if obexp['id'] in expids else ''
-            html+='''
-                                <tr>
-                                    <td>{}</td>
-                                    <td>{}</td>
-                                    <td>{}</td>
-                                    <td><input value="{}" id="{}_{}" type="checkbox" onclick="expCheckOne(this.id)"{}></td>
-                                </tr>
-            '''.format(obexp['filter_name'], obexp['exp_time'], obexp['num_exp'], obexp['id'], nameid, obexp['id'], thischecked)
-        html += '''
-                            </tbody>
-                        </table>
-                    </div>
-                </td>
-            </tr>
-        '''
-    
-    return html
+        if rts2_id is None:
+            continue
+        ob = obsreqs_dict.get(rts2_id)
+        if ob is not None:
+            _rows.append({'rts2_id': rts2_id, 'id': ob['id'], 'name': ob['object_name'], 'ra': ob['ra_hms'],
+                          'dec': ob['dec_dms'], 'state': state, 'status': ob['obs_status'],
+                          'percent_completed': ob['percent_completed'],
+                          'exposures': queue_exposure_rows(ob['exposures'])})
+            continue
+        if rts2_id == 1:
+            nameid = 'DARK FRAMES'
+        elif rts2_id == 2:
+            nameid = 'FLAT FRAMES'
+        elif rts2_id in FOCUS_FIELD_IDS:
+            nameid = 'FOCUS FIELD'
+        else:
+            nameid = f'RTS2 {rts2_id}'
+        _rows.append({'rts2_id': rts2_id, 'id': -1, 'name': nameid, 'ra': '', 'dec': '', 'state': state,
+                      'status': '', 'percent_completed': '', 'exposures': []})
+    return _rows
+
+
+# +
+# function: versioned_json()
+# -
+def versioned_json(_payload=None, _headers=None):
+    """ returns _payload as JSON with a 'version' (also the ETag) over _payload, 304 if unchanged; values that change
+        on their own (eg the rts2 snapshot time) go in _headers so they neither alter the version nor go stale """
+    _version = md5(json.dumps(_payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    _response = jsonify(dict(_payload, version=_version))
+    _response.set_etag(_version)
+    _response.headers['Cache-Control'] = 'no-cache'
+    for _k, _v in (_headers or {}).items():
+        _response.headers[_k] = urllib.parse.quote(f'{_v}')
+    return _response.make_conditional(request)
+
 
 # +
 # error handler(s)
@@ -1088,18 +1004,26 @@ def internal_error(error=None):
 # noinspection PyPep8
 @app.before_request
 def before_request():
-    if current_user.is_authenticated:
-        _iso = get_iso()
-        _mjd = iso_to_mjd(_iso)
-        current_user.last_seen_iso = _iso
-        current_user.last_seen_mjd = _mjd
+    if current_user.is_authenticated and last_seen_writer.record(current_user.id):
         try:
-            db.session.commit()
+            last_seen_writer.flush()
         except Exception as _e:
-            db.session.rollback()
             msg_out(f'ERROR: Failed to update database, error={_e}', True, False)
 
 
+# +
+# flush pending last_seen update(s) on shutdown
+# -
+# noinspection PyBroadException
+@atexit.register
+def last_seen_flush():
+    try:
+        with app.app_context():
+            last_seen_writer.flush()
+    except Exception:
+        pass
+
+
 # +
 # route(s): /, /orp
 # -
@@ -1155,23 +1079,41 @@ def cli_upload(username=''):
     # load it
     try:
         _file.save(pathname)
-        _num, _columns = check_upload_format(pathname)
-        if _num < 0 or _columns is {}:
+        try:
+            _result, _job = upload_start(pathname, _u)
+        except Exception as _e:
             msg_out(f'ERROR: /orp/cli_upload/{username} input file has invalid format, '
-                    f'please check {pathname}', True, False)
+                    f'please check {pathname}, error={_e}', True, False)
             return jsonify({'status': 404, 'filename': filename, 'message': f"{filename} has invalid format"})
-        if _num < 100:
-            upload_file(_columns, _num, _u)
+        if _job is None:
             return jsonify({'status': 200, 'filename': filename, 'message': f"{filename} "
                                                                             f"uploading synchronously ... OK"})
         else:
-            upload_file_async(_columns, _num, _u)
-            return jsonify({'status': 200, 'filename': filename, 'message': f"{filename} uploading asynchronously"})
+            return jsonify({'status': 200, 'filename': filename, 'message': f"{filename} uploading asynchronously",
+                            'job': _job, 'url': url_for('orp_job', job_id=_job, _external=True)})
 
     except Exception as _e:
         return jsonify({'status': 500, 'message': f"{_e}"})
 
 
+# +
+# route(s): /orp/jobs/<job_id>
+# -
+@app.route('/orp/orp/jobs/<job_id>', methods=['GET'])
+@app.route('/orp/jobs/<job_id>', methods=['GET'])
+@app.route('/jobs/<job_id>', methods=['GET'])
+def orp_job(job_id=''):
+    msg_out(f'/orp/jobs/{job_id} entry', True, False)
+
+    # job ids are random so knowing one is sufficient to read its status, only its owner (or an admin) sees the rest
+    _job = jobs.get(job_id)
+    if _job is None:
+        return jsonify({'status': 404, 'message': f'Job {job_id} not found'}), 404
+    if current_user.is_authenticated and (current_user.is_admin or current_user.username == _job['username']):
+        return jsonify(_job)
+    return jsonify({_k: _job[_k] for _k in ('id', 'status', 'progress', 'message')})
+
+
 # +
 # route(s): /orp/confirm_delete/<dbid>, requires login
 # -
@@ -1708,10 +1650,9 @@ def dir_listing(ftype=''):
     for _e in _files:
         if 'template' in _e.lower():
             continue
-        _num, _columns = -1, {}
         if _e.lower().endswith('csv') or _e.lower().endswith('tsv'):
-            _num, _columns = check_upload_format(f'{_e}')
-            if _num > 0 and _columns:
+            _num, _errors = check_upload_format(f'{_e}')
+            if _num > 0 and not _errors:
                 _dict = {'file': f'{_e}', 'name': f'{os.path.basename(_e)}', 'OK': True}
             else:
                 _dict = {'file': f'{_e}', 'name': f'{os.path.basename(_e)}', 'OK': False}
@@ -1863,17 +1804,27 @@ def orp_nightlog():
             '', '', '', '', '', '', '', ''
         _f_all, _n_all, _s_all = {}, 0, ''
 
+        # index the requested categories concurrently, each seek below is then a query
+        _stitched = '/stitched' if _fit == 'stitched' else ''
+        try:
+            fits_index.scan_many([f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/{_c}{_stitched}" for _c in
+                                  ('bias', 'calibration', 'dark', 'flat', 'focus', 'object', 'skyflat', 'standard')
+                                  if _obs in ('all', _c)])
+        except Exception as _e:
+            msg_out(f'ERROR: /orp/nightlog/ failed to index {ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}, error={_e}',
+                    True, False)
+
         # seek files and headers
         if _obs == 'all' or _obs == 'bias':
             _d_bias = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/bias" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/bias/stitched"
-            _f_bias = nlog_seek_files(_d_bias, _fit)
+            _f_bias = nlog_seek_files(_d_bias, _fit, False)
             _h_bias = nlog_get_fits_headers(_f_bias)
             _n_bias = len(_f_bias)
             _s_bias = f"{_n_bias} BIAS observations on server scopenet.as.arizona.edu in directory {_d_bias}"
             msg_out(f'/orp/nightlog/ searching {_d_bias}', True, False)
         if _obs == 'all' or _obs == 'calibration':
             _d_calibration = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/calibration" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/calibration/stitched"
-            _f_calibration = nlog_seek_files(_d_calibration, _fit)
+            _f_calibration = nlog_seek_files(_d_calibration, _fit, False)
             _h_calibration = nlog_get_fits_headers(_f_calibration)
             _n_calibration = len(_f_calibration)
             _s_calibration = f"{_n_calibration} CALIBRATION observations on server scopenet.as.arizona.edu " \
@@ -1881,35 +1832,35 @@ def orp_nightlog():
             msg_out(f'/orp/nightlog/ searching {_d_calibration}', True, False)
         if _obs == 'all' or _obs == 'dark':
             _d_dark = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/dark" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/dark/stitched"
-            _f_dark = nlog_seek_files(_d_dark, _fit)
+            _f_dark = nlog_seek_files(_d_dark, _fit, False)
             _h_dark = nlog_get_fits_headers(_f_dark)
             _n_dark = len(_f_dark)
             _s_dark = f"{_n_dark} DARK observations on server scopenet.as.arizona.edu in directory {_d_dark}"
             msg_out(f'/orp/nightlog/ searching {_d_dark}', True, False)
         if _obs == 'all' or _obs == 'flat':
             _d_flat = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/flat" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/flat/stitched"
-            _f_flat = nlog_seek_files(_d_flat, _fit)
+            _f_flat = nlog_seek_files(_d_flat, _fit, False)
             _h_flat = nlog_get_fits_headers(_f_flat)
             _n_flat = len(_f_flat)
             _s_flat = f"{_n_flat} FLAT observations on server scopenet.as.arizona.edu in directory {_d_flat}"
             msg_out(f'/orp/nightlog/ searching {_d_flat}', True, False)
         if _obs == 'all' or _obs == 'focus':
             _d_focus = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/focus" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/focus/stitched"
-            _f_focus = nlog_seek_files(_d_focus, _fit)
+            _f_focus = nlog_seek_files(_d_focus, _fit, False)
             _h_focus = nlog_get_fits_headers(_f_focus)
             _n_focus = len(_f_focus)
             _s_focus = f"{_n_focus} FOCUS observations on server scopenet.as.arizona.edu in directory {_d_focus}"
             msg_out(f'/orp/nightlog/ searching {_d_focus}', True, False)
         if _obs == 'all' or _obs == 'object':
             _d_object = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/object" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/object/stitched"
-            _f_object = nlog_seek_files(_d_object, _fit)
+            _f_object = nlog_seek_files(_d_object, _fit, False)
             _h_object = nlog_get_fits_headers(_f_object)
             _n_object = len(_f_object)
             _s_object = f"{_n_object} OBJECT observations on server scopenet.as.arizona.edu in directory {_d_object}"
             msg_out(f'/orp/nightlog/ searching {_d_object}', True, False)
         if _obs == 'all' or _obs == 'skyflat':
             _d_skyflat = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/skyflat" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/skyflat/stitched"
-            _f_skyflat = nlog_seek_files(_d_skyflat, _fit)
+            _f_skyflat = nlog_seek_files(_d_skyflat, _fit, False)
             _h_skyflat = nlog_get_fits_headers(_f_skyflat)
             _n_skyflat = len(_f_skyflat)
             _s_skyflat = f"{_n_skyflat} SKYFLAT observations on server scopenet.as.arizona.edu " \
@@ -1917,7 +1868,7 @@ def orp_nightlog():
             msg_out(f'/orp/nightlog/ searching {_d_skyflat}', True, False)
         if _obs == 'all' or _obs == 'standard':
             _d_standard = f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/standard" if _fit != 'stitched' else f"{ARTN_DATA_ROOT}/{_tel}/{_ins}/{_iso}/standard/stitched"
-            _f_standard = nlog_seek_files(_d_standard, _fit)
+            _f_standard = nlog_seek_files(_d_standard, _fit, False)
             _h_standard = nlog_get_fits_headers(_f_standard)
             _n_standard = len(_f_standard)
             _s_standard = f"{_n_standard} STANDARD observations on server scopenet.as.arizona.edu " \
@@ -2288,6 +2239,7 @@ def orp_profile(username=''):
         # update database
         try:
             db.session.commit()
+            user_cache.invalidate(_u.username)
             msg_out(f'User {_u.username} changes have been saved', True, True)
         except Exception as _e:
             db.session.rollback()
@@ -2865,19 +2817,15 @@ def orp_tsv_upload(username=''):
         pathname = os.path.join(app.instance_path, 'files', f'{_u.username}_{filename}')
         _fn.save(pathname)
         
-        # check file is valid
-        _num, _columns = check_upload_format(pathname)
-        if _num < 0 or _columns is {}:
-            msg_out(f'ERROR: Input file has invalid format, please check {filename}', True, True)
+        # fewer than UPL__SYNC records load synchronously (in the same pass that validates them) otherwise as a job
+        try:
+            _result, _job = upload_start(pathname, _u)
+        except Exception as _e:
+            msg_out(f'ERROR: Input file has invalid format, please check {filename}, error={_e}', True, True)
             return redirect(url_for('orp_view_requests', username=current_user.username))
-
-        # if number of lines < 100, upload synchronously otherwise use a thread
-        if _num < 100:
-            msg_out(f'Input file has {_num} records, loading synchronously', True, True)
-            upload_file(_columns, _num, _u)
-        else:
-            msg_out(f'Input file has {_num} records, loading asynchronously', True, True)
-            upload_file_async(_columns, _num, _u)
+        if _job is not None:
+            msg_out(f'Input file has {UPL__SYNC} or more records, loading asynchronously as job {_job}, '
+                    f'see {url_for("orp_job", job_id=_job)}', True, True)
 
         # return to view requests
         return redirect(url_for('orp_view_requests', username=current_user.username))
@@ -2914,42 +2862,14 @@ def orp_json_upload(username=''):
         pathname = os.path.join(app.instance_path, 'files', f'{_u.username}_{filename}')
         _fn.save(pathname)
         
-        #try:
-        #validate opening jsonfile
-        filedata = json.loads(open(pathname).read())
-        for obs in filedata:
-            #validate each obsreq
-            obsreq, validator, isvalid  = ObsReq2.validate_json(obs, _u)
-            if isvalid:
-                #if it is deemed valid, look for the exposures in the keys
-                if 'exposures' in obs.keys() and len(obs['exposures']):
-                    #add and flush to get obsreqid
-                    db.session.add(obsreq)
-                    db.session.flush()
-                    exps = obs['exposures']
-                    #loop over each obsexp and test their validity
-                    for e in exps:
-                        e['obsreqid'] = obsreq.id
-                        obsexp, validator, isvalid = ObsExposure.validate_json(e)
-                        if isvalid:
-                            db.session.add(obsexp)
-                        else:
-                            msg_out(f'Error: Invalid Observation Request: {obsexp.serialized()}')
-                            msg_out(f'Errors: {json.dumps(validator.errors)}')
-                            return redirect(url_for('orp_json_upload', username=current_user.username))
-                #No exposures
-                else:
-                    msg_out(f'Error: Invalid Observation Request: {json.dumps(obs)}')
-                    msg_out(f'Errors: list of \'exposures\' is required')
-                    return redirect(url_for('orp_json_upload', username=current_user.username))
-            #Invalid Observation request
-            else:
-                msg_out(f'Error: Invalid Observation Request: {json.dumps(obs)}')
-                msg_out(f'Errors: {json.dumps(validator.errors)}')
-                return redirect(url_for('orp_json_upload', username=current_user.username))
-        #Everything is Kosher, submit to database and return
-        db.session.commit()
-        msg_out(f'Successfully uploaded file', True, True)
+        # validate and load in the job queue
+        try:
+            filedata = json.loads(open(pathname).read())
+        except Exception as _e:
+            msg_out(f'ERROR: Input file has invalid format, please check {filename}, error={_e}', True, True)
+            return redirect(url_for('orp_json_upload', username=current_user.username))
+        _job = jobs.submit('json_upload', {'filedata': filedata, 'user_id': _u.id}, _u.username)
+        msg_out(f'Uploading {filename} as job {_job}, see {url_for("orp_job", job_id=_job)}', True, True)
         return redirect(url_for('orp_view_requests', username=current_user.username))
 
         #except:
@@ -3019,9 +2939,8 @@ def orp_view_observable(username=''):
     msg_out(f'/orp/view_observable/{username} _u.username={_u.username}', True, False)
 
     # set default(s)
-    page = request.args.get('page', 1, type=int)
+    page = 1
     response = {}
-    paginator = None
 
     # GET request
     if request.method == 'GET':
@@ -3032,7 +2951,7 @@ def orp_view_observable(username=''):
         if _u.is_admin:
             _filter = {'begin_mjd__lte': f"{_now}", 'end_mjd__gte': f"{_now}", 'username': f''}
         else:
-            _filter = {'begin_mjd__lte': f"{_now}", 'end_mjd__gte': f"{_now}", 'username': f'{_u.username}'}
+            _filter = {'begin_mjd__lte': f"{_now}", 'end_mjd__gte': f"{_now}", 'username__eq': f'{_u.username}'}
         msg_out(f'/orp/view_observable/{username} _filter={_filter}', True, False)
         query = obsreq2_filters(query, _filter)
 
@@ -3043,14 +2962,10 @@ def orp_view_observable(username=''):
             query = obsreq2_filters(query, {"sort_field": "id", "sort_order": "descending"})
 
         query = obsreq2_filters(query, request.args)
-        paginator = query.paginate(page, ARTN_RESULTS_PER_PAGE, True)
-        response = {
-            'total': paginator.total,
-            'pages': paginator.pages,
-            'has_next': paginator.has_next,
-            'has_prev': paginator.has_prev,
-            'results': ObsReq.serialize_list(paginator.items)
-        }
+        try:
+            response, page = obsreq2_page(query, request.args)
+        except ValueError as _e:
+            return jsonify({'status': 400, 'message': f'{_e}'}), 400
 
     # POST request
     if request.method == 'POST':
@@ -3070,7 +2985,7 @@ def orp_view_observable(username=''):
             query = obsreq2_filters(query, search_args)
             search_result['query'] = search_args
             search_result['num_requests'] = query.count()
-            search_result['results'] = ObsReq.serialize_list(query.all())
+            search_result['results'] = ObsReq2.serialize_list(query.all())
             search_results.append(search_result)
             total += search_result['num_requests']
 
@@ -3082,9 +2997,9 @@ def orp_view_observable(username=''):
 
     # add avatars to response dictionary
     # msg_out(f'response={response}', True, False)
+    _users = User.user_map([_e.get('username') for _e in response['results']], 16)
     for _e in response['results']:
-        _tu = User.query.filter_by(username=_e['username']).first()
-        _e['avatar'] = _e['username'] if _tu is None else _tu.get_avatar(16)
+        _e['avatar'] = _users[_e['username']][0] if _e['username'] in _users else _e['username']
         _e['object_name'] = decode_verboten(_e['object_name'], ARTN_DECODE_DICT)
 
     # return response in desired format
@@ -3096,8 +3011,65 @@ def orp_view_observable(username=''):
             _args.pop('page')
         except KeyError:
             pass
+        _args.pop('cursor', None)
         arg_str = urlencode(_args)
-        return render_template('view_observable.html', context=response, page=paginator.page, arg_str=arg_str, )
+        return render_template('view_observable.html', context=response, page=page, arg_str=arg_str, )
+
+
+# +
+# route(s): /orp/observable_rank/<username>?telescope=<str>&night=<YYYY-MM-DD>, requires login
+# -
+@app.route('/orp/orp/observable_rank/<username>', methods=['GET'])
+@app.route('/orp/observable_rank/<username>', methods=['GET'])
+@app.route('/observable_rank/<username>', methods=['GET'])
+@login_required
+def orp_observable_rank(username=''):
+    msg_out(f'/orp/observable_rank/{username} entry', True, False)
+    get_client_ip(request)
+
+    # look up user (as required)
+    _u = current_user if current_user.is_authenticated else User.query.filter_by(username=username).first_or_404()
+
+    # get telescope and night (local date, its night falls on the following UTC date at our sites)
+    _telescope = request.args.get('telescope', DEF__TELESCOPE).strip().lower()
+    if _telescope not in TEL__NAME:
+        return jsonify({'status': 400, 'message': f'Invalid telescope, choices={TEL__NAME}'})
+    try:
+        _night = datetime.datetime.strptime(request.args.get('night', get_date_time().strftime('%Y-%m-%d')), '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'status': 400, 'message': 'Invalid night, format=YYYY-MM-DD'})
+    _start = (_night + datetime.timedelta(days=1)).strftime('%Y-%m-%d 00:00:00.000000')
+    _begin_mjd = float(iso_to_mjd(_start))
+    _end_mjd = _begin_mjd + 1.0
+
+    # get active requests for this telescope (or any) that overlap the night
+    _filter = {'begin_mjd__lte': f"{_end_mjd}", 'end_mjd__gte': f"{_begin_mjd}", 'completed': 'false',
+               'username__eq': '' if _u.is_admin else f'{_u.username}'}
+    msg_out(f'/orp/observable_rank/{username} _filter={_filter}', True, False)
+    _rows = [_r for _r in obsreq2_filters(db.session.query(ObsReq2), _filter).all()
+             if _r.telescope.strip().lower() in (_telescope, 'any')]
+
+    # evaluate every target over the night in one call
+    _obs, _summary = Telescope(_telescope).observable_many(
+        [_r.ra_deg for _r in _rows], [_r.dec_deg for _r in _rows], _start, 1)
+
+    # rank by hours observable then best airmass
+    _results = []
+    for _i, _r in enumerate(_rows):
+        _ws, _we = _summary['window_start'][_i], _summary['window_end'][_i]
+        _results.append({
+            'id': _r.id, 'username': _r.username, 'object_name': decode_verboten(_r.object_name, ARTN_DECODE_DICT),
+            'ra_deg': _r.ra_deg, 'dec_deg': _r.dec_deg, 'priority': _r.priority, 'telescope': _r.telescope,
+            'hours': round(float(_summary['hours'][_i]), 3),
+            'best_airmass': None if math.isnan(_summary['best_airmass'][_i]) else round(float(_summary['best_airmass'][_i]), 3),
+            'window_start': None if math.isnan(_ws) else Time(_ws, format='mjd').isot,
+            'window_end': None if math.isnan(_we) else Time(_we, format='mjd').isot})
+    _results.sort(key=lambda _e: (-_e['hours'], _e['best_airmass'] if _e['best_airmass'] is not None else math.inf))
+
+    # return response
+    return jsonify({'telescope': _telescope, 'night': _night.strftime('%Y-%m-%d'), 'start': _start,
+                    'total': len(_results), 'observable': sum(1 for _e in _results if _e['hours'] > 0.0),
+                    'results': _results})
 
 
 # +
@@ -3145,9 +3117,8 @@ def orp_view_requests(username=''):
     msg_out(f'/orp/view_requests/{username} _u.username={_u.username}', True, False)
 
     # set default(s)
-    page = request.args.get('page', 1, type=int)
+    page = 1
     response = {}
-    paginator = None
 
     # GET request
     if request.method == 'GET':
@@ -3161,7 +3132,7 @@ def orp_view_requests(username=''):
             query = obsreq2_filters(query, {"username": f""})
         else:
             #query = obsreq_filters(query, {"username": f"{_u.username}"})
-            query = obsreq2_filters(query, {"username": f"{_u.username}"})
+            query = obsreq2_filters(query, {"username__eq": f"{_u.username}"})
 
         # request by sort_field / sort_order
         _sf = request.args.get('sort_field')
@@ -3173,14 +3144,10 @@ def orp_view_requests(username=''):
         # request by everything else
         #query = obsreq_filters(query, request.args)
         query = obsreq2_filters(query, request.args)
-        paginator = query.paginate(page, ARTN_RESULTS_PER_PAGE, True)
-        response = {
-            'total': paginator.total,
-            'pages': paginator.pages,
-            'has_next': paginator.has_next,
-            'has_prev': paginator.has_prev,
-            'results': ObsReq2.serialize_list(paginator.items)
-        }
+        try:
+            response, page = obsreq2_page(query, request.args)
+        except ValueError as _e:
+            return jsonify({'status': 400, 'message': f'{_e}'}), 400
 
     # POST request
     if request.method == 'POST':
@@ -3212,9 +3179,9 @@ def orp_view_requests(username=''):
 
     # add avatars to response dictionary
     # msg_out(f'response={response}', True, False)
+    _users = User.user_map([_e.get('username') for _e in response['results']], 16)
     for _e in response['results']:
-        _tu = User.query.filter_by(username=_e['username']).first()
-        _e['avatar'] = _e['username'] if _tu is None else _tu.get_avatar(16)
+        _e['avatar'] = _users[_e['username']][0] if _e['username'] in _users else _e['username']
         _e['object_name'] = decode_verboten(_e['object_name'], ARTN_DECODE_DICT)
 
     # return response in desired format
@@ -3226,8 +3193,74 @@ def orp_view_requests(username=''):
             _args.pop('page')
         except KeyError:
             pass
+        _args.pop('cursor', None)
         arg_str = urlencode(_args)
-        return render_template('view_requests.html', context=response, page=paginator.page, arg_str=arg_str)
+        return render_template('view_requests.html', context=response, page=page, arg_str=arg_str)
+
+
+# +
+# route(s): /orp/export_requests/<username>?format=ndjson|json, requires login
+# -
+@app.route('/orp/orp/export_requests/<username>', methods=['GET', 'POST'])
+@app.route('/orp/export_requests/<username>', methods=['GET', 'POST'])
+@app.route('/export_requests/<username>', methods=['GET', 'POST'])
+@login_required
+def orp_export_requests(username=''):
+    msg_out(f'/orp/export_requests/{username} entry', True, False)
+    get_client_ip(request)
+
+    # look up user (as required)
+    _u = current_user if current_user.is_authenticated else User.query.filter_by(username=username).first_or_404()
+
+    # one search from the query string (GET) or several as for view_requests (POST)
+    _format = request.args.get('format', 'ndjson', type=str).strip().lower()
+    if _format not in ('json', 'ndjson'):
+        return jsonify({'status': 400, 'message': f'Invalid input, format={_format}'}), 400
+    _post = request.method == 'POST'
+    _searches = request.get_json().get('queries', []) if _post else [request.args.to_dict()]
+    msg_out(f'/orp/export_requests/{username} _format={_format}, _searches={_searches}', True, False)
+
+    # non-admin users only ever see their own requests
+    def _query(_args=None):
+        _q = db.session.query(ObsReq2)
+        _q = obsreq2_filters(_q, {'username': ''} if _u.is_admin else {'username__eq': f'{_u.username}'})
+        if not _args.get('sort_field') and not _args.get('sort_order'):
+            _q = obsreq2_filters(_q, {'sort_field': 'id', 'sort_order': 'descending'})
+        return obsreq2_filters(_q, _args)
+
+    # pages of serialized records (and their exposures), memory is bounded by one page
+    def _pages(_args=None):
+        for _page in ObsReq2.serialize_stream(_query(_args)):
+            _users = User.user_map([_e.get('username') for _e in _page], 16)
+            for _e in _page:
+                _e['avatar'] = _users[_e['username']][0] if _e['username'] in _users else _e['username']
+                _e['object_name'] = decode_verboten(_e['object_name'], ARTN_DECODE_DICT)
+            yield _page
+
+    # one record per line (tagged with its search index for POST)
+    def _ndjson():
+        for _i, _args in enumerate(_searches):
+            for _page in _pages(_args):
+                yield ''.join(f'{flask_dumps(dict(_e, query=_i) if _post else _e)}\n' for _e in _page)
+
+    # the view_requests POST response shape, each count follows its results
+    def _json():
+        _total = 0
+        yield '{"results": ['
+        for _i, _args in enumerate(_searches):
+            _num = 0
+            yield f'{", " if _i > 0 else ""}{{"query": {flask_dumps(_args)}, "results": ['
+            for _page in _pages(_args):
+                yield f'{", " if _num > 0 else ""}{", ".join(flask_dumps(_e) for _e in _page)}'
+                _num += len(_page)
+            yield f'], "num_requests": {_num}}}'
+            _total += _num
+        yield f'], "total": {_total}}}'
+
+    # return streamed response
+    if _format == 'json':
+        return Response(stream_with_context(_json()), mimetype='application/json')
+    return Response(stream_with_context(_ndjson()), mimetype='application/x-ndjson')
 
 
 # +
@@ -3289,19 +3322,14 @@ def orp_view_current_queue(username='', telescope='Kuiper'):
     # look up user (as required)
     _u = current_user if current_user.is_authenticated else User.query.filter_by(username=username).first_or_404()
 
-    telescope = request.args.get('telescope')
+    telescope = request.args.get('telescope', 'Kuiper')
     view_current = request.args.get('current', False)
-    currentqueue = getCurrentQueue(telescope=telescope)
-
-    communicator = rts2comm()
-    rts2all = communicator._getall()
-    rts2_sel_values = rts2all['SEL']['d']
-    
-    executed_ids = rts2_sel_values['plan_executed_ids'][1] #list of ids
-    current_id = rts2_sel_values['current_target'][1] #just the id
-    plan_ids = rts2_sel_values['plan_ids'][1] #list of ids
 
-    executed_ids = [x for x in executed_ids if x not in [current_id]]
+    #read from the shared snapshot, not RTS2
+    rts2state = rts2_state.get(telescope)
+    executed_ids = rts2state['executed_ids'] #list of ids
+    current_id = rts2state['current_id'] #just the id
+    plan_ids = rts2state['plan_ids'] #list of ids
 
     total_rts2ids = []
     total_rts2ids.extend(executed_ids)
@@ -3341,11 +3369,10 @@ def orp_view_current_queue(username='', telescope='Kuiper'):
         obsreqs = ObsReq2.query.filter(ObsReq2.rts2_id.in_(total_rts2ids)).all()
         total_obsreqids = [x.id for x in obsreqs]
         executed_ids = [str(e) for e in executed_ids if e in total_obsreqids]
-        obsreqexps = ObsExposure.query.filter(ObsExposure.obsreqid.in_(total_obsreqids)).all()
+        obsreqexps = ObsExposure.query_grouped(total_obsreqids)
 
         obsreqs_dict = {}
         for o in obsreqs:
-            obsexps = [x for x in obsreqexps if x.obsreqid == o.id]
             status = None
             if o.rts2_id in executed_ids:
                 status = 'executed'
@@ -3354,118 +3381,57 @@ def orp_view_current_queue(username='', telescope='Kuiper'):
             if o.rts2_id == current_id:
                 status = 'current'
             
-            obsreqs_dict[o.rts2_id] = o.serialized(queuedonly=True)
+            obsreqs_dict[o.rts2_id] = o.serialized(queuedonly=True, _exposures=obsreqexps.get(o.id, []))
 
-        return render_template('view_current_queue.html', queuenight=queuenight_str, active=True, queuelist=obsreqs_dict, executed=executed_ids, planned_ids=plan_ids, current_id=[current_id], telescope=telescope, username=username)
-    return render_template('view_current_queue.html', active=False, queuenight=queuenight_str)
+        return render_template('view_current_queue.html', queuenight=queuenight_str, active=True, queuelist=obsreqs_dict, executed=executed_ids, planned_ids=plan_ids, current_id=[current_id], telescope=telescope, username=username, rts2state=rts2state)
+    return render_template('view_current_queue.html', active=False, queuenight=queuenight_str, telescope=telescope, rts2state=rts2state)
 
 
 @app.route('/orp/orp/ajax_current_queued_list')
 @app.route('/orp/ajax_current_queued_list')
 @app.route('/ajax_current_queued_list')
 def current_queued_list():
-    
-    expids = []
-    page = 0
-    num_items = 10
-    username = request.args.get('username')
-    expids_string = request.args.get('expids')
-    if expids_string is not None and expids_string is not '':
-        for r in expids_string.split(','):
-            expids.append(int(r))
-    
-    communicator = rts2comm()
-    rts2all = communicator._getall()
-    rts2_sel_values = rts2all['SEL']['d']
-    
-    executed_ids = rts2_sel_values['plan_executed_ids'][1] #list of ids
-    current_id = rts2_sel_values['current_target'][1] #just the id
-    plan_ids = rts2_sel_values['plan_ids'][1] #list of ids
 
-    executed_ids = [x for x in executed_ids if x not in [current_id]]
+    #read from the shared snapshot, not RTS2
+    rts2state = rts2_state.get(request.args.get('telescope', 'Kuiper'))
+    executed_ids = rts2state['executed_ids'] #list of ids
+    current_id = rts2state['current_id'] #just the id
+    plan_ids = rts2state['plan_ids'] #list of ids
 
     total_rts2ids = []
     total_rts2ids.extend(executed_ids)
     total_rts2ids.extend([current_id])
     total_rts2ids.extend(plan_ids)
 
-    around_dates = [
-        (datetime.datetime.now()-datetime.timedelta(days=1)).strftime("%Y-%m-%d"),
-        datetime.datetime.now().strftime("%Y-%m-%d"),
-        (datetime.datetime.now()+datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-    ]
-    
     obsreqs = ObsReq2.query.filter(ObsReq2.rts2_id.in_(total_rts2ids)).all()
-    total_obsreqids = [x.id for x in obsreqs]
-    total_obsreq_rts2ids = [x.rts2_id for x in obsreqs]
-    #executed_ids = list(set([e for e in executed_ids if e in total_obsreq_rts2ids]))
-    obsreqexps = ObsExposure.query.filter(ObsExposure.obsreqid.in_(total_obsreqids)).all()
+    obsreqexps = ObsExposure.query_grouped([x.id for x in obsreqs])
 
     obsreqs_dict = {}
     for o in obsreqs:
-        obsexps = [x for x in obsreqexps if x.obsreqid == o.id]
-        status = None
-        if o.rts2_id in executed_ids:
-            status = 'executed'
-        if o.rts2_id in plan_ids:
-            status = 'planned'
-        if o.rts2_id == current_id:
-            status = 'current'
-
-        obsreqs_dict[o.rts2_id] = o.serialized(queuedonly=True)
-
-    html = '''
-    <table class="table table-striped table-lg">
-        <thead>
-            <tr>
-                <th><font color="blue">Exp Info</font></th>
-                <th><font color="blue">Object</font></th>
-                <th><font color="blue">RA</font></th>
-                <th><font color="blue">Dec</font></th>
-                <th><font color="blue">Start (est)</font></th>
-                <th><font color="blue">End (est)</font></th>
-                <th><font color="blue">Overhead</font></th>
-                <th><font color="blue">Status(%)</font></th>
-                <th><font color="blue">Requeue Request</font></th>
-            </tr>
-            <tr>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center>J2k &deg;</center></font></th>
-                <th><font color="grey"><center>J2k &deg;</center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-            </tr>
-        </thead>
-        <tbody>
-    '''
-
-    html += get_current_queue_table(executed_ids, obsreqs_dict, 'table-success', expids, username)
-    html += get_current_queue_table([current_id], obsreqs_dict, 'table-primary', expids, username)
-    html += get_current_queue_table(plan_ids, obsreqs_dict, 'table-warning', expids, username)
-
-    html += '''
-        </tbody>
-    </table>
-    '''
+        obsreqs_dict[o.rts2_id] = o.serialized(queuedonly=True, _exposures=obsreqexps.get(o.id, []))
 
+    #the browser renders the table, the snapshot time changes on every poll so it is sent as headers
     payload = {
-        'qt_html':html
+        'rows':current_queue_rows(executed_ids, obsreqs_dict, 'executed') +
+               current_queue_rows([current_id], obsreqs_dict, 'current') +
+               current_queue_rows(plan_ids, obsreqs_dict, 'planned')
     }
 
-    return payload
+    return versioned_json(payload, {
+        'X-RTS2-Updated':rts2state['updated'],
+        'X-RTS2-Age':rts2state['age'],
+        'X-RTS2-Error':rts2state['error']
+    })
 
 
 @app.route('/orp/orp/ajax_bigartn_queue')
 @app.route('/orp/ajax_bigartn_queue')
 @app.route('/ajax_bigartn_queue')
 def bigartn_queue_query():
-    telescope = request.args.get('telescope')
-    
-    canInterrupt = len(getCurrentQueue(telescope=telescope)) > 0
+    telescope = request.args.get('telescope', 'Kuiper')
+
+    rts2state = rts2_state.get(telescope)
+    canInterrupt = len(rts2state['queue_ids']) > 0
 
     if canInterrupt:
         html = "<b><font color='red'>There is a queue already submitted. Re-Submitting will overwrite/interrupt the queue</font></b>"
@@ -3474,8 +3440,11 @@ def bigartn_queue_query():
 
     payload = {
         "canInterrupt" : canInterrupt,
-        "canCommunicate" : True,
-        "html" : html
+        "canCommunicate" : rts2state['error'] == '',
+        "html" : html,
+        "updated" : rts2state['updated'],
+        "age" : rts2state['age'],
+        "error" : rts2state['error']
     }
 
     return payload
@@ -3486,34 +3455,21 @@ def bigartn_queue_query():
 @app.route('/ajax_queued_list')
 def queued_list_query(night=None, completed=False, day_buffer=1):
     
-    expids = []
     page = 0
     num_items = 10
-    username = request.args.get('username')
+    name_query = None
     if night is None:
-        night = request.args.get('night')
-        night = datetime.datetime.strptime(night, "%Y-%m-%d")
-    
-        completed = request.args.get('completed')
         day_buffer = request.args.get('day_buffer')
         try:
             day_buffer = int(day_buffer)
         except:
             day_buffer = 1
-        
-        expids_string = request.args.get('expids')
-        if expids_string is not None and expids_string is not '':
-            for r in expids_string.split(','):
-                expids.append(int(r))
 
         page = request.args.get('page')
         page = int(page) if page is not None else 0
 
         name_query = request.args.get('name_query')
 
-    skip = page*num_items
-    take = skip+num_items
-
     queued_iso_begin = datetime.datetime.now() - datetime.timedelta(days=day_buffer)
     queued_iso_end = datetime.datetime.now() + datetime.timedelta(days=1)
 
@@ -3527,133 +3483,27 @@ def queued_list_query(night=None, completed=False, day_buffer=1):
     if name_query is not None and name_query != '':
         query_filter.append(ObsReq2.object_name.contains(name_query))
 
-    obsreqs = ObsReq2.query.filter(*query_filter).order_by(
-        ObsReq2.ra_hms
-    ).all()
-
-    obsreqids = [x.id for x in obsreqs]
-
-    exposures = ObsExposure.query.filter(ObsExposure.obsreqid.in_(obsreqids)).all()
-
-    targets = format_orp_targets(obsreqs, exposures)
-    targets = sorted(targets, key=attrgetter('ra'))
-
-    num_pages = int(len(targets)/num_items)
-    if len(targets) % num_items != 0:
+    #only the requested page is read (and its exposures), the browser renders the table. the order is the one the
+    #targets used to be sorted into in python (ra_hms by code point, hence COLLATE "C"), the id makes it total so
+    #OFFSET/LIMIT pages neither repeat nor skip rows between polls and each page's version is stable
+    query = ObsReq2.query.filter(*query_filter).order_by(ObsReq2.ra_hms.collate('C'), ObsReq2.id)
+    total = query.count()
+    num_pages = int(total/num_items)
+    if total % num_items != 0:
         num_pages += 1
 
-    html = '''
-    <table class="table table-striped table-lg">
-        <thead>
-            <tr>
-                <th><font color="blue">Exp Info</font></th>
-                <th><font color="blue">Object</font></th>
-                <th><font color="blue">RA</font></th>
-                <th><font color="blue">Dec</font></th>
-                <th><input id='checkalltargs' type=checkbox onclick="doEmAll(this.id)"><font color="blue"> Queue (all exps)</font></th>
-            </tr>
-            <tr>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-                <th><font color="grey"><center>J2k &deg;</center></font></th>
-                <th><font color="grey"><center>J2k &deg;</center></font></th>
-                <th><font color="grey"><center> </center></font></th>
-            </tr>
-        </thead>
-    <tbody>
-    '''
-
-    for t in targets[skip:take]:
-        t_expids = [x.expid for x in t.exp_objs]
-        allchecked = ' checked' if all([tid in expids for tid in t_expids]) else ''
-
-        nameid = t.name
-        if '+' in t.name:
-            nameid = t.name.replace('+', '')
-
-        html += '''
-        <tr>
-            <td><button id="collbtn{}" onclick="changeCollapseButtonText(this.id)" type="button" class="btn btn-primary btn-xs arrow-right" data-toggle="collapse" data-target="#collapse{}"></button></td>
-            <td><a href="/orp/obsreq2/{}?obsreqid={}&return_page=orp_manage_queue">{}</a></td>
-            <td>{}</td>
-            <td>{}</td>
-            <td><input id="queuetarg_{}" type="checkbox" onclick="objectCheckAll(this.id)"{}></td>
-        </tr>
-        '''.format(nameid,nameid,username,t.id,t.name,t.ra,t.dec, nameid, allchecked)
-        html+= '''
-        <tr class="collapse" id="collapse{}">
-            <td colspan="999">
-                <div>
-                    <table class="table table-striped table-sm">
-                        <thead>
-                            <tr>
-                                <td><font color='blue'>Filter</font></td>
-                                <td><font color='blue'>Exptime (s)</font></td>
-                                <td><font color='blue'>Num Exp</font></td>
-                                <td><font color='blue'>Queue</font><td>
-                            </tr>
-                        </thead>
-                        <tbody>
-        '''.format(nameid)
-        #href="{{ url_for('orp_update') }}?dbid={}"
-        for obsinfo in t.exp_objs:
-            thischecked = ' checked' if obsinfo.expid in expids else ''
-            html+='''
-                                <tr>
-                                    <td>{}</td>
-                                    <td>{}</td>
-                                    <td>{}</td>
-                                    <td><input value="{}" id="{}_{}" type="checkbox" onclick="expCheckOne(this.id)"{}></td>
-                                </tr>
-            '''.format(obsinfo.filter, obsinfo.exptime, obsinfo.amount, obsinfo.expid, nameid, obsinfo.expid, thischecked)
-        html += '''
-                            </tbody>
-                        </table>
-                    </div>
-                </td>
-            </tr>
-        '''
-    html+='''
-        </tbody>
-    </table>
-     <div class="row">
-      <div class="col">
-       <div align="left">
-    '''
-    if page != 0:
-        prevpage = page-1
-        html+='<a onclick="paginateTargetsTable({})" class="btn btn-outline-secondary">Prev</a>'.format(prevpage)
-    else:
-        html+='<a href="#" class="btn btn-outline-secondary disabled">Prev</a>'
-    html += '''
-       </div>
-      </div>
-
-      <div class="col-md-8">
-       <div align="center">
-        {} record(s) found. Showing page {} / {}.
-       </div>
-      </div>
-
-      <div class="col">
-       <div align="right">
-    '''.format(len(targets),page+1,num_pages)
-    if page != num_pages-1:
-        nextpage = page+1
-        html+='<a onclick="paginateTargetsTable({})" class="btn btn-outline-secondary">Next</a>'.format(nextpage)
-    else:
-        html+='<a href="#" class="btn btn-outline-secondary disabled">Next</a>'
-    html+='''
-       </div>
-      </div>
-     </div>
-    '''
+    obsreqs = query.offset(page*num_items).limit(num_items).all()
+    exposures = ObsExposure.serialize_grouped([x.id for x in obsreqs])
 
     payload = {
-        'qt_html':html
+        'rows':[{'id':o.id, 'name':o.object_name, 'ra':o.ra_hms, 'dec':o.dec_dms,
+                 'exposures':queue_exposure_rows(exposures.get(o.id, []))} for o in obsreqs],
+        'page':page,
+        'num_pages':num_pages,
+        'total':total
     }
 
-    return payload
+    return versioned_json(payload)
 
 
 @app.route('/orp/orp/ajax_run_scheduler')
@@ -3750,15 +3600,53 @@ def populate_queue():
     queue_type = int(request.args.get('queue_type'))
 
     nightstr = request.args.get('night')
-    night = datetime.datetime.strptime(nightstr, "%Y-%m-%d")
+    datetime.datetime.strptime(nightstr, "%Y-%m-%d")
     
-    if exposureids_string != '':
+    if exposureids_string:
         for r in exposureids_string.split(','):
             exposureids.append(int(r))
 
+    if telescope != 'Kuiper':
+        payload = {
+            'message':'Telescope Queue system not yet implemented'
+        }
+        return make_response(payload, 200)
+
+    #scheduling and the RTS2 round trips run as a job, the browser polls /orp/jobs/<id> for progress
+    #one submission at a time: two concurrent diffs against the same RTS2 queue would both append
+    try:
+        _job = jobs.submit('populate_queue', {
+            'expids': exposureids, 'telescope': telescope, 'schedule_focus': schedule_focus, 'interrupt': interrupt,
+            'simulate': simulate, 'queue_type': queue_type, 'night': nightstr},
+            current_user.username if current_user.is_authenticated else '')
+    except JobBusy as _e:
+        payload = {
+            'message':f'{_e}, please wait for it to finish'
+        }
+        return make_response(payload, 409)
+    payload = {
+        'message':'Submitting to RTS2',
+        'job':_job,
+        'url':url_for('orp_job', job_id=_job)
+    }
+    return make_response(payload, 202)
+
+
+# +
+# function: populate_queue_job()
+# -
+def populate_queue_job(_payload=None, _progress=None):
+    """ schedules the exposures and sends the queue changes to RTS2, run by the job queue workers """
+    exposureids = list(_payload['expids'])
+    telescope = _payload['telescope']
+    interrupt = _payload['interrupt']
+    queue_type = _payload['queue_type']
+    nightstr = _payload['night']
+    night = datetime.datetime.strptime(nightstr, "%Y-%m-%d")
+
+    _progress(0.05, 'Selecting exposures')
     if interrupt:
-        q = getCurrentQueue(telescope=telescope)
-        rts2ids = [x.id for x in q]
+        rts2ids = rts2_state.refresh(telescope)['queue_ids']
         interruptable_obsrqsids = db.session.query(ObsReq2.id).filter(
             ObsReq2.rts2_id.in_(rts2ids)
         ).all()
@@ -3786,70 +3674,73 @@ def populate_queue():
 
     targets = format_orp_targets(obsreqs, scheduled_exposures)
 
-    if telescope == 'Kuiper':
-        big2 = astropy.coordinates.EarthLocation.of_site('mtbigelow')
+    _progress(0.1, f'Scheduling {len(targets)} target(s)')
+    big2 = astropy.coordinates.EarthLocation.of_site('mtbigelow')
 
-        scheduler = ARTNScheduler(targets, big2, night, schedule_focus, simulate, queue_type)
+    scheduler = ARTNScheduler(targets, big2, night, _payload['schedule_focus'], _payload['simulate'], queue_type)
 
-        scheduler.run()
-        scheduler.logdump()
-        
-        #try:
-        success = scheduler.submit_queue()
-        if success:
-
-            db_nightlyqueue = NightlyQueue(
-                night = nightstr,
-                telescope = telescope,
-                submitted = True,
-                interrupt = interrupt,
-                queuetype = queue_type,
-            )
-            db.session.add(db_nightlyqueue)
-            db.session.flush()
+    scheduler.run()
+    scheduler.logdump()
 
-            for targ in scheduler.scheduled_targets:
-                db_nightlyqueueobj = NightlyQueueExposure(
-                    nightlyqueueid = db_nightlyqueue.id,
-                    queueorder = targ.order,
-                    obsreqid = targ.id,
-                    rts2_id = targ.rts2id,
-                    overhead = targ.overhead,
-                    starttime = targ.db_starttime,
-                    endtime = targ.db_endtime,
-                    rts2start_t = targ.rts2start_t,
-                    rts2end_t = targ.rts2end_t,
-                    schedule_log = targ.db_log,
-                )
-                db.session.add(db_nightlyqueueobj)
+    _progress(0.4, 'Submitting to RTS2')
+    success = scheduler.submit_queue(progress=lambda _f, _m='': _progress(0.4 + 0.5 * _f, _m))
+    if not success:
+        raise Exception(f'Error in submitting to RTS2: {scheduler.log[-1]}')
+
+    db_nightlyqueue = NightlyQueue(
+        night = nightstr,
+        telescope = telescope,
+        submitted = True,
+        interrupt = interrupt,
+        queuetype = queue_type,
+    )
+    db.session.add(db_nightlyqueue)
+    db.session.flush()
+
+    for targ in scheduler.scheduled_targets:
+        db_nightlyqueueobj = NightlyQueueExposure(
+            nightlyqueueid = db_nightlyqueue.id,
+            queueorder = targ.order,
+            obsreqid = targ.id,
+            rts2_id = targ.rts2id,
+            overhead = targ.overhead,
+            starttime = targ.db_starttime,
+            endtime = targ.db_endtime,
+            rts2start_t = targ.rts2start_t,
+            rts2end_t = targ.rts2end_t,
+            schedule_log = targ.db_log,
+        )
+        db.session.add(db_nightlyqueueobj)
 
-            payload = {
-                'message':'Success'
-            }
+    #set-based writes so the transaction holding the queue rows stays short however long the night
+    db.session.query(ObsExposure).filter(ObsExposure.id.in_([se.id for se in scheduled_exposures])).update(
+        {ObsExposure.completed: False, ObsExposure.queued: True}, synchronize_session='evaluate')
+    db.session.flush()
 
-            for se in scheduled_exposures:
-                se.completed = False
-                se.queued = True
-            db.session.flush()
+    queued_exposures = ObsExposure.query_grouped(
+        obsreqsids, ObsExposure.queued == True, ObsExposure.completed == False)
+    ObsReq2.update_rts2_docs(obsreqs, queued_exposures)
+    db.session.commit()
 
-            for obsr in obsreqs:
-                obsr.stellar_dictify()
-            db.session.commit()
-        else:
-            payload = {
-                'message':'Error in submitting to RTS2'
-            }
-        
-        #except:
-        #    payload = {
-        #        'message':'Error in submitting to RTS2'
-        #    }
-    else:
-        payload = {
-            'message':'Telescope Queue system not yet implemented'
-        }
+    #the queue changed, so every worker should see it now rather than at the next poll
+    rts2_state.refresh(telescope)
 
-    return make_response(payload, 200)
+    return dict(scheduler.submitted, message='Success', nightlyqueueid=db_nightlyqueue.id)
+
+
+#not idempotent over time: a submission orphaned by a recycled worker is failed, not replayed later
+jobs.register('populate_queue', populate_queue_job, recover=False, single=True)
+
+
+# +
+# function: start_workers()
+# -
+@app.before_first_request
+def start_workers():
+    """ starts the job workers (after their recovery pass) and the rts2 state poller in a serving process only,
+        so importing this module (utils/, migrations, python -c) never touches another process's jobs """
+    jobs.start()
+    rts2_state.start()
 
 
 @app.route('/orp/orp/ajax_tnsloadtarget')
@@ -4527,4 +4418,5 @@ def dataconvert_obsreq2(username=''):
 # main()
 # -
 if __name__ == '__main__':
+    start_workers()
     app.run(host=os.getenv("ORP_APP_HOST"), port=int(os.getenv("ORP_APP_PORT")), threaded=True, debug=False)
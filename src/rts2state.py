@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from contextlib import contextmanager
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    A shared snapshot of RTS2 queue and target state: one process at a time holds the poller lease and
+    reads RTS2 every RTS2__POLL seconds into a SQLite table, every web worker answers browser polls from
+    that table instead of opening its own RTS2 connection.
+
+    from src.rts2state import Rts2State
+    rts2_state = Rts2State(fetch=lambda telescope: {'plan_ids': [...], ...})
+    rts2_state.start()
+    rts2_state.get('Kuiper')        # {'plan_ids': [...], ..., 'updated': 1697600000.0, 'age': 3.2, 'error': ''}
+    rts2_state.refresh('Kuiper')    # after a queue submission
+
+    % python3 -m src.rts2state show --help
+
+"""
+
+
+# +
+# constant(s)
+# -
+RTS2__DB = os.getenv('ORP_RTS2_STATE', f"{os.getenv('ORP_HOME', '.')}/instance/rts2_state.sqlite")
+RTS2__EMPTY = {'executed_ids': [], 'current_id': None, 'plan_ids': [], 'queue_ids': []}
+RTS2__POLL = float(os.getenv('ORP_RTS2_POLL', 15.0))
+RTS2__STALE = 4.0
+RTS2__TELESCOPES = [_t.strip() for _t in os.getenv('ORP_RTS2_TELESCOPES', 'Kuiper').split(',') if _t.strip()]
+RTS2__SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    telescope TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT '{}',
+    error TEXT NOT NULL DEFAULT '',
+    updated REAL NOT NULL DEFAULT 0.0,
+    checked REAL NOT NULL DEFAULT 0.0
+);
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL DEFAULT '',
+    expires REAL NOT NULL DEFAULT 0.0
+);
+"""
+
+
+# +
+# class: Rts2State()
+# -
+class Rts2State(object):
+    """ RTS2 state snapshot shared by all workers, refreshed by a single leased poller """
+
+    def __init__(self, fetch=None, path=RTS2__DB, poll=RTS2__POLL, telescopes=None):
+        self.fetch = fetch
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.poll = max(1.0, float(poll))
+        self.telescopes = list(telescopes if telescopes is not None else RTS2__TELESCOPES)
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.__thread = None
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+        self.__fetching = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.__connect() as _c:
+            _c.execute('PRAGMA journal_mode=WAL')
+            _c.executescript(RTS2__SCHEMA)
+
+    @contextmanager
+    def __connect(self):
+        _c = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            yield _c
+        finally:
+            _c.close()
+
+    # +
+    # method: get()
+    # -
+    def get(self, telescope='Kuiper'):
+        """ returns the snapshot with 'updated', 'age' and 'error', reading RTS2 only if it is missing or stale """
+        _row = self.__read(telescope)
+        if _row is None or time.time() - _row['checked'] > RTS2__STALE * self.poll:
+            return self.refresh(telescope)
+        return _snapshot(_row)
+
+    # +
+    # method: refresh()
+    # -
+    def refresh(self, telescope='Kuiper'):
+        """ reads RTS2 now and stores the snapshot, the last good state is kept (and served) on error """
+        with self.__fetching:
+            _old = self.__read(telescope) or {'state': dict(RTS2__EMPTY), 'updated': 0.0}
+            _now = time.time()
+            # noinspection PyBroadException
+            try:
+                _state, _error, _updated = dict(RTS2__EMPTY, **self.fetch(telescope)), '', _now
+            except Exception as _e:
+                _state, _error, _updated = _old['state'], f'{_e}', _old['updated']
+            with self.__connect() as _c:
+                _c.execute('INSERT OR REPLACE INTO snapshots (telescope, state, error, updated, checked) '
+                           'VALUES (?, ?, ?, ?, ?)', (telescope, json.dumps(_state), _error, _updated, _now))
+        return _snapshot({'state': _state, 'error': _error, 'updated': _updated, 'checked': _now})
+
+    # +
+    # method: snapshots()
+    # -
+    def snapshots(self):
+        """ returns {telescope: snapshot} for everything stored, without reading RTS2 """
+        with self.__connect() as _c:
+            _rows = _c.execute('SELECT telescope, state, error, updated, checked FROM snapshots').fetchall()
+        return {_t: _snapshot({'state': json.loads(_s), 'error': _e, 'updated': _u, 'checked': _k})
+                for _t, _s, _e, _u, _k in _rows}
+
+    # +
+    # method: start()
+    # -
+    def start(self):
+        """ starts this process's poller thread, it only reads RTS2 while it holds the lease """
+        with self.__lock:
+            if self.__thread is not None:
+                return self
+            self.__stop.clear()
+            self.__thread = threading.Thread(name='rts2_state_poller', target=self.__poll, daemon=True)
+            self.__thread.start()
+        return self
+
+    # +
+    # method: stop()
+    # -
+    def stop(self, wait=True):
+        """ stops the poller and gives up the lease """
+        self.__stop.set()
+        if wait and self.__thread is not None:
+            self.__thread.join()
+        self.__thread = None
+        with self.__connect() as _c:
+            _c.execute("UPDATE lease SET expires = 0.0 WHERE name = 'poller' AND owner = ?", (self.owner,))
+
+    # +
+    # method: __read()
+    # -
+    def __read(self, telescope=''):
+        with self.__connect() as _c:
+            _r = _c.execute('SELECT state, error, updated, checked FROM snapshots WHERE telescope = ?',
+                            (telescope,)).fetchone()
+        if _r is None:
+            return None
+        return {'state': json.loads(_r[0]), 'error': _r[1], 'updated': _r[2], 'checked': _r[3]}
+
+    # +
+    # method: __lease()
+    # -
+    def __lease(self):
+        """ takes or renews the poller lease, returns True if this process should poll """
+        _now = time.time()
+        with self.__connect() as _c:
+            _c.execute("INSERT OR IGNORE INTO lease (name, owner, expires) VALUES ('poller', '', 0.0)")
+            return _c.execute("UPDATE lease SET owner = ?, expires = ? WHERE name = 'poller' AND "
+                              "(owner = ? OR expires < ?)", (self.owner, _now + 2.0 * self.poll,
+                                                             self.owner, _now)).rowcount == 1
+
+    # +
+    # method: __poll()
+    # -
+    def __poll(self):
+        while not self.__stop.is_set():
+            # noinspection PyBroadException
+            try:
+                if self.__lease():
+                    for _t in self.telescopes:
+                        self.refresh(_t)
+            except Exception:
+                pass
+            self.__stop.wait(self.poll)
+
+
+# +
+# function: _snapshot()
+# -
+def _snapshot(row=None):
+    """ flattens a stored row into the state plus 'updated' (epoch seconds), 'age' (seconds) and 'error' """
+    _d = dict(RTS2__EMPTY, **row['state'])
+    _d['updated'] = row['updated']
+    _d['age'] = max(0.0, time.time() - row['updated']) if row['updated'] > 0.0 else None
+    _d['error'] = row['error']
+    return _d
+
+
+# +
+# command line wrappers()
+# -
+def _rts2state_show(iargs=None):
+    if iargs is not None:
+        print(json.dumps(Rts2State(path=iargs.database, telescopes=[]).snapshots(), indent=2))
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'RTS2 State Snapshot', formatter_class=argparse.RawTextHelpFormatter)
+    _sp = _p.add_subparsers()
+
+    # add sub-parser for Rts2State().snapshots()
+    _sp_0 = _sp.add_parser('show', description="Show the stored snapshot(s) and their age",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_0.add_argument(f'--database', default=RTS2__DB, help=f"Snapshot database, default=%(default)s")
+    _sp_0.set_defaults(func=_rts2state_show)
+
+    # noinspection PyBroadException
+    try:
+        args = _p.parse_args()
+        args.func(args)
+    except Exception:
+        print(f'Use: python3 {sys.argv[0]}\n--help for more information')
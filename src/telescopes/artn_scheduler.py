@@ -18,7 +18,8 @@ from operator import itemgetter, attrgetter
 from random import randint
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.orm import sessionmaker
-from rts2solib import rts2comm, queue
+from src.telescopes.rts2 import rts2comm, queue
+from src.telescopes.ephemeris import ephemeris_grid, ephemeris_moon, scheduler_start
 # from rts2solib import scriptcomm
 
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
@@ -70,10 +71,13 @@ class queue_obj:
 
 	def set_altaz(self, frame, setpeak=False):
 		self.altaz = self.skycoord.transform_to(frame)
-		airmasses = []
-		for aa in self.altaz.secz:
-			if aa > 1:
-				airmasses.append(aa)
+		self.set_airmass(np.asarray(self.altaz.secz), setpeak)
+
+
+	def set_airmass(self, secz, setpeak=False):
+		#secz is a precomputed airmass array for this target over the frame times
+		#	(see queue_altaz_engine) so no coordinate transform is needed here
+		airmasses = secz[secz > 1]
 
 		if len(airmasses):
 			if setpeak:
@@ -115,11 +119,16 @@ class queue_obj:
 		self.overhead = t
 		return t
 
-	def evaluate_constraints(self, time, location, log):
+	def evaluate_constraints(self, time, location, log, moon_sep=None):
 		if self.constraints is not None:
 			if self.constraints.moon_distance_threshold is not None:
-				moon = astropy.coordinates.get_moon(time=time, location=location)
-				sep = self.skycoord.separation(moon)/u.deg
+				#moon_sep (degrees) is passed in when the moon has been precomputed
+				#	for the night, otherwise compute the moon for this time
+				if moon_sep is None:
+					moon = astropy.coordinates.get_moon(time=time, location=location)
+					sep = self.skycoord.separation(moon)/u.deg
+				else:
+					sep = moon_sep
 				#print('Evaluating constraints moon distance: {}, {}>{}'.format(
 				#	self.name,
 				#	sep,
@@ -148,6 +157,54 @@ class queue_obj:
 			self.constrained_visible = True
 
 
+class queue_altaz_engine:
+	'''Batched alt/az: one transform for all targets, frame airmass is a slice'''
+	def __init__(self, frame_night):
+		self.frame_night = frame_night
+		self.targets = []
+		self.rows = {}
+		self.ra = np.empty(0)
+		self.dec = np.empty(0)
+		self.secz = np.empty((0, len(frame_night.obstime)))
+
+	def add_targets(self, targets):
+		new_targets = [t for t in targets if id(t) not in self.rows]
+		if not len(new_targets):
+			return
+
+		ra = np.array([t.skycoord.ra.deg for t in new_targets])
+		dec = np.array([t.skycoord.dec.deg for t in new_targets])
+
+		#shape (N, 1) coordinates broadcast against the (T,) obstime grid -> (N, T)
+		skycoords = astropy.coordinates.SkyCoord(ra=ra[:, None]*u.deg, dec=dec[:, None]*u.deg)
+		secz = np.asarray(skycoords.transform_to(self.frame_night).secz)
+
+		base = self.secz.shape[0]
+		for i, t in enumerate(new_targets):
+			self.rows[id(t)] = base + i
+			self.targets.append(t)
+		self.ra = np.concatenate((self.ra, ra))
+		self.dec = np.concatenate((self.dec, dec))
+		self.secz = np.vstack((self.secz, secz))
+
+	def airmass(self, target, idx=None):
+		self.add_targets([target])
+		row = self.secz[self.rows[id(target)]]
+		return row if idx is None else row[idx]
+
+	def set_airmass(self, targets, idx=None, setpeak=False):
+		self.add_targets(targets)
+		for t in targets:
+			t.set_airmass(self.airmass(t, idx), setpeak)
+
+	def separation(self, targets, coord):
+		#angular separation (degrees) of every target from coord in one vectorized call
+		self.add_targets(targets)
+		rows = [self.rows[id(t)] for t in targets]
+		skycoords = astropy.coordinates.SkyCoord(ra=self.ra[rows]*u.deg, dec=self.dec[rows]*u.deg)
+		return np.asarray(skycoords.separation(coord).deg)
+
+
 class exp_obj:
 	def __init__(self, amount, filter, exptime, expid=None, obsreqid=None):
 		self.amount = amount
@@ -188,12 +245,18 @@ def orp_targets(queued_iso=datetime.datetime(2021, 3, 22)):
 	return format_orp_targets(db_resp)
 
 def format_orp_targets(obsreqs, exposures):
-	'''Dirty way to group obsreqs'''
+	'''Group exposures under their obsreqs: exposures is a list, or a dict already keyed by obsreqid'''
+
+	#one pass over the exposures instead of a scan per obsreq
+	if not isinstance(exposures, dict):
+		grouped = {}
+		for x in exposures:
+			grouped.setdefault(x.obsreqid, []).append(x)
+		exposures = grouped
 
-	
 	return_data = []
 	for ob in obsreqs:
-		exp_reqs = [x for x in exposures if x.obsreqid == ob.id]
+		exp_reqs = exposures.get(ob.id, [])
 		observation_infos = []
 		expids = []
 		for e in exp_reqs:
@@ -238,6 +301,49 @@ def getCurrentQueue(telescope='Kuiper', queuename='plan'):
 	return []
 
 
+def queue_time(t):
+	try:
+		return int(float(t))
+	except (TypeError, ValueError):
+		return None
+
+
+def queue_diff(current, desired):
+	""" returns (clear, append): RTS2 queues can only be cleared or appended to, so keep the longest common prefix """
+	current = [(e['id'], queue_time(e['start']), queue_time(e['end'])) for e in current]
+	desired = [(e['id'], queue_time(e['start']), queue_time(e['end'])) for e in desired]
+	if current == desired[:len(current)]:
+		return False, desired[len(current):]
+	return True, desired
+
+
+def submit_queue_entries(entries, queue_type=0, set_queue='plan', progress=None):
+	""" sends only the changes between the RTS2 queue and entries [{'id', 'start', 'end'}, ...], in order """
+	q = queue.Queue(set_queue)
+	q.load()
+	calls = 1
+	if q.queueing != queue_type:
+		#0 is FIFO
+		#5 is SET_TIMES
+		q.queueing = queue_type
+		q.save()
+		calls += 1
+	current = [{'id':e.id, 'start':getattr(e, 'start', None), 'end':getattr(e, 'end', None)} for e in q.entries]
+	clear, append = queue_diff(current, entries)
+	if clear:
+		q.clear()
+		calls += 1
+	for i, (rts2id, start, end) in enumerate(append):
+		if start is None and end is None:
+			q.add_target(rts2id)
+		else:
+			q.add_target(rts2id, start=start, end=end)
+		calls += 1
+		if progress is not None:
+			progress((i + 1) / len(append), 'queued {} of {} target(s)'.format(i + 1, len(append)))
+	return {'cleared':clear, 'kept':len(entries) - len(append), 'added':len(append), 'calls':calls}
+
+
 class FFTarget():
 
     def __init__(self, targ, frame):
@@ -313,6 +419,7 @@ class ARTNScheduler():
 		self.scheduled_focus = schedule_focus
 		self.simulate = simulate
 		self.queue_type = queue_type
+		self.submitted = {}
 
 		self.delta_midnight = np.linspace(-12, 12, 1000)
 		day_times = self.midnight + self.delta_midnight*u.hour
@@ -322,20 +429,26 @@ class ARTNScheduler():
 			location=self.location
 		)
 
-		self.sun_altaz = astropy.coordinates.get_sun(day_times).transform_to(self.frame_night)
-		self.moon_altaz = astropy.coordinates.get_moon(day_times).transform_to(self.frame_night)
+		#sun and moon for the whole night, computed once and reused by the constraint checks
+		#	read from the nightly ephemeris cache (prewarmed by cron) instead of recomputed
+		self.ephemeris = ephemeris_grid(self.location, scheduler_start(night, utcoffset), 1.0, len(self.delta_midnight))
+		self.sun_alt = self.ephemeris['sun_alt']
+		self.moon_coords = ephemeris_moon(self.ephemeris, self.location, day_times)
+		self.moon_secz = 1.0/np.cos(np.radians(90.0 - self.ephemeris['moon_alt']))
+		self.altaz_engine = queue_altaz_engine(self.frame_night)
 		
 		self.nightrange = []
 		self.sun_alt_beforemid = []
 		self.astronomical_night = []
-		for i,x in enumerate(self.sun_altaz.alt < 5*u.deg):
+		for i,x in enumerate(self.sun_alt < 5):
 			if x:
 				self.nightrange.append(self.delta_midnight[i])
 				self.sun_alt_beforemid.append(x)
 		
-		for i,x in enumerate(self.sun_altaz.alt < -15*u.deg):
+		for i,x in enumerate(self.sun_alt < -15):
 			if x:
 				self.astronomical_night.append(self.delta_midnight[i])
+		self.astronomical_night_idx = np.flatnonzero(self.sun_alt < -15)
 
 		self.scheduled_targets = []
 		self.encoded_chart = ''
@@ -352,7 +465,8 @@ class ARTNScheduler():
 		self.log.append('Starting Scheduler for {}!'.format(self.night))
 
 		#Setting the peak airmass for all targets throughout the night
-		[t.set_altaz(self.frame_night, True) for t in self.targets]
+		#	one batched transform for every target against the night grid
+		self.altaz_engine.set_airmass(self.targets, setpeak=True)
 
 		interval_run = 'half-hour'
 
@@ -426,8 +540,10 @@ class ARTNScheduler():
 			#	else: get the appropriate slice
 			if (ni+1) == intervals:
 				frame_hours = self.midnight + frames_range[ni*slices:]
+				frame_idx = self.astronomical_night_idx[ni*slices:]
 			else:
 				frame_hours = self.midnight + frames_range[ni*slices:(ni+1)*slices]
+				frame_idx = self.astronomical_night_idx[ni*slices:(ni+1)*slices]
 
 			if not len(frame_hours):
 				break
@@ -437,13 +553,8 @@ class ARTNScheduler():
 			#if the obstime inside the frame, begin scheduling
 			if obs_time <= frame_hours[-1] and obs_time >= frame_hours[0]:
 					
-				#create a new frame based on the frame_hour slice
-				#	and evaluate the altaz for each target in this frame
-				frame = astropy.coordinates.AltAz(
-					obstime=frame_hours,
-					location=self.location
-				)
-
+				#the frame_hour slice is a subset of the night grid, so the altaz
+				#	for each target in this frame is a slice of the engine's airmass array
 				focus_frame = astropy.coordinates.AltAz(
 					obstime=frame_hours[0],
 					location=self.location
@@ -455,17 +566,19 @@ class ARTNScheduler():
 					if ni == 0 or forcefocus:
 						try:
 							focus_field = FocusRunDecider(focus_frame, self.frame_night)
-							focus_field.set_altaz(self.frame_night, setpeak=True)
+							self.altaz_engine.add_targets([focus_field])
 							unscheduled_targets.append(focus_field)
 							forcefocus = False
 						except:
 							self.log.append('Error in communication with the ARTN Kuiper computer')
 
-				[t.set_altaz(frame) for t in unscheduled_targets]
+				self.altaz_engine.set_airmass(unscheduled_targets, frame_idx)
 
 				#do something with constraints: boolean observable = T/F?
-				for t in unscheduled_targets:
-					t.evaluate_constraints(frame_hours[0], self.location, self.log)
+				#	frame_hours[0] is a night grid sample so the moon is a table lookup
+				moon_seps = self.altaz_engine.separation(unscheduled_targets, self.moon_coords[frame_idx[0]])
+				for t, moon_sep in zip(unscheduled_targets, moon_seps):
+					t.evaluate_constraints(frame_hours[0], self.location, self.log, moon_sep)
 					#t.evaluate_constraints(frame_hours[int(len(frame_hours)/2)], self.location, self.log)
 					
 				constrained_targets = [t for t in unscheduled_targets if t.constrained_visible]
@@ -594,60 +707,56 @@ class ARTNScheduler():
 			self.log.append('{}: {}, {}'.format(t.name, t.priority, t.peak_airmass))
 		return self.scheduled_targets
 
-	def submit_queue(self, telescope='Kuiper', set_queue='plan'):
+	def queue_entries(self):
 		readout=10 #seconds
 		slew_rate=60 		  #seconds
 		filter_change_rate=20 #seconds
 
+		#Queue target with start and end times. Those must be specified in ctime (seconds from 1-1-1970).
+		unixtime = astropy.time.Time('{}-{}-{} 00:00:00'.format(1970, 1, 1))
+		entries = []
+		for t in self.scheduled_targets:
+			rts2id = t.rts2id
+			if self.queue_type == 0:
+				entries.append({'id':rts2id, 'start':None, 'end':None})
+
+			elif self.queue_type == 5:
+				start = t.start_observation
+				start_td = start - unixtime
+				t_start = int(start_td.to_value('day')*24*60*60)
+
+				for exp in t.exp_objs:
+					#just pass in the rts2id
+					#calculate the 
+					start_td = start - unixtime
+					e_start = int(start_td.to_value('day')*24*60*60)
+
+					tmp_end = start + (exp.exptime*exp.amount + readout*exp.amount)*u.second
+					end_td = tmp_end-unixtime
+					e_end = int(end_td.to_value('day')*24*60*60)
+					
+					start = tmp_end + (filter_change_rate*u.second)
+
+					t.rts2start_t = t_start
+					t.rts2end_t = e_end
+
+				entries.append({'id':rts2id, 'start':t_start, 'end':e_end})
+		return entries
+
+	def submit_queue(self, telescope='Kuiper', set_queue='plan', progress=None):
 		if telescope == 'Kuiper':
+			self.log.append('Submitting Schedule to RTS2 Queue')
+			entries = self.queue_entries()
 			try:
-				q = queue.Queue(set_queue)
-				#0 is FIFO
-				#5 is SET_TIMES
-				q.queueing = self.queue_type 
-				q.save()
-				self.log.append('Submitting Schedule to RTS2 Queue')
-				self.log.append('Clearing current Queue')
-				q.load()
-				q.clear()
-				self.log.append('Scheduling')
-
-				#Queue target with start and end times. Those must be specified in ctime (seconds from 1-1-1970).
-				unixtime = astropy.time.Time('{}-{}-{} 00:00:00'.format(1970, 1, 1))
-				print([t.rts2id for t in self.scheduled_targets])
-				for t in self.scheduled_targets:
-					rts2id = t.rts2id
-					if self.queue_type == 0:
-						q.add_target(rts2id)
-
-					elif self.queue_type == 5:
-						start = t.start_observation
-						start_td = start - unixtime
-						t_start = int(start_td.to_value('day')*24*60*60)
-
-						for exp in t.exp_objs:
-							#just pass in the rts2id
-							#calculate the 
-							start_td = start - unixtime
-							e_start = int(start_td.to_value('day')*24*60*60)
-
-							tmp_end = start + (exp.exptime*exp.amount + readout*exp.amount)*u.second
-							end_td = tmp_end-unixtime
-							e_end = int(end_td.to_value('day')*24*60*60)
-							
-							start = tmp_end + (filter_change_rate*u.second)
-
-							t.rts2start_t = t_start
-							t.rts2end_t = e_end
-
-						q.add_target(rts2id, start=t_start, end=e_end)
-					
-			except:
-				print('Error in communication with the ARTN Kuiper computer')
-				self.log.append('Error in communication with the ARTN Kuiper computer')
+				self.submitted = submit_queue_entries(entries, self.queue_type, set_queue, progress)
+			except Exception as e:
+				self.log.append('Error in communication with the ARTN Kuiper computer: {}'.format(e))
 				return False
 
-			self.log.append('Queue populated')
+			if self.submitted['cleared']:
+				self.log.append('Cleared current Queue')
+			self.log.append('Queue populated: {kept} kept, {added} added, {calls} RTS2 calls'.format(**self.submitted))
+			self.log.append('Queue ids: {}'.format([e['id'] for e in entries]))
 			return True
 
 	def plot(self):
@@ -658,7 +767,7 @@ class ARTNScheduler():
 		ax = fig.add_subplot(1,1,1)
 		moon_delta_midnight = []
 		moon_airmass = []
-		for i,x in enumerate(self.moon_altaz.secz):
+		for i,x in enumerate(self.moon_secz):
 			if x <= 5 and x > 1.0:
 				moon_delta_midnight.append(self.delta_midnight[i])
 				moon_airmass.append(x)
@@ -683,9 +792,10 @@ class ARTNScheduler():
 
 		#plot the scheduled target info
 		for t in self.scheduled_targets:
-			t_altaz = t.skycoord.transform_to(self.frame_night)
-			dm = [x for i,x in enumerate(self.delta_midnight) if t_altaz.secz[i] > 1 and t_altaz.secz[i] <= 3.5]
-			cc = [x for x in t_altaz.secz if x > 1 and x <= 3.5]
+			t_secz = self.altaz_engine.airmass(t)
+			t_mask = (t_secz > 1) & (t_secz <= 3.5)
+			dm = self.delta_midnight[t_mask]
+			cc = t_secz[t_mask]
 
 			#plot the airmass chart
 			ax.plot(dm, cc, label=t.name, linestyle='dashed')
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from astroplan import moon_illumination
+from astropy.coordinates import AltAz, EarthLocation, GCRS, SkyCoord, get_moon, get_sun
+from astropy.time import Time
+from astropy import units as u
+from datetime import datetime, timedelta
+
+import argparse
+import glob
+import numpy as np
+import os
+import sys
+import tempfile
+import time
+
+
+# +
+# constant(s)
+# -
+EPH__DIR = os.getenv('ORP_EPHEMERIS', f"{os.getenv('ORP_HOME', '.')}/instance/ephemeris")
+EPH__KEYS = ('sun_alt', 'sun_az', 'moon_alt', 'moon_az', 'moon_ra', 'moon_dec', 'moon_distance',
+             'moon_illumination', 'twilight_levels', 'twilight_begin', 'twilight_end')
+EPH__MAX_AGE = 7.0
+EPH__MEMORY = 32
+EPH__SAMPLES = 289
+EPH__SCHEDULER_SAMPLES = 1000
+EPH__SCHEDULER_SITE = 'mtbigelow'
+EPH__TWILIGHT_LEVELS = (5.0, 0.0, -6.0, -12.0, -15.0, -18.0)
+EPH__UTCOFFSET = 7.0 * u.hour
+
+
+# +
+# variable(s)
+# -
+eph_memory = {}
+
+
+# +
+# function: ephemeris_key()
+# -
+def ephemeris_key(location=None, start=None, span=1.0, samples=EPH__SAMPLES):
+    """ returns the cache file name for (site, night, grid resolution) """
+    _site = f"{location.lat.deg:+.4f}{location.lon.deg:+.4f}{location.height.to(u.m).value:+.0f}m"
+    _start = Time(start).utc.isot.replace('-', '').replace(':', '')
+    return f"{_site}.{_start}.{float(span):.3f}d.{int(samples)}.npz"
+
+
+# +
+# function: ephemeris_times()
+# -
+def ephemeris_times(start=None, span=1.0, samples=EPH__SAMPLES):
+    """ returns the time grid for (start, span, samples) """
+    return Time(start) + (span * u.day * np.linspace(0.0, 1.0, samples))
+
+
+# +
+# function: ephemeris_compute()
+# -
+def ephemeris_compute(location=None, start=None, span=1.0, samples=EPH__SAMPLES):
+    """ returns a dictionary of sun/moon arrays over the time grid """
+
+    # set default(s)
+    _time = ephemeris_times(start, span, samples)
+    _frame = AltAz(obstime=_time, location=location)
+
+    # get solar and lunar position(s)
+    _sun = get_sun(_time).transform_to(_frame)
+    _moon = get_moon(_time, location=location)
+    _moon_altaz = _moon.transform_to(_frame)
+
+    # get twilight boundaries as first and last sample below each level
+    _levels = np.array(EPH__TWILIGHT_LEVELS)
+    _sun_alt = _sun.alt.deg
+    _begin = np.full(len(_levels), np.nan)
+    _end = np.full(len(_levels), np.nan)
+    for _i, _level in enumerate(_levels):
+        _idx = np.flatnonzero(_sun_alt < _level)
+        if len(_idx) > 0:
+            _begin[_i], _end[_i] = _time[_idx[0]].mjd, _time[_idx[-1]].mjd
+
+    # return result
+    return {
+        'sun_alt': _sun_alt, 'sun_az': _sun.az.deg,
+        'moon_alt': _moon_altaz.alt.deg, 'moon_az': _moon_altaz.az.deg,
+        'moon_ra': _moon.ra.deg, 'moon_dec': _moon.dec.deg, 'moon_distance': _moon.distance.km,
+        'moon_illumination': np.asarray(moon_illumination(_time)),
+        'twilight_levels': _levels, 'twilight_begin': _begin, 'twilight_end': _end}
+
+
+# +
+# function: ephemeris_grid()
+# -
+def ephemeris_grid(location=None, start=None, span=1.0, samples=EPH__SAMPLES, cache=True):
+    """ returns the cached sun/moon arrays for (site, night, grid resolution), computing them on a miss """
+
+    # from_now grids are not re-used so compute them directly
+    if not cache:
+        return ephemeris_compute(location, start, span, samples)
+
+    # check memory then disk
+    _key = ephemeris_key(location, start, span, samples)
+    if _key in eph_memory:
+        return eph_memory[_key]
+    _file = os.path.join(EPH__DIR, _key)
+
+    # noinspection PyBroadException
+    try:
+        with np.load(_file) as _npz:
+            _eph = {_k: _npz[_k] for _k in EPH__KEYS}
+    except Exception:
+        _eph = ephemeris_compute(location, start, span, samples)
+        ephemeris_save(_file, _eph)
+
+    # keep the in-process copy small
+    if len(eph_memory) >= EPH__MEMORY:
+        eph_memory.pop(next(iter(eph_memory)))
+    eph_memory[_key] = _eph
+
+    # return result
+    return _eph
+
+
+# +
+# function: ephemeris_save()
+# -
+def ephemeris_save(file='', eph=None):
+    """ writes the arrays atomically so concurrent readers never see a partial file """
+
+    # noinspection PyBroadException
+    try:
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        _fd, _tmp = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(file))
+        with os.fdopen(_fd, 'wb') as _fp:
+            np.savez(_fp, **eph)
+        os.replace(_tmp, file)
+    except Exception:
+        pass
+
+
+# +
+# function: ephemeris_moon()
+# -
+def ephemeris_moon(eph=None, location=None, times=None):
+    """ rebuilds the topocentric moon co-ordinates from cached arrays """
+    _obsgeoloc, _obsgeovel = location.get_gcrs_posvel(times)
+    return SkyCoord(ra=eph['moon_ra']*u.deg, dec=eph['moon_dec']*u.deg, distance=eph['moon_distance']*u.km,
+                    frame=GCRS(obstime=times, obsgeoloc=_obsgeoloc, obsgeovel=_obsgeovel))
+
+
+# +
+# function: scheduler_start()
+# -
+def scheduler_start(night=None, utcoffset=EPH__UTCOFFSET):
+    """ returns the start of the scheduler grid, 12 hours before local midnight """
+    _midnight = Time('{}-{}-{} 23:59:59.9'.format(night.year, night.month, night.day)) + utcoffset
+    return _midnight - 12.0 * u.hour
+
+
+# +
+# function: ephemeris_evict()
+# -
+def ephemeris_evict(max_age=EPH__MAX_AGE):
+    """ removes cache files older than max_age days """
+
+    # set default(s)
+    _removed = []
+    _oldest = time.time() - max_age * 86400.0
+
+    # noinspection PyBroadException
+    for _f in glob.glob(os.path.join(EPH__DIR, '*.npz')):
+        try:
+            if os.path.getmtime(_f) < _oldest:
+                os.remove(_f)
+                _removed.append(_f)
+        except Exception:
+            continue
+
+    # return result
+    return _removed
+
+
+# +
+# function: ephemeris_prewarm()
+# -
+def ephemeris_prewarm(date=None, ndays=2, max_age=EPH__MAX_AGE):
+    """ builds tonight's (and following) grids for every telescope and the scheduler """
+
+    # import here, factory imports this module
+    from src.telescopes.factory import Telescope, TEL__NAME
+
+    # set default(s)
+    _date = date if isinstance(date, datetime) else datetime.utcnow()
+    _files = []
+
+    # telescope grids start at UTC midnight, scheduler grid is centred on local midnight
+    for _d in range(ndays):
+        _night = _date + timedelta(days=_d)
+        _start = Time(_night.strftime('%Y-%m-%d'))
+        for _name in TEL__NAME:
+            _location = Telescope(_name).observatory
+            ephemeris_grid(_location, _start, 1.0, EPH__SAMPLES)
+            _files.append(ephemeris_key(_location, _start, 1.0, EPH__SAMPLES))
+        _location = EarthLocation.of_site(EPH__SCHEDULER_SITE)
+        _start = scheduler_start(_night)
+        ephemeris_grid(_location, _start, 1.0, EPH__SCHEDULER_SAMPLES)
+        _files.append(ephemeris_key(_location, _start, 1.0, EPH__SCHEDULER_SAMPLES))
+
+    # return result
+    return _files, ephemeris_evict(max_age)
+
+
+# +
+# command line wrappers()
+# -
+def _ephemeris_prewarm(iargs=None):
+    if iargs is not None:
+        _date = datetime.strptime(iargs.date, '%Y-%m-%d') if iargs.date else None
+        _files, _removed = ephemeris_prewarm(_date, int(iargs.ndays), float(iargs.max_age))
+        for _f in _files:
+            print(f"cached {os.path.join(EPH__DIR, _f)}")
+        for _f in _removed:
+            print(f"evicted {_f}")
+
+
+def _ephemeris_evict(iargs=None):
+    if iargs is not None:
+        for _f in ephemeris_evict(float(iargs.max_age)):
+            print(f"evicted {_f}")
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'Ephemeris Cache',
+                                 formatter_class=argparse.RawTextHelpFormatter)
+    _sp = _p.add_subparsers()
+
+    # add sub-parser for ephemeris_prewarm(date=None, ndays=2, max_age=EPH__MAX_AGE)
+    _sp_0 = _sp.add_parser('prewarm', description="Build the grids for the coming night(s)",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_0.add_argument(f'--date', default='', help=f"Night (YYYY-MM-DD), default=today")
+    _sp_0.add_argument(f'--ndays', default=2, help=f"Number of nights (int), default=%(default)s")
+    _sp_0.add_argument(f'--max-age', default=EPH__MAX_AGE, help=f"Evict older than (days), default=%(default)s")
+    _sp_0.set_defaults(func=_ephemeris_prewarm)
+
+    # add sub-parser for ephemeris_evict(max_age=EPH__MAX_AGE)
+    _sp_1 = _sp.add_parser('evict', description="Remove stale grids",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_1.add_argument(f'--max-age', default=EPH__MAX_AGE, help=f"Evict older than (days), default=%(default)s")
+    _sp_1.set_defaults(func=_ephemeris_evict)
+
+    # noinspection PyBroadException
+    try:
+        args = _p.parse_args()
+        args.func(args)
+    except Exception:
+        print(f'Use: python3 {sys.argv[0]}\n--help for more information')
@@ -5,6 +5,8 @@
 # import(s)
 # -
 from . import *
+from .ephemeris import ephemeris_grid, ephemeris_moon, ephemeris_times
+from src.convert import deg_to_dms, deg_to_hms, dms_to_deg, hms_to_deg
 from astroplan import Observer
 from astropy.coordinates import Angle, AltAz, EarthLocation, SkyCoord, get_moon, get_sun
 from astropy.time import Time
@@ -359,6 +361,26 @@ class Telescope(object):
             _str = f'{_str}\n{_k}={_v}'
         return _str
 
+    # +
+    # method: ephemeris()
+    # -
+    def ephemeris(self, date=DEF__BEGIN, ndays=DEF__NDAYS, from_now=False):
+        """ returns cached sun and moon arrays for several days """
+
+        # check input(s)
+        date = date if (isinstance(date, str) and re.search(ISO__PATTERN, date)) else DEF__BEGIN
+        ndays = ndays if isinstance(ndays, int) else DEF__NDAYS
+        ndays = ndays if ndays > 0 else DEF__NDAYS
+        from_now = from_now if isinstance(from_now, bool) else False
+
+        # set default(s)
+        _time = Time(date) if from_now else Time(date.split()[0])
+        _time = Time(_time.iso)
+
+        # return result
+        return ephemeris_grid(self.__observatory, _time, ndays, AST__5_MINUTES*ndays,
+                              cache=not from_now)
+
     # +
     # method: moon_coordinates()
     # -
@@ -378,7 +400,7 @@ class Telescope(object):
 
         # noinspection PyBroadException
         try:
-            return get_moon(_time, location=self.__observatory)
+            return ephemeris_moon(self.ephemeris(date, ndays, from_now), self.__observatory, _time)
         except Exception:
             return None
 
@@ -410,30 +432,26 @@ class Telescope(object):
 
         # set default(s)
         _excl = None
-        _time = Time(date) if from_now else Time(date.split()[0])
-        _time = Time(_time.iso)
-        _time = Time(_time) + (ndays * u.day * np.linspace(0.0, 1.0, AST__5_MINUTES*ndays))
-
-        _moon_lower = TEL__MIN__MOONEX[f'{self.__name.lower()}']
-        _moon_upper = TEL__MAX__MOONEX[f'{self.__name.lower()}'] - _moon_lower
-
-        # get illumination and moon alt-az for time
-        _illuminati = self.__observer.moon_illumination(_time)
-        _lunar_altaz = self.__observer.moon_altaz(_time)
 
         # noinspection PyBroadException
         try:
-            for _i in range(len(_lunar_altaz)):
-                if _lunar_altaz[_i].alt <= 0:
-                    # noinspection PyUnresolvedReferences
-                    _illuminati[_i] = 0.0
-            _excl = (_moon_lower + _moon_upper * _illuminati)
+            _excl = self.__moon_exclusion(self.ephemeris(date, ndays, from_now))
         except Exception:
             _excl = ndays * np.linspace(math.nan, math.nan, AST__5_MINUTES*ndays)
 
         # return result
         return _excl
 
+    # +
+    # method: __moon_exclusion()
+    # -
+    def __moon_exclusion(self, _eph=None):
+        """ returns moon exclusion angles from cached illumination, zero when the moon is down """
+        _moon_lower = TEL__MIN__MOONEX[f'{self.__name.lower()}']
+        _moon_upper = TEL__MAX__MOONEX[f'{self.__name.lower()}'] - _moon_lower
+        _illuminati = np.where(_eph['moon_alt'] <= 0, 0.0, _eph['moon_illumination'])
+        return _moon_lower + _moon_upper * _illuminati
+
     # +
     # method: moon_exclusion_now()
     # -
@@ -475,7 +493,7 @@ class Telescope(object):
 
         # noinspection PyBroadException
         try:
-            _moon_coord = get_moon(_time, location=self.__observatory)
+            _moon_coord = ephemeris_moon(self.ephemeris(date, ndays, from_now), self.__observatory, _time)
             _obj_radec = SkyCoord(ra=ra * u.deg, dec=dec * u.deg)
             _sep = _obj_radec.separation(_moon_coord).deg
         except Exception:
@@ -528,66 +546,120 @@ class Telescope(object):
         _obs = np.linspace(math.nan, math.nan, AST__5_MINUTES*ndays)
         _time = Time(date) if from_now else Time(date.split()[0])
         _time = Time(_time.iso)
-
-        # get arrays for moon exclusion, separation and UTC time
-        _mex = self.moon_exclusion(date=_time.iso, ndays=ndays, from_now=from_now)
-        _msp = self.moon_separation(ra=ra, dec=dec, date=_time.iso, ndays=ndays, from_now=from_now)
+        _eph = self.ephemeris(date=date, ndays=ndays, from_now=from_now)
         _time = Time(_time) + (ndays * u.day * np.linspace(0.0, 1.0, AST__5_MINUTES*ndays))
 
-        # modify to reference frame and get solar position
+        # noinspection PyBroadException
+        try:
+            _obs = self.__observable(ra, dec, _time, _eph)
+        except Exception:
+            _obs = np.linspace(math.nan, math.nan, AST__5_MINUTES*ndays)
+
+        # return result
+        return _obs
+
+    # +
+    # method: __observable()
+    # -
+    def __observable(self, ra=DEF__RIGHT_ASCENSION, dec=DEF__DECLINATION, _time=None, _eph=None):
+        """ returns observability flags over _time using array masks rather than per-sample indexing """
+        _mask, _secz = self.__observable_mask(ra, dec, _time, _eph)
+        return np.where(_mask, VAL__OBSERVABLE, VAL__NOT_OBSERVABLE)
+
+    # +
+    # method: __observable_mask()
+    # -
+    def __observable_mask(self, ra=DEF__RIGHT_ASCENSION, dec=DEF__DECLINATION, _time=None, _eph=None):
+        """ returns (observable mask, airmass) over _time, ra/dec of shape (N, 1) broadcast to (N, samples) """
+
+        # modify to reference frame and get airmass, moon separation and exclusion
         _frame = AltAz(obstime=_time, location=self.__observatory)
         _radecs = SkyCoord(ra=ra * u.deg, dec=dec * u.deg)
-        _altaz = _radecs.transform_to(_frame)
-        _solar_altaz = get_sun(_time).transform_to(_altaz)
+        _secz = np.asarray(_radecs.transform_to(_frame).secz)
+        _msp = _radecs.separation(ephemeris_moon(_eph, self.__observatory, _time)).deg
+        _mex = self.__moon_exclusion(_eph)
+        _solar_alt = _eph['sun_alt']
+        _solar_az = _eph['sun_az']
 
         # get limit(s)
         _max_airmass = TEL__MAX__AIRMASS[f'{self.__name.lower()}']
-        _min_airmass = TEL__MIN__AIRMASS[f'{self.__name.lower()}']
-        _dusk = TEL__DUSK[f'{self.__name.lower()}'] * u.deg
-        _twilight = TEL__TWILIGHT[f'{self.__name.lower()}'] * u.deg
-        _horizon = AST__HORIZON * u.deg
-        _north = AST__NORTH * u.deg
-        _south = AST__SOUTH * u.deg
-
-        # noinspection PyBroadException
-        try:
-            for i in range(len(_altaz)):
-
-                # the Sun has risen, so not observable
-                if _solar_altaz[i].alt >= _horizon:
-                    _obs[i] = VAL__NOT_OBSERVABLE
+        _twilight = TEL__TWILIGHT[f'{self.__name.lower()}']
 
-                # morning or evening twilight, might be observable
-                elif _twilight <= _solar_altaz.alt[i] < _horizon:
+        # the Sun has risen, or is in the East during twilight so it must be rising, so not observable
+        _dark = ~((_solar_alt >= AST__HORIZON) |
+                  ((_twilight <= _solar_alt) & (_solar_alt < AST__HORIZON) &
+                   (AST__NORTH <= _solar_az) & (_solar_az <= AST__SOUTH)))
 
-                    # the Sun is in the East, it must be rising so we are in morning twilight
-                    if _north <= _solar_altaz[i].az <= _south:
-                        _obs[i] = VAL__NOT_OBSERVABLE
-                    # the Sun is in the West, it must be setting so we are in evening twilight
-                    else:
-                        _obs[i] = VAL__OBSERVABLE
+        # modify for airmass or exclusion
+        return _dark & ~((_secz >= _max_airmass) | (_msp <= _mex)), _secz
 
-                else:
-                    _obs[i] = VAL__OBSERVABLE
+    # +
+    # method: observable_many()
+    # -
+    def observable_many(self, ra_array=None, dec_array=None, start=DEF__BEGIN, ndays=DEF__NDAYS):
+        """ returns a (targets x samples) observability matrix and per-target summary metrics """
 
-                # modify for airmass or exclusion
-                if _altaz.secz[i] >= _max_airmass:
-                    _obs[i] = VAL__NOT_OBSERVABLE
-                elif _msp[i] <= _mex[i]:
-                    _obs[i] = VAL__NOT_OBSERVABLE
+        # check input(s)
+        ra_array = np.clip(np.asarray(ra_array if ra_array is not None else [], dtype=float).ravel(),
+                           MIN__RIGHT_ASCENSION, MAX__RIGHT_ASCENSION)
+        dec_array = np.clip(np.asarray(dec_array if dec_array is not None else [], dtype=float).ravel(),
+                            MIN__DECLINATION, MAX__DECLINATION)
+        start = start if (isinstance(start, str) and re.search(ISO__PATTERN, start)) else DEF__BEGIN
+        ndays = ndays if isinstance(ndays, int) else DEF__NDAYS
+        ndays = ndays if ndays > 0 else DEF__NDAYS
+        if len(ra_array) != len(dec_array):
+            raise Exception(f'Invalid input, len(ra_array)={len(ra_array)} != len(dec_array)={len(dec_array)}')
 
-        except Exception:
-            _obs = np.linspace(math.nan, math.nan, AST__5_MINUTES*ndays)
+        # set default(s)
+        _samples = AST__5_MINUTES*ndays
+        _eph = self.ephemeris(start, ndays, False)
+        _time = ephemeris_times(Time(Time(start.split()[0]).iso), ndays, _samples)
+        _summary = {
+            'hours': np.zeros(len(ra_array)),
+            'best_airmass': np.full(len(ra_array), math.nan),
+            'window_start': np.full(len(ra_array), math.nan),
+            'window_end': np.full(len(ra_array), math.nan)}
+        if len(ra_array) == 0:
+            return np.zeros((0, _samples), dtype=bool), _summary
+
+        # one broadcast transform for every target, and only count targets above the horizon
+        _obs, _secz = self.__observable_mask(ra_array[:, None], dec_array[:, None], _time, _eph)
+        _obs &= (_secz >= 1.0)
+
+        # summarise
+        _mjd = _time.mjd
+        _any = _obs.any(axis=1)
+        _summary['hours'] = _obs.sum(axis=1) * (ndays * 24.0 / (_samples - 1))
+        _summary['best_airmass'][_any] = np.where(_obs, _secz, np.inf).min(axis=1)[_any]
+        _summary['window_start'][_any] = _mjd[np.argmax(_obs, axis=1)][_any]
+        _summary['window_end'][_any] = _mjd[_samples - 1 - np.argmax(_obs[:, ::-1], axis=1)][_any]
 
         # return result
-        return _obs
+        return _obs, _summary
 
     # +
     # method: observable_now()
     # -
     def observable_now(self, ra=DEF__RIGHT_ASCENSION, dec=DEF__DECLINATION):
         """ returns the value of the observability flag for object for right now """
-        return self.observable(ra, dec, f'{self.get_date_utctime(0)}', ndays=1, from_now=True)[0]
+
+        # check input(s)
+        ra = ra if isinstance(ra, float) else DEF__RIGHT_ASCENSION
+        ra = ra if ra > MIN__RIGHT_ASCENSION else MIN__RIGHT_ASCENSION
+        ra = ra if ra < MAX__RIGHT_ASCENSION else MAX__RIGHT_ASCENSION
+        dec = dec if isinstance(dec, float) else DEF__DECLINATION
+        dec = dec if dec > MIN__DECLINATION else MIN__DECLINATION
+        dec = dec if dec < MAX__DECLINATION else MAX__DECLINATION
+
+        # evaluate the single sample for now rather than a whole day grid
+        _time = Time(Time(f'{self.get_date_utctime(0)}').iso)
+        _eph = ephemeris_grid(self.__observatory, _time, 0.0, 1, cache=False)
+
+        # noinspection PyBroadException
+        try:
+            return self.__observable(ra, dec, ephemeris_times(_time, 0.0, 1), _eph)[0]
+        except Exception:
+            return float(math.nan)
 
     # +
     # method: observable_today()
@@ -691,10 +763,10 @@ class Telescope(object):
         dec = dec if isinstance(dec, float) else DEF__DECLINATION
         dec = dec if dec > MIN__DECLINATION else MIN__DECLINATION
         dec = dec if dec < MAX__DECLINATION else MAX__DECLINATION
-        _dec_dms = Angle(dec, unit=u.deg).dms
+        _sign, _d, _m, _s = deg_to_dms(dec)
 
         # return result
-        return _dec_dms[0], _dec_dms[1], _dec_dms[2]
+        return _sign * _d, _sign * _m, _sign * _s
 
     # +
     # (static) method: deg_2_rad()
@@ -717,12 +789,9 @@ class Telescope(object):
 
         # check input(s)
         dms = dms if (isinstance(dms, str) and dms.strip() != '' and ':' in dms) else DEF__DMS
-        dms = dms if ('degrees' in dms) else f'{dms} degrees'
 
-        try:
-            return float(Angle(dms).degree)
-        except Exception:
-            return float(math.nan)
+        # return result
+        return dms_to_deg(dms)
 
     # +
     # method: hms_2_ra()
@@ -733,13 +802,9 @@ class Telescope(object):
 
         # check input(s)
         hms = hms if (isinstance(hms, str) and hms.strip() != '' and ':' in hms) else DEF__HMS
-        hms = hms if ('hours' in hms) else f'{hms} hours'
 
-        # noinspection PyBroadException
-        try:
-            return float(Angle(hms).degree)
-        except Exception:
-            return float(math.nan)
+        # return result
+        return hms_to_deg(hms)
 
     # +
     # (static) method: ra_2_hms()
@@ -752,10 +817,9 @@ class Telescope(object):
         ra = ra if isinstance(ra, float) else DEF__RIGHT_ASCENSION
         ra = ra if ra > MIN__RIGHT_ASCENSION else MIN__RIGHT_ASCENSION
         ra = ra if ra < MAX__RIGHT_ASCENSION else MAX__RIGHT_ASCENSION
-        _ra_hms = Angle(ra, unit=u.deg).hms
 
         # return result
-        return _ra_hms[0], _ra_hms[1], _ra_hms[2]
+        return deg_to_hms(ra)
 
     # +
     # (static) method: rad_2_deg()
@@ -9,6 +9,7 @@ from astropy.coordinates import Angle, AltAz, EarthLocation, SkyCoord, get_moon,
 from astropy.time import Time
 from datetime import timedelta
 from datetime import datetime
+from src.telescopes.ephemeris import ephemeris_grid, ephemeris_moon, ephemeris_times
 
 import argparse
 import astropy.units as u
@@ -217,11 +218,12 @@ def moon_distance(ra=DEF__RA, dec=DEF__DEC, date=DEF__DATE, from_now=False):
     _sep = None
     _time = Time(date) if from_now else Time(date.split()[0])
     _time = Time(_time.iso)
+    _eph = ephemeris_grid(KUIPER_OBSERVATORY, _time, 1.0, AST__5_MINUTES, cache=not from_now)
     _time = Time(_time) + (1.0 * u.day * np.linspace(0.0, 1.0, AST__5_MINUTES))
 
     # noinspection PyBroadException
     try:
-        _moon_coord = get_moon(_time, location=KUIPER_OBSERVATORY)
+        _moon_coord = ephemeris_moon(_eph, KUIPER_OBSERVATORY, _time)
         _obj_radec = SkyCoord(ra=ra*u.deg, dec=dec*u.deg)
         _sep = _obj_radec.separation(_moon_coord).deg
     except Exception:
@@ -298,20 +300,15 @@ def moon_exclusion(date=DEF__DATE, from_now=False):
     _excl = None
     _time = Time(date) if from_now else Time(date.split()[0])
     _time = Time(_time.iso)
-    _time = Time(_time) + (1.0 * u.day * np.linspace(0.0, 1.0, AST__5_MINUTES))
     _moon_lower = AST__NEW_MOON_EXCLUSION
     _moon_upper = AST__FULL_MOON_EXCLUSION - AST__NEW_MOON_EXCLUSION
 
     # get illumination and moon alt-az for time
-    _illuminati = KUIPER_OBSERVER.moon_illumination(_time)
-    _lunar_altaz = KUIPER_OBSERVER.moon_altaz(_time)
+    _eph = ephemeris_grid(KUIPER_OBSERVATORY, _time, 1.0, AST__5_MINUTES, cache=not from_now)
 
     # noinspection PyBroadException
     try:
-        for _i in range(len(_lunar_altaz)):
-            if _lunar_altaz[_i].alt <= 0:
-                # noinspection PyUnresolvedReferences
-                _illuminati[_i] = 0.0
+        _illuminati = np.where(_eph['moon_alt'] <= 0, 0.0, _eph['moon_illumination'])
         _excl = (_moon_lower + _moon_upper * _illuminati)
     except Exception:
         _excl = np.linspace(math.nan, math.nan, AST__5_MINUTES)
@@ -388,6 +385,7 @@ def observable(ra=DEF__RA, dec=DEF__DEC, date=DEF__DATE, from_now=False):
     _time_now = Time.now()
     _time = Time(date) if from_now else Time(date.split()[0])
     _time = Time(_time.iso)
+    _eph = ephemeris_grid(KUIPER_OBSERVATORY, _time, 1.0, AST__5_MINUTES, cache=not from_now)
     _time = Time(_time) + (1.0 * u.day * np.linspace(0.0, 1.0, AST__5_MINUTES))
 
     _exclusion = moon_exclusion(_time)
@@ -397,29 +395,19 @@ def observable(ra=DEF__RA, dec=DEF__DEC, date=DEF__DATE, from_now=False):
     _frame = AltAz(obstime=_time, location=KUIPER_OBSERVATORY)
     _radecs = SkyCoord(ra=ra*u.deg, dec=dec*u.deg)
     _altaz = _radecs.transform_to(_frame)
-    _solar_altaz = get_sun(_time).transform_to(_altaz)
+    _solar_alt = _eph['sun_alt'] * u.deg
+    _solar_az = _eph['sun_az'] * u.deg
 
     # noinspection PyBroadException
     try:
-        for _i in range(len(_solar_altaz)):
-            if _solar_altaz[_i].alt >= AST__HORIZON:
-                _obs[_i] = False
-            elif AST__TWILIGHT < _solar_altaz[_i].alt < AST__HORIZON:
-                if AST__NORTH < _solar_altaz[_i].az < AST__SOUTH:
-                    # morning twilight
-                    _obs[_i] = False
-                else:
-                    # evening twilight
-                    if _altaz[_i].secz > AST__AIRMASS_MAX or _distance[_i] < _exclusion[_i]:
-                        _obs[_i] = False
-                    else:
-                        _obs[_i] = True
-            else:
-                # sun is below horizon and not in a twilight zone
-                if _altaz[_i].secz > AST__AIRMASS_MAX or _distance[_i] < _exclusion[_i]:
-                    _obs[_i] = False
-                else:
-                    _obs[_i] = True
+        # sun is below horizon (evening twilight or night) and object is high enough and clear of the moon
+        _visible = ~((np.asarray(_altaz.secz) > AST__AIRMASS_MAX) | (_distance < _exclusion))
+        _obs = _visible.astype(float)
+        # sun is above horizon
+        _obs[_solar_alt >= AST__HORIZON] = False
+        # morning twilight
+        _obs[(AST__TWILIGHT < _solar_alt) & (_solar_alt < AST__HORIZON) &
+             (AST__NORTH < _solar_az) & (_solar_az < AST__SOUTH)] = False
 
     except Exception:
         _excl = np.linspace(math.nan, math.nan, AST__5_MINUTES)
@@ -460,23 +448,26 @@ def observable_now(ra=DEF__RA, dec=DEF__DEC):
     dec = MIN__DEC if dec < MIN__DEC else dec
     dec = MAX__DEC if dec > MAX__DEC else dec
 
-    # set default(s)
+    # set default(s), evaluating the single sample for now rather than a whole day grid
     _time = Time.now()
-    _exn = moon_exclusion(_time)
-    _mdn = moon_distance(ra, dec, _time)
+    _eph = ephemeris_grid(KUIPER_OBSERVATORY, _time, 0.0, 1, cache=False)
+    _radecs = SkyCoord(ra=ra*u.deg, dec=dec*u.deg)
+    _illuminati = np.where(_eph['moon_alt'] <= 0, 0.0, _eph['moon_illumination'])[0]
+    _exn = AST__NEW_MOON_EXCLUSION + (AST__FULL_MOON_EXCLUSION - AST__NEW_MOON_EXCLUSION) * _illuminati
+    _mdn = _radecs.separation(ephemeris_moon(_eph, KUIPER_OBSERVATORY, ephemeris_times(_time, 0.0, 1))).deg[0]
 
     # modify to reference frame and get solar position
     _frame = AltAz(obstime=_time, location=KUIPER_OBSERVATORY)
-    _radecs = SkyCoord(ra=ra*u.deg, dec=dec*u.deg)
     _altaz = _radecs.transform_to(_frame)
-    _solar_altaz = get_sun(_time).transform_to(_altaz)
+    _solar_alt = _eph['sun_alt'][0] * u.deg
+    _solar_az = _eph['sun_az'][0] * u.deg
 
     # return result
-    if _solar_altaz.alt >= AST__HORIZON:
+    if _solar_alt >= AST__HORIZON:
         # sun is above horizon
         return False
-    elif AST__TWILIGHT < _solar_altaz.alt < AST__HORIZON:
-        if AST__NORTH < _solar_altaz.az < AST__SOUTH:
+    elif AST__TWILIGHT < _solar_alt < AST__HORIZON:
+        if AST__NORTH < _solar_az < AST__SOUTH:
             # morning twilight
             return False
         else:
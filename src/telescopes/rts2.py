@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+import json
+import os
+import sys
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    Selects the RTS2 client: rts2solib (the RTS2 JSON service at "rts2url") or, if rts2_config.json has a
+    "simulator" object, the in-process stand-in src.telescopes.rts2sim.
+
+    from src.telescopes.rts2 import Queue, queue, rts2comm, so_exposure, stellar
+
+"""
+
+
+# +
+# constant(s)
+# -
+RTS2SOLIBPATH = os.getenv("RTS2SOLIBPATH", f'{os.getenv("ORP_SRC")}/telescopes')
+RTS2SOLIBSRC = os.getenv("RTS2SOLIBSRC", f'{os.getenv("ORP_SRC")}/rts2solib')
+RTS2__CONFIG = os.getenv("RTS2_CONFIG", f'{RTS2SOLIBPATH}/rts2_config.json')
+
+
+# +
+# function: rts2_config()
+# -
+# noinspection PyBroadException
+def rts2_config(path=RTS2__CONFIG):
+    """ returns rts2_config.json as a dictionary, {} if it is missing or unreadable """
+    try:
+        with open(path, 'r') as _fd:
+            return json.load(_fd)
+    except Exception:
+        return {}
+
+
+# +
+# select client
+# -
+RTS2__SIMULATOR = rts2_config().get('simulator', None)
+
+if RTS2__SIMULATOR:
+    from src.telescopes.rts2sim import Queue, queue, rts2comm, rts2sim_configure, so_exposure, stellar
+    rts2sim_configure(RTS2__SIMULATOR)
+else:
+    sys.path.append(RTS2SOLIBSRC)
+    sys.path.append(RTS2SOLIBPATH)
+    # noinspection PyUnresolvedReferences
+    from rts2solib import Queue, queue, rts2comm, so_exposure, stellar
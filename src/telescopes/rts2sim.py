@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    An in-process stand-in for the parts of rts2solib the ORP uses (rts2comm, queue.Queue / Queue, stellar and
+    so_exposure). State lives in a SQLite file so every worker sees the same simulated telescope, and each call
+    that would go to the RTS2 JSON service sleeps for the configured latency and fails at the configured rate.
+
+    It is selected by a "simulator" object in rts2_config.json (see src/telescopes/rts2.py), all keys optional:
+
+    { ..., "simulator": { "latency": 0.05, "jitter": 0.02, "failure_rate": 0.01, "cadence": 600.0 } }
+
+    cadence is the number of seconds each plan target stays current (0.0 keeps the first target current).
+
+    % python3 -m src.telescopes.rts2sim bench --help
+
+"""
+
+
+# +
+# constant(s)
+# -
+SIM__DB = os.getenv('ORP_RTS2_SIM', f"{os.getenv('ORP_HOME', '.')}/instance/rts2sim.sqlite")
+SIM__DEFAULTS = {'database': SIM__DB, 'latency': 0.0, 'jitter': 0.0, 'failure_rate': 0.0, 'cadence': 0.0,
+                 'seed': None}
+SIM__FIRST_ID = 10000
+SIM__FOCUS_IDS = tuple(range(3611, 3625))
+SIM__SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    ra REAL NOT NULL,
+    dec REAL NOT NULL,
+    info TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS queues (
+    name TEXT PRIMARY KEY,
+    queueing INTEGER NOT NULL DEFAULT 0,
+    entries TEXT NOT NULL DEFAULT '[]',
+    started REAL NOT NULL DEFAULT 0.0
+);
+"""
+
+
+# +
+# variable(s)
+# -
+sim_lock = threading.Lock()
+sim_service = None
+
+
+# +
+# class: Rts2SimError()
+# -
+class Rts2SimError(Exception):
+    """ an injected (or simulated) RTS2 failure """
+    pass
+
+
+# +
+# class: Rts2Sim()
+# -
+class Rts2Sim(object):
+    """ the simulated RTS2 JSON service: latency, failure injection and shared state """
+
+    def __init__(self, database=SIM__DB, latency=0.0, jitter=0.0, failure_rate=0.0, cadence=0.0, seed=None):
+        self.path = os.path.abspath(os.path.expanduser(database))
+        self.latency = max(0.0, float(latency))
+        self.jitter = max(0.0, float(jitter))
+        self.failure_rate = min(1.0, max(0.0, float(failure_rate)))
+        self.cadence = max(0.0, float(cadence))
+        self.calls = 0
+        self.failures = 0
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as _c:
+            _c.execute('PRAGMA journal_mode=WAL')
+            _c.executescript(SIM__SCHEMA)
+            _c.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'targets', ? WHERE NOT EXISTS "
+                       "(SELECT 1 FROM sqlite_sequence WHERE name = 'targets')", (SIM__FIRST_ID - 1,))
+            _c.executemany('INSERT OR IGNORE INTO targets (id, name, ra, dec) VALUES (?, ?, ?, ?)',
+                           [(_id, f'focus_{_id}', 360.0 * _i / len(SIM__FOCUS_IDS), 32.4)
+                            for _i, _id in enumerate(SIM__FOCUS_IDS)])
+
+    @contextmanager
+    def connect(self):
+        _c = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            yield _c
+        finally:
+            _c.close()
+
+    # +
+    # method: call()
+    # -
+    def call(self, what=''):
+        """ one round trip to the (simulated) service: sleeps, then fails at failure_rate """
+        with self.__lock:
+            self.calls += 1
+            _delay = self.latency + (self.__random.uniform(-self.jitter, self.jitter) if self.jitter > 0.0 else 0.0)
+            _fail = self.__random.random() < self.failure_rate
+            self.failures += 1 if _fail else 0
+        if _delay > 0.0:
+            time.sleep(_delay)
+        if _fail:
+            raise Rts2SimError(f'Simulated RTS2 failure, call={what}')
+
+    # +
+    # method: plan()
+    # -
+    def plan(self, name='plan'):
+        """ returns (queueing, entries, index of the current entry) where time has advanced index by cadence """
+        with self.connect() as _c:
+            _r = _c.execute('SELECT queueing, entries, started FROM queues WHERE name = ?', (name,)).fetchone()
+        if _r is None:
+            return 0, [], 0
+        _entries = json.loads(_r[1])
+        _index = int((time.time() - _r[2]) // self.cadence) if self.cadence > 0.0 and _entries else 0
+        return _r[0], _entries, min(_index, len(_entries))
+
+    # +
+    # method: update()
+    # -
+    def update(self, name='plan', func=None):
+        """ applies func(queueing, entries) -> (queueing, entries) to a queue inside one write transaction """
+        with self.connect() as _c:
+            _c.execute('BEGIN IMMEDIATE')
+            try:
+                _r = _c.execute('SELECT queueing, entries, started FROM queues WHERE name = ?', (name,)).fetchone()
+                _queueing, _entries, _started = (_r[0], json.loads(_r[1]), _r[2]) if _r else (0, [], 0.0)
+                _queueing, _new = func(_queueing, list(_entries))
+                _started = time.time() if not _entries else _started
+                _c.execute('INSERT OR REPLACE INTO queues (name, queueing, entries, started) VALUES (?, ?, ?, ?)',
+                           (name, int(_queueing), json.dumps(_new), _started))
+                _c.execute('COMMIT')
+            except Exception:
+                _c.execute('ROLLBACK')
+                raise
+        return _queueing, _new
+
+
+# +
+# function: rts2sim_configure()
+# -
+def rts2sim_configure(config=None):
+    """ (re-)creates the simulated service from a rts2_config.json "simulator" object, returns it """
+    global sim_service
+    _config = dict(SIM__DEFAULTS, **(config if isinstance(config, dict) else {}))
+    with sim_lock:
+        sim_service = Rts2Sim(_config['database'], _config['latency'], _config['jitter'], _config['failure_rate'],
+                              _config['cadence'], _config['seed'])
+    return sim_service
+
+
+# +
+# function: _service()
+# -
+def _service():
+    return sim_service if sim_service is not None else rts2sim_configure()
+
+
+# +
+# function: _degrees()
+# -
+def _degrees(value='', hours=False):
+    """ returns decimal degrees for a sexagesimal (or decimal) string """
+    _v = f'{value}'.strip()
+    if ':' not in _v:
+        return float(_v)
+    _sign = -1.0 if _v.startswith('-') else 1.0
+    _d, _m, _s = (abs(float(_x)) for _x in (_v.split(':') + ['0', '0'])[:3])
+    return _sign * (_d + _m / 60.0 + _s / 3600.0) * (15.0 if hours else 1.0)
+
+
+# +
+# class: rts2comm()
+# -
+class rts2comm(object):
+    """ stands in for rts2solib.rts2comm """
+
+    # noinspection PyMethodMayBeStatic
+    def _getall(self):
+        """ returns the device values the ORP reads, each as [flags, value] """
+        _service().call('getall')
+        _entries, _index = _service().plan('plan')[1:]
+        _ids = [_e['id'] for _e in _entries]
+        _current = _ids[_index] if _index < len(_ids) else -1
+        with _service().connect() as _c:
+            _names = dict(_c.execute(f"SELECT id, name FROM targets WHERE id IN ({','.join('?' * _index)})",
+                                     _ids[:_index]).fetchall()) if _index > 0 else {}
+        return {
+            'SEL': {'d': {
+                'current_target': [0, _current],
+                'next_id': [0, _ids[_index + 1] if _index + 1 < len(_ids) else -1],
+                'plan_executed_ids': [0, _ids[:_index]],
+                'plan_executed_names': [0, [_names.get(_id, '') for _id in _ids[:_index]]],
+                'plan_ids': [0, _ids[_index + 1:]]}},
+            'EXEC': {'d': {'current': [0, _current]}}
+        }
+
+    # noinspection PyMethodMayBeStatic
+    def get_target(self, id=0):
+        """ returns [[id, name, ra (deg), dec (deg)]] """
+        _service().call('tbyid')
+        with _service().connect() as _c:
+            _r = _c.execute('SELECT id, name, ra, dec FROM targets WHERE id = ?', (int(id),)).fetchone()
+        if _r is None:
+            raise Rts2SimError(f'Unknown target, id={id}')
+        return [list(_r)]
+
+
+# +
+# class: _Entry()
+# -
+class _Entry(object):
+    def __init__(self, id=0, start=None, end=None):
+        self.id = id
+        self.start = start
+        self.end = end
+
+
+# +
+# class: Queue()
+# -
+class Queue(object):
+    """ stands in for rts2solib.queue.Queue, clear() and add_target() act on the service immediately """
+
+    def __init__(self, name='plan'):
+        self.name = name
+        self.queueing = 0
+        self.entries = []
+
+    def load(self):
+        _service().call(f'queue {self.name}')
+        self.queueing, _entries, _index = _service().plan(self.name)
+        self.entries = [_Entry(**_e) for _e in _entries]
+        return self
+
+    def save(self):
+        _service().call(f'queueing {self.name}')
+        self.queueing = _service().update(self.name, lambda _q, _e: (self.queueing, _e))[0]
+        return self
+
+    def clear(self):
+        _service().call(f'clear {self.name}')
+        _service().update(self.name, lambda _q, _e: (_q, []))
+        self.entries = []
+        return self
+
+    def add_target(self, id=0, start=None, end=None):
+        _service().call(f'queue_at {self.name} {id}')
+        with _service().connect() as _c:
+            if _c.execute('SELECT 1 FROM targets WHERE id = ?', (int(id),)).fetchone() is None:
+                raise Rts2SimError(f'Unknown target, id={id}')
+        _entry = {'id': int(id), 'start': start, 'end': end}
+        _service().update(self.name, lambda _q, _e: (_q, _e + [_entry]))
+        self.entries.append(_Entry(**_entry))
+        return self
+
+
+queue = SimpleNamespace(Queue=Queue)
+
+
+# +
+# class: so_exposure()
+# -
+class so_exposure(object):
+    """ stands in for rts2solib.so_exposure """
+
+    def __init__(self, Filter='', exptime=0.0, amount=1):
+        self.Filter = Filter
+        self.exptime = exptime
+        self.amount = amount
+
+    def dictify(self):
+        return {'Filter': self.Filter, 'exptime': self.exptime, 'amount': self.amount}
+
+
+# +
+# class: stellar()
+# -
+class stellar(object):
+    """ stands in for rts2solib.stellar """
+
+    def __init__(self, name='', ra='', dec='', obs_info=None, artn_obs_id='', artn_group_id=''):
+        self.name = name
+        self.ra = ra
+        self.dec = dec
+        self.obs_info = list(obs_info or [])
+        self.artn_obs_id = artn_obs_id
+        self.artn_group_id = artn_group_id
+        self.id = -1
+
+    def create_target_api(self):
+        """ creates the target and returns its (rts2) id """
+        _service().call('create_target')
+        with _service().connect() as _c:
+            self.id = _c.execute('INSERT INTO targets (name, ra, dec, info) VALUES (?, ?, ?, ?)', (
+                self.name, _degrees(self.ra, True), _degrees(self.dec), json.dumps(self.dictify()))).lastrowid
+        return self.id
+
+    def dictify(self):
+        return {'name': self.name, 'ra': self.ra, 'dec': self.dec, 'obs_id': self.id,
+                'artn_obs_id': self.artn_obs_id, 'artn_group_id': self.artn_group_id,
+                'obs_info': [_o.dictify() for _o in self.obs_info]}
+
+
+# +
+# function: rts2sim_bench()
+# -
+def rts2sim_bench(latency=0.05, jitter=0.0, failure_rate=0.0, targets=40, submits=5, pollers=16, polls=50,
+                  poll_interval=1.0):
+    """ times queue submission through artn_scheduler.submit_queue_entries() (what ARTNScheduler.submit_queue
+        calls) and concurrent queue-page polling, both straight against the simulator and through a shared
+        src.rts2state snapshot """
+
+    from src.rts2state import Rts2State
+
+    def _percentiles(_t=None):
+        _t = sorted(_t) or [float('nan')]
+        return 1000.0 * _t[len(_t) // 2], 1000.0 * _t[int(len(_t) * 0.95)]
+
+    _out = {'latency_ms': 1000.0 * latency, 'failure_rate': failure_rate, 'pollers': pollers}
+    with tempfile.TemporaryDirectory() as _tmp:
+        _config = {'database': os.path.join(_tmp, 'rts2sim.sqlite'), 'latency': latency, 'jitter': jitter,
+                   'failure_rate': failure_rate, 'seed': 42}
+
+        # artn_scheduler picks its RTS2 client from rts2_config.json on import, so it must see a simulator one
+        _path, _env = os.path.join(_tmp, 'rts2_config.json'), os.environ.get('RTS2_CONFIG', None)
+        with open(_path, 'w') as _fd:
+            json.dump({'simulator': _config}, _fd)
+        os.environ['RTS2_CONFIG'] = _path
+        try:
+            from src.telescopes import artn_scheduler
+        finally:
+            if _env is None:
+                os.environ.pop('RTS2_CONFIG', None)
+            else:
+                os.environ['RTS2_CONFIG'] = _env
+        _sim = rts2sim_configure(_config)
+
+        # targets then submit(s): the first fills an empty queue, the rest resubmit the same night
+        _ids = []
+        for _i in range(targets):
+            for _ in range(10):
+                try:
+                    _target = stellar(f'bench{_i}', f'{_i % 24:02d}:30:00', '+30:00:00', [so_exposure('V', 30.0, 3)])
+                    _ids.append(_target.create_target_api())
+                    break
+                except Rts2SimError:
+                    pass
+        _entries = [{'id': _id, 'start': None, 'end': None} for _id in _ids]
+        _times, _calls, _failed = [], [], 0
+        # this module's queue, which also holds if artn_scheduler was imported earlier with another client
+        _queue, artn_scheduler.queue = artn_scheduler.queue, queue
+        try:
+            for _ in range(submits):
+                _t, _c = time.perf_counter(), _sim.calls
+                try:
+                    artn_scheduler.submit_queue_entries(_entries, 0, 'plan')
+                except Rts2SimError:
+                    _failed += 1
+                _times.append(time.perf_counter() - _t)
+                _calls.append(_sim.calls - _c)
+        finally:
+            artn_scheduler.queue = _queue
+        _out['submit_first_ms'], _out['submit_first_rts2_calls'] = 1000.0 * _times[0], _calls[0]
+        _out['resubmit_p50_ms'], _out['resubmit_p95_ms'] = _percentiles(_times[1:])
+        _out['resubmit_rts2_calls'] = _calls[-1]
+        _out['submit_failed'] = _failed
+
+        # polling: every poller reads RTS2 directly, then every poller reads the shared snapshot
+        def _direct():
+            try:
+                rts2comm()._getall()
+                Queue('plan').load()
+            except Rts2SimError:
+                pass
+
+        _state = Rts2State(fetch=lambda _t: {'queue_ids': [_e.id for _e in Queue('plan').load().entries]},
+                           path=os.path.join(_tmp, 'rts2_state.sqlite'), poll=poll_interval).start()
+        for _name, _func in (('direct', _direct), ('snapshot', lambda: _state.get('Kuiper'))):
+            _times, _lock, _calls = [], threading.Lock(), _sim.calls
+
+            def _poller():
+                for _ in range(polls):
+                    _t = time.perf_counter()
+                    _func()
+                    with _lock:
+                        _times.append(time.perf_counter() - _t)
+
+            _t0 = time.perf_counter()
+            _threads = [threading.Thread(target=_poller) for _ in range(pollers)]
+            [_t.start() for _t in _threads]
+            [_t.join() for _t in _threads]
+            _elapsed = time.perf_counter() - _t0
+            _out[f'{_name}_p50_ms'], _out[f'{_name}_p95_ms'] = _percentiles(_times)
+            _out[f'{_name}_polls_per_s'] = len(_times) / _elapsed
+            _out[f'{_name}_rts2_calls'] = _sim.calls - _calls
+        _state.stop()
+    return _out
+
+
+# +
+# command line wrappers()
+# -
+def _rts2sim_bench(iargs=None):
+    if iargs is not None:
+        for _k, _v in rts2sim_bench(float(iargs.latency), float(iargs.jitter), float(iargs.failure_rate),
+                                    int(iargs.targets), int(iargs.submits), int(iargs.pollers),
+                                    int(iargs.polls)).items():
+            print(f'{_k:>24s} = {_v:.3f}' if isinstance(_v, float) else f'{_k:>24s} = {_v}')
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'RTS2 Simulator', formatter_class=argparse.RawTextHelpFormatter)
+    _sp = _p.add_subparsers()
+
+    # add sub-parser for rts2sim_bench()
+    _sp_0 = _sp.add_parser('bench', description="Time queue submission and queue polling against the simulator",
+                           formatter_class=argparse.RawTextHelpFormatter)
+    _sp_0.add_argument(f'--latency', default=0.05, help=f"Seconds per RTS2 call, default=%(default)s")
+    _sp_0.add_argument(f'--jitter', default=0.0, help=f"Latency jitter (+/- seconds), default=%(default)s")
+    _sp_0.add_argument(f'--failure-rate', default=0.0, help=f"Fraction of failed calls, default=%(default)s")
+    _sp_0.add_argument(f'--targets', default=40, help=f"Targets per queue submission, default=%(default)s")
+    _sp_0.add_argument(f'--submits', default=5, help=f"Queue submissions, default=%(default)s")
+    _sp_0.add_argument(f'--pollers', default=16, help=f"Concurrent pollers (browser tabs), default=%(default)s")
+    _sp_0.add_argument(f'--polls', default=50, help=f"Polls per poller, default=%(default)s")
+    _sp_0.set_defaults(func=_rts2sim_bench)
+
+    # noinspection PyBroadException
+    try:
+        args = _p.parse_args()
+        args.func(args)
+    except Exception:
+        print(f'Use: python3 {sys.argv[0]}\n--help for more information')
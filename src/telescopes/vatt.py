@@ -21,7 +21,7 @@ try:
     sys.path.append(RTS2SOLIBSRC)
     sys.path.append(RTS2SOLIBPATH)
     # noinspection PyUnresolvedReferences
-    from rts2solib import Queue, stellar, so_exposure
+    from src.telescopes.rts2 import Queue, stellar, so_exposure
 except Exception as e:
     tel_logger.critical(f'failed to load rts2solib, src={RTS2SOLIBSRC}, error={e}')
 
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from src import ARTN_ALLOWED_HEADERS_V1, ARTN_ALLOWED_HEADERS_V2, TRUE_VALUES, check_json
+from src.convert import dms_to_deg, hms_to_deg, iso_to_mjd
+
+import csv
+import json
+import math
+import numpy as np
+import os
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    Single-pass CSV/TSV upload reader shared by the web upload and the utils/ command line tools.
+
+    from src.upload import *
+    _headers, _version = upload_header('/tmp/upload.tsv')
+    _num, _version, _errors = upload_check('/tmp/upload.tsv')
+    for _columns, _errors in upload_batches('/tmp/upload.tsv', 1000):
+        ...   # _columns['ra_deg'] etc are numpy arrays, string fields are lists, _columns['line'] are the file
+              # lines the rows start on (a quoted field can span several lines)
+
+    The first non-blank row is the header (leading '#' etc are stripped from the names), rows whose first
+    field starts with one of UPL__COMMENT_CHARS are ignored and every other row is validated as it is read.
+
+"""
+
+
+# +
+# constant(s)
+# -
+UPL__BATCH = 1000
+UPL__COMMENT_CHARS = r'#%!<>+\/'
+UPL__DELIMITERS = {'csv': ',', 'tsv': '\t'}
+UPL__FLOATS = ('exp_time', 'airmass')
+UPL__FLAGS = ('photometric', 'guiding', 'non_sidereal')
+UPL__HEADER_TABLE = {ord(_c): None for _c in ' !@#$'}
+UPL__INTS = ('num_exp',)
+UPL__SYNC = 100
+UPL__STRINGS = ('username', 'telescope', 'instrument', 'object_name', 'ra', 'dec', 'filter', 'lunarphase',
+                'priority', 'begin', 'end', 'binning', 'dither', 'cadence')
+
+
+# +
+# function: upload_delimiter()
+# -
+def upload_delimiter(file=''):
+    """ returns the delimiter for a .csv or .tsv file """
+    _ext = os.path.splitext(f'{file}')[-1][1:].lower()
+    if _ext not in UPL__DELIMITERS:
+        raise Exception(f'Unsupported file type (not .csv, .tsv)')
+    return UPL__DELIMITERS[_ext]
+
+
+# +
+# function: upload_version()
+# -
+def upload_version(headers=None):
+    """ returns 2 (non-sidereal enabled) or 1 for a cleaned header row """
+    if all(_k in headers for _k in ARTN_ALLOWED_HEADERS_V2):
+        return 2
+    elif all(_k in headers for _k in ARTN_ALLOWED_HEADERS_V1):
+        return 1
+    raise Exception(f'Failed to get all allowed headers, headers={headers}')
+
+
+# +
+# function: _reader()
+# -
+def _reader(file=''):
+    """ yields (line, row) for every non-blank row, line is the file line the row starts on """
+    _file = os.path.abspath(os.path.expanduser(f'{file}'))
+    if not os.path.isfile(_file):
+        raise Exception(f'File not found, _file={_file}')
+    _delimiter = upload_delimiter(_file)
+    with open(_file, 'r', newline='') as _fd:
+        _csv, _line = csv.reader(_fd, delimiter=_delimiter), 1
+        for _row in _csv:
+            if _row and any(_v.strip() != '' for _v in _row):
+                yield _line, _row
+            # quoted fields can span lines so count them from the reader, not the rows
+            _line = _csv.line_num + 1
+
+
+# +
+# function: upload_header()
+# -
+def upload_header(file=''):
+    """ returns (cleaned header names, version) from the first non-blank row """
+    for _line, _row in _reader(file):
+        _headers = [_h.translate(UPL__HEADER_TABLE) for _h in _row]
+        return _headers, upload_version(_headers)
+    raise Exception(f'Failed to get all allowed headers, file={file}')
+
+
+# +
+# function: upload_rows()
+# -
+def upload_rows(file=''):
+    """ yields (line, {header: value} or None if irregular) for every data row, reading the file once """
+    _headers = None
+    for _line, _row in _reader(file):
+        if _headers is None:
+            _headers = [_h.translate(UPL__HEADER_TABLE) for _h in _row]
+            upload_version(_headers)
+        elif _row[0][:1] != '' and _row[0][:1] in UPL__COMMENT_CHARS:
+            continue
+        elif len(_row) != len(_headers):
+            yield _line, None
+        else:
+            yield _line, {_h: _v.strip() for _h, _v in zip(_headers, _row)}
+
+
+# +
+# function: upload_parse()
+# -
+def upload_parse(values=None, refresh=False):
+    """ returns (typed row, '') or (None, error) for one data row """
+
+    # check row shape
+    if values is None:
+        return None, 'irregular number of elements'
+    _typed = {_k: values[_k] for _k in UPL__STRINGS}
+    if _typed['username'] == '' or _typed['object_name'] == '':
+        return None, 'username and object_name are required'
+
+    # co-ordinate(s) and time(s)
+    _typed['ra_deg'], _typed['dec_deg'] = hms_to_deg(_typed['ra']), dms_to_deg(_typed['dec'])
+    if math.isnan(_typed['ra_deg']) or math.isnan(_typed['dec_deg']):
+        return None, f"invalid ra ({_typed['ra']}) or dec ({_typed['dec']})"
+    _typed['begin_mjd'], _typed['end_mjd'] = iso_to_mjd(_typed['begin']), iso_to_mjd(_typed['end'])
+    if math.isnan(_typed['begin_mjd']) or math.isnan(_typed['end_mjd']):
+        return None, f"invalid begin ({_typed['begin']}) or end ({_typed['end']})"
+
+    # number(s) and flag(s)
+    try:
+        for _k in UPL__FLOATS:
+            _typed[_k] = float(values[_k])
+        for _k in UPL__INTS:
+            _typed[_k] = int(values[_k])
+    except ValueError:
+        return None, f"invalid {'/'.join(UPL__FLOATS + UPL__INTS)} " \
+                     f"({'/'.join(values[_k] for _k in UPL__FLOATS + UPL__INTS)})"
+    for _k in UPL__FLAGS:
+        _typed[_k] = values[_k].lower() in TRUE_VALUES
+
+    # non-sidereal json
+    _typed['non_sidereal_json'] = {}
+    if _typed['non_sidereal']:
+        _str = values.get('non_sidereal_json', '')
+        _json = f"{_str[_str.find('{'):_str.rfind('}') + 1]}"
+        if not check_json(_json, refresh):
+            return None, f'invalid non_sidereal_json ({_str})'
+        _typed['non_sidereal_json'] = json.loads(_json)
+
+    # return result
+    return _typed, ''
+
+
+# +
+# function: upload_batches()
+# -
+def upload_batches(file='', batch=UPL__BATCH):
+    """ yields ({column: list or numpy array}, {line: error}) for at most batch valid rows at a time """
+
+    # set default(s)
+    _keys = ('line',) + UPL__STRINGS + ('ra_deg', 'dec_deg', 'begin_mjd', 'end_mjd') + UPL__FLOATS + UPL__INTS + \
+        UPL__FLAGS + ('non_sidereal_json',)
+    _columns, _errors, _refresh = {_k: [] for _k in _keys}, {}, True
+
+    # parse each row as it is read
+    for _line, _values in upload_rows(file):
+        _typed, _error = upload_parse(_values, _refresh)
+        _refresh = _refresh and not (_typed or {}).get('non_sidereal', False)
+        if _typed is None:
+            _errors[_line] = _error
+            continue
+        _typed['line'] = _line
+        for _k in _keys:
+            _columns[_k].append(_typed[_k])
+        if len(_columns['line']) >= batch:
+            yield _pack(_columns), _errors
+            _columns, _errors = {_k: [] for _k in _keys}, {}
+
+    # remainder
+    if _columns['line'] or _errors:
+        yield _pack(_columns), _errors
+
+
+# +
+# function: _pack()
+# -
+def _pack(columns=None):
+    """ converts numeric and flag columns to compact numpy arrays """
+    for _k in ('ra_deg', 'dec_deg', 'begin_mjd', 'end_mjd') + UPL__FLOATS:
+        columns[_k] = np.asarray(columns[_k], dtype=np.float64)
+    for _k in ('line',) + UPL__INTS:
+        columns[_k] = np.asarray(columns[_k], dtype=np.int64)
+    for _k in UPL__FLAGS:
+        columns[_k] = np.asarray(columns[_k], dtype=bool)
+    return columns
+
+
+# +
+# function: upload_check()
+# -
+def upload_check(file='', batch=UPL__BATCH):
+    """ validates a whole file in one pass, returns (number of valid rows, version, {line: error}) """
+    _num, _errors, _version = 0, {}, upload_header(file)[1]
+    for _columns, _e in upload_batches(file, batch):
+        _num += len(_columns['line'])
+        _errors.update(_e)
+    return _num, _version, _errors
+
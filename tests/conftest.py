@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+import json
+import os
+import sys
+import tempfile
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+
+    Shared set-up for the checks, none of which need PostgreSQL or RTS2 (src.telescopes.rts2sim stands in):
+
+    % python3 -m pytest -q tests
+
+"""
+
+
+# +
+# set-up: the repository root (for src and utils), a log directory for src.UtilsLogger and the RTS2 simulator
+# -
+ORP__ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ORP__TMP = tempfile.mkdtemp(prefix='orp-tests-')
+for _p in (ORP__ROOT, os.path.join(ORP__ROOT, 'utils')):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+os.environ.setdefault('ARTN_LOGS', ORP__TMP)
+with open(os.path.join(ORP__TMP, 'rts2_config.json'), 'w') as _fd:
+    json.dump({'simulator': {'database': os.path.join(ORP__TMP, 'rts2sim.sqlite')}}, _fd)
+os.environ['RTS2_CONFIG'] = os.path.join(ORP__TMP, 'rts2_config.json')
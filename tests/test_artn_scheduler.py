@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+import os
+import pytest
+
+from src.telescopes import artn_scheduler, rts2sim
+from src.telescopes.artn_scheduler import queue_diff, queue_time, submit_queue_entries
+
+
+# +
+# constant(s)
+# -
+IDS = list(rts2sim.SIM__FOCUS_IDS)
+
+
+# +
+# function(s)
+# -
+def _entries(ids=None, start=None):
+    return [{'id': _id, 'start': None if start is None else start + 600 * _i,
+             'end': None if start is None else start + 600 * (_i + 1)} for _i, _id in enumerate(ids)]
+
+
+def _queue():
+    return [(_e.id, _e.start, _e.end) for _e in rts2sim.Queue('plan').load().entries]
+
+
+# +
+# fixture(s)
+# -
+@pytest.fixture
+def sim(tmp_path):
+    assert artn_scheduler.queue is rts2sim.queue
+    yield rts2sim.rts2sim_configure({'database': os.path.join(tmp_path, 'rts2sim.sqlite')})
+
+
+# +
+# queue_time(), queue_diff()
+# -
+@pytest.mark.parametrize('value, result', [
+    (1700000000, 1700000000), (1700000000.9, 1700000000), ('1700000000.0', 1700000000), (None, None), ('', None),
+    ('later', None)])
+def test_queue_time(value, result):
+    assert queue_time(value) == result
+
+
+@pytest.mark.parametrize('current, desired, result', [
+    ([], IDS[:3], (False, IDS[:3])),
+    (IDS[:3], IDS[:3], (False, [])),
+    (IDS[:3], IDS[:5], (False, IDS[3:5])),
+    (IDS[:3], IDS[:2], (True, IDS[:2])),
+    (IDS[:3], [IDS[1], IDS[0], IDS[2]], (True, [IDS[1], IDS[0], IDS[2]])),
+    (IDS[:3], [], (True, [])),
+])
+def test_queue_diff(current, desired, result):
+    _clear, _append = queue_diff(_entries(current), _entries(desired))
+    assert (_clear, [_id for _id, _s, _e in _append]) == result
+
+
+def test_queue_diff_times():
+    _current, _desired = _entries(IDS[:3], 1700000000), _entries(IDS[:3], 1700000000)
+    # RTS2 hands times back as floats or strings, the same second is the same entry
+    _current[1]['start'] = f"{_current[1]['start']}.0"
+    assert queue_diff(_current, _desired) == (False, [])
+    _desired[2]['end'] += 60
+    _clear, _append = queue_diff(_current, _desired)
+    assert _clear and [_id for _id, _s, _e in _append] == IDS[:3]
+    assert _append[2] == (IDS[2], 1700001200, 1700001860)
+
+
+# +
+# submit_queue_entries() against the simulator
+# -
+def test_submit_only_sends_the_diff(sim):
+    _first = submit_queue_entries(_entries(IDS[:5]))
+    assert _first == {'cleared': False, 'kept': 0, 'added': 5, 'calls': 6}
+    assert [_id for _id, _s, _e in _queue()] == IDS[:5]
+
+    # unchanged: one load and nothing else
+    _calls = sim.calls
+    assert submit_queue_entries(_entries(IDS[:5])) == {'cleared': False, 'kept': 5, 'added': 0, 'calls': 1}
+    assert sim.calls - _calls == 1
+
+    # one more target: load and one add
+    assert submit_queue_entries(_entries(IDS[:6])) == {'cleared': False, 'kept': 5, 'added': 1, 'calls': 2}
+
+    # a different order: clear and re-add everything
+    _reordered = IDS[1:6] + IDS[:1]
+    assert submit_queue_entries(_entries(_reordered)) == {'cleared': True, 'kept': 0, 'added': 6, 'calls': 8}
+    assert [_id for _id, _s, _e in _queue()] == _reordered
+
+
+def test_submit_set_times_and_queueing(sim):
+    _progress = []
+    _result = submit_queue_entries(_entries(IDS[:3], 1700000000), 5, 'plan', lambda _f, _m='': _progress.append(_f))
+    assert _result == {'cleared': False, 'kept': 0, 'added': 3, 'calls': 5}
+    assert _progress == pytest.approx([1 / 3, 2 / 3, 1.0])
+    assert rts2sim.Queue('plan').load().queueing == 5
+    assert _queue() == [(_e['id'], _e['start'], _e['end']) for _e in _entries(IDS[:3], 1700000000)]
+    assert submit_queue_entries(_entries(IDS[:3], 1700000000), 5)['calls'] == 1
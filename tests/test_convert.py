@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from astropy.coordinates import Angle
+from astropy.time import Time
+from datetime import datetime, timedelta, timezone
+
+import math
+import numpy as np
+import pytest
+import random
+
+from src.convert import *
+
+
+# +
+# constant(s)
+# -
+CNV__TOLERANCE = 1.0e-12
+RANDOM = random.Random(20201018)
+HMS = [f'{_h:02d}:{_m:02d}:{_s:06.3f}' for _h, _m, _s in
+       [(RANDOM.randrange(24), RANDOM.randrange(60), RANDOM.uniform(0.0, 59.999)) for _ in range(200)]]
+DMS = [f'{_g}{_d:02d}:{_m:02d}:{_s:05.2f}' for _g, _d, _m, _s in
+       [(RANDOM.choice('+-'), RANDOM.randrange(90), RANDOM.randrange(60), RANDOM.uniform(0.0, 59.99))
+        for _ in range(200)]]
+ISO = [(datetime(2020, 1, 1) + timedelta(seconds=RANDOM.uniform(0.0, 3.0e8))).isoformat(
+    sep=RANDOM.choice(' T'), timespec='microseconds') for _ in range(200)]
+
+
+# +
+# sexagesimal
+# -
+def test_hms_matches_astropy():
+    for _v in HMS + ['-00:30:00', '23:59:59.999', '0:0:0', '12:30', '7']:
+        assert hms_to_deg(_v) == pytest.approx(float(Angle(f'{_v} hours').degree), abs=CNV__TOLERANCE), _v
+
+
+def test_dms_matches_astropy():
+    for _v in DMS + ['-00:00:01', '+89:59:59.99', '-5:06', '45']:
+        assert dms_to_deg(_v) == pytest.approx(float(Angle(f'{_v} degrees').degree), abs=CNV__TOLERANCE), _v
+
+
+# noinspection PyBroadException
+def _angle(value='', unit='degrees'):
+    """ what src.ra_to_deg() / src.dec_to_deg() did before src.convert """
+    if not isinstance(value, str) or value.strip() == '':
+        return math.nan
+    try:
+        return float(Angle(value if unit in value.lower() else f'{value} {unit}').degree)
+    except Exception:
+        return math.nan
+
+
+@pytest.mark.parametrize('value', ['12h30m00s', '12 30 00', '12:30:60', '12:60:00', '1.5 hours', '-10d30m00s',
+                                   '10.5 degrees', 'north', '', '   ', None, 12.5])
+def test_sexagesimal_fallback_matches_old(value):
+    for _func, _unit in ((hms_to_deg, 'hours'), (dms_to_deg, 'degrees')):
+        _old = _angle(value, _unit)
+        if math.isnan(_old):
+            assert math.isnan(_func(value))
+        else:
+            assert _func(value) == pytest.approx(_old, abs=CNV__TOLERANCE)
+
+
+def test_sexagesimal_arrays_match_scalars():
+    for _values, _func, _array in ((HMS, hms_to_deg, hms_to_deg_array), (DMS, dms_to_deg, dms_to_deg_array)):
+        # fast path (all a:b:c) and the per-element path (mixed formats and failures)
+        np.testing.assert_array_equal(_array(_values), [_func(_v) for _v in _values])
+        _mixed = _values[:10] + ['12:30', '', 'bad', '-0:30:00', '1h2m3s']
+        np.testing.assert_allclose(_array(_mixed), [_func(_v) for _v in _mixed], atol=CNV__TOLERANCE)
+    assert len(hms_to_deg_array([])) == 0 and len(dms_to_deg_array(None)) == 0
+
+
+def test_deg_to_hms_dms_round_trip():
+    for _v in HMS:
+        _h, _m, _s = deg_to_hms(hms_to_deg(_v))
+        assert (_h + _m / 60.0 + _s / 3600.0) * 15.0 == pytest.approx(hms_to_deg(_v), abs=CNV__TOLERANCE)
+    for _v in DMS:
+        _g, _d, _m, _s = deg_to_dms(dms_to_deg(_v))
+        assert _g * (_d + _m / 60.0 + _s / 3600.0) == pytest.approx(dms_to_deg(_v), abs=CNV__TOLERANCE)
+        assert _g == (-1.0 if _v.startswith('-') and dms_to_deg(_v) != 0.0 else 1.0)
+
+
+# +
+# time(s)
+# -
+def test_iso_to_mjd_matches_astropy():
+    for _v in ISO + ['2020-07-26', '2020-07-26 12:00', '1999-12-31T23:59:59.5']:
+        _mjd = float(Time(_v.replace(' ', 'T'), format='isot' if ':' in _v else 'iso', scale='utc').mjd)
+        assert iso_to_mjd(_v) == pytest.approx(_mjd, abs=CNV__TOLERANCE), _v
+        assert iso_to_jd(_v) == pytest.approx(_mjd + 2400000.5, abs=1.0e-8), _v
+
+
+def test_iso_to_mjd_datetime_and_failure():
+    assert iso_to_mjd(datetime(2020, 7, 26)) == 59056.0
+    assert iso_to_mjd(datetime(2020, 7, 26, 2, tzinfo=timezone(timedelta(hours=2)))) == 59056.0
+    for _v in ('', 'yesterday', '2020-02-30 00:00:00', None):
+        assert math.isnan(iso_to_mjd(_v)), _v
+
+
+def test_mjd_to_iso_matches_astropy():
+    # like the astropy code it replaces this goes through the jd, so it is good to tens of microseconds only
+    for _v in ISO:
+        _mjd = iso_to_mjd(_v)
+        _iso = Time(_mjd + 2400000.5, format='jd', precision=6).iso
+        assert abs(mjd_to_datetime(_mjd) - datetime.fromisoformat(_iso)) <= timedelta(microseconds=1), _v
+        assert abs(mjd_to_datetime(_mjd) - datetime.fromisoformat(_v)) <= timedelta(microseconds=50), _v
+    assert mjd_to_iso(59056.0) == '2020-07-26 00:00:00.000000'
+    assert jd_to_iso(2459056.5) == '2020-07-26T00:00:00.000000'
+
+
+def test_iso_array_matches_scalars():
+    np.testing.assert_array_equal(iso_to_mjd_array(ISO), [iso_to_mjd(_v) for _v in ISO])
+    _mixed = ISO[:5] + ['', 'bad', '2020-07-26', None]
+    np.testing.assert_allclose(iso_to_mjd_array(_mixed), [iso_to_mjd(_v) for _v in _mixed], atol=CNV__TOLERANCE)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from astropy.io import fits
+
+import numpy as np
+import pytest
+
+from src.fitsheader import FITS__BLOCK, _scan, fits_header
+
+
+# +
+# constant(s)
+# -
+CARDS = [
+    ('OBJECT', 'M31', 'target name'),
+    ('OBSERVER', "O'Brien", 'escaped quote'),
+    ('FILTER', 'V   ', 'trailing blanks'),
+    ('EMPTY', '', 'empty string'),
+    ('SLASH', 'a/b', 'slash inside a string'),
+    ('PHOTOM', True, 'bool'),
+    ('GUIDING', False, 'bool'),
+    ('NUMEXP', 3, 'int'),
+    ('OFFSET', -42, 'negative int'),
+    ('EXPTIME', 30.0, 'float'),
+    ('JULIAN', 2460053.712345678, 'float'),
+    ('AIRMASS', 1.2e-5, 'exponent'),
+    ('RA', '00:42:44.3', 'sexagesimal string'),
+]
+
+
+# +
+# function(s)
+# -
+def _write(path, cards=None, data=True):
+    _hdr = fits.Header()
+    for _card in cards or CARDS:
+        _hdr.append(_card)
+    fits.PrimaryHDU(data=np.zeros((64, 64), dtype=np.int16) if data else None, header=_hdr).writeto(path)
+    return str(path)
+
+
+def _astropy(path='', keys=None):
+    _hdr = fits.getheader(path, 0)
+    return {_k: _hdr[_k] for _k in keys if _k in _hdr}
+
+
+# +
+# fits_header()
+# -
+@pytest.mark.parametrize('data', [True, False])
+def test_matches_astropy(tmp_path, data):
+    _file = _write(tmp_path / 'a.fits', data=data)
+    _keys = [_c[0] for _c in CARDS] + ['NAXIS1', 'BITPIX', 'MISSING']
+    _fast, _slow = fits_header(_file, _keys), _astropy(_file, _keys)
+    assert _fast == _slow
+    assert {_k: type(_v) for _k, _v in _fast.items()} == {_k: type(_v) for _k, _v in _slow.items()}
+    assert 'MISSING' not in _fast and _fast['OBSERVER'] == "O'Brien" and _fast['FILTER'] == 'V'
+
+
+def test_long_header(tmp_path):
+    # more than one 2880-byte header block
+    _cards = CARDS + [(f'KEY{_i:03d}', _i * 0.5, 'padding') for _i in range(60)]
+    _file = _write(tmp_path / 'a.fits', _cards)
+    _keys = ['OBJECT', 'KEY000', 'KEY059', 'NUMEXP']
+    assert fits_header(_file, _keys) == _astropy(_file, _keys)
+
+
+def test_fallback_to_astropy(tmp_path):
+    # a long-string CONTINUE card is handed to astropy
+    _long = 'x' * 100
+    _file = _write(tmp_path / 'a.fits', CARDS + [('LONGSTR', _long, 'continue')])
+    assert fits_header(_file, ['LONGSTR', 'OBJECT']) == {'LONGSTR': _long, 'OBJECT': 'M31'}
+
+
+def test_truncated_file(tmp_path):
+    _file = _write(tmp_path / 'a.fits')
+    with open(_file, 'rb') as _fd:
+        _bytes = _fd.read()
+    _short = tmp_path / 'short.fits'
+    _short.write_bytes(_bytes[:FITS__BLOCK + 100])
+    assert fits_header(str(_short), ['OBJECT', 'NUMEXP']) == {'OBJECT': 'M31', 'NUMEXP': 3}
+    _empty = tmp_path / 'empty.fits'
+    _empty.write_bytes(b'')
+    with pytest.raises(Exception):
+        fits_header(str(_empty), ['OBJECT'])
+
+
+def test_scan():
+    _cards = ["SIMPLE  =                    T", "DEXP    =               1.5D+2", "INTF    =                  +7",
+              "NOVALUE   no equals sign here", "END"]
+    _buf = b''.join(f'{_c:80s}'.encode('ascii') for _c in _cards)
+    assert _scan(_buf, ['SIMPLE', 'DEXP', 'INTF', 'NOVALUE']) == {'SIMPLE': True, 'DEXP': 150.0, 'INTF': 7}
+    with pytest.raises(ValueError):
+        _scan(_buf[80:], ['DEXP'])
+    with pytest.raises(ValueError):
+        _scan(_buf[:-80], ['DEXP'])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+import base64
+import pytest
+
+from src.models.Models import keyset_cursor, keyset_id, keyset_page, like_prefix
+
+
+# +
+# constant(s)
+# -
+Base = declarative_base()
+NAMES = ['M31', 'M31_a', 'M31%b', 'M31\\c', 'M3', 'm31', 'SN2020abc', 'SN_2020', 'NGC 224']
+
+
+# +
+# class: Row()
+# -
+class Row(Base):
+    __tablename__ = 'rows'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(32))
+
+
+# +
+# fixture(s)
+# -
+@pytest.fixture
+def session():
+    _engine = create_engine('sqlite://')
+    Base.metadata.create_all(_engine)
+    with Session(_engine) as _session:
+        _session.add_all([Row(id=_i + 1, name=_n) for _i, _n in enumerate(NAMES * 5)])
+        _session.commit()
+        yield _session
+
+
+# +
+# keyset_cursor(), keyset_id()
+# -
+@pytest.mark.parametrize('last_id', [0, 1, 20, 123456789])
+def test_cursor_round_trip(last_id):
+    _cursor = keyset_cursor(last_id)
+    assert '=' not in _cursor and keyset_id(_cursor) == last_id
+    assert keyset_id(f'  {_cursor} ') == last_id
+
+
+def test_cursor_first_page():
+    assert keyset_id('') is None and keyset_id('   ') is None
+
+
+@pytest.mark.parametrize('cursor', ['x', '20', 'not a cursor!',
+                                    base64.urlsafe_b64encode(b'{"page": 2}').decode(),
+                                    base64.urlsafe_b64encode(b'{"id": "two"}').decode(),
+                                    base64.urlsafe_b64encode(b'[20]').decode()])
+def test_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        keyset_id(cursor)
+
+
+# +
+# keyset_page()
+# -
+@pytest.mark.parametrize('descending', [True, False])
+def test_keyset_pages(session, descending):
+    _query, _seen, _cursor = session.query(Row).order_by(Row.name), [], ''
+    while True:
+        _rows, _cursor = keyset_page(_query, Row.id, _cursor, 7, descending)
+        assert len(_rows) <= 7
+        _seen.extend(_r.id for _r in _rows)
+        if _cursor == '':
+            break
+    assert _seen == sorted(range(1, len(NAMES) * 5 + 1), reverse=descending)
+
+
+def test_keyset_page_exact_fit(session):
+    _rows, _cursor = keyset_page(session.query(Row), Row.id, '', len(NAMES) * 5)
+    assert len(_rows) == len(NAMES) * 5 and _cursor == ''
+
+
+# +
+# like_prefix()
+# -
+@pytest.mark.parametrize('value, pattern', [
+    ('M31', 'M31%'), ('', '%'), ('SN_', 'SN\\_%'), ('50%', '50\\%%'), ('a\\b', 'a\\\\b%'), (42, '42%')])
+def test_like_prefix(value, pattern):
+    assert like_prefix(value) == pattern
+
+
+@pytest.mark.parametrize('prefix', ['M31', 'M31_', 'M31%', 'M31\\', 'SN_', 'NGC ', 'm3'])
+def test_like_prefix_matches_literally(session, prefix):
+    _rows = session.query(Row.name).filter(Row.name.like(like_prefix(prefix), escape='\\')).distinct().all()
+    # sqlite LIKE is case-insensitive for ascii, postgresql's is not
+    assert {_r.name for _r in _rows} == {_n for _n in NAMES if _n.lower().startswith(prefix.lower())}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from datetime import datetime
+
+import check_upload_format
+import check_upload_format_standalone
+import csv
+import json
+import numpy as np
+import pytest
+import re
+
+from src import ARTN_ALLOWED_HEADERS_V2
+from src.upload import upload_batches, upload_check, upload_parse, upload_rows
+
+
+# +
+# constant(s)
+# -
+ROW = {'username': 'artn', 'telescope': 'Kuiper', 'instrument': 'Mont4k', 'object_name': 'M31',
+       'ra': '00:42:44.3', 'dec': '+41:16:09', 'filter': 'V', 'exp_time': '30.0', 'num_exp': '3', 'airmass': '2.0',
+       'lunarphase': 'Dark', 'priority': 'Normal', 'photometric': 'false', 'guiding': 'true', 'non_sidereal': 'false',
+       'begin': '2026-10-18 00:00:00', 'end': '2026-10-19 00:00:00', 'binning': '1', 'dither': '0',
+       'cadence': 'Once', 'non_sidereal_json': '{}'}
+
+
+# +
+# function(s)
+# -
+def _json(indent=None, **kwargs):
+    _d = {'ObjectRate': 1.0, 'RA_BiasRate': 0.5, 'Dec_BiasRate': -0.5, 'PositionAngle': 10.0,
+          'UTC_At_Position': datetime.now().replace(microsecond=0).isoformat()}
+    return json.dumps(dict(_d, **kwargs), indent=indent)
+
+
+def _row(**kwargs):
+    return dict(ROW, **kwargs)
+
+
+def _write(path, rows=None, delimiter=','):
+    """ writes rows (dicts, lists or raw strings) after the header, returns path """
+    with open(path, 'w', newline='') as _fd:
+        _w = csv.writer(_fd, delimiter=delimiter)
+        _w.writerow(ARTN_ALLOWED_HEADERS_V2)
+        for _r in rows:
+            if isinstance(_r, str):
+                _fd.write(f'{_r}\r\n')
+            else:
+                _w.writerow([_r[_k] for _k in ARTN_ALLOWED_HEADERS_V2] if isinstance(_r, dict) else _r)
+    return str(path)
+
+
+def _error_lines(text=''):
+    return sorted(int(_l) for _l in re.findall(r'^ERROR: line (\d+):', text, re.MULTILINE))
+
+
+# +
+# upload_parse()
+# -
+def test_parse_valid_row():
+    _typed, _error = upload_parse(_row())
+    assert _error == ''
+    assert _typed['ra_deg'] == pytest.approx(10.684583333333334, abs=1e-12)
+    assert _typed['dec_deg'] == pytest.approx(41.269166666666667, abs=1e-12)
+    assert _typed['end_mjd'] - _typed['begin_mjd'] == pytest.approx(1.0, abs=1e-9)
+    assert (_typed['exp_time'], _typed['num_exp'], _typed['airmass']) == (30.0, 3, 2.0)
+    assert isinstance(_typed['num_exp'], int)
+    assert (_typed['photometric'], _typed['guiding'], _typed['non_sidereal']) == (False, True, False)
+    assert _typed['non_sidereal_json'] == {}
+
+
+@pytest.mark.parametrize('values, error', [
+    (None, 'irregular number of elements'),
+    (_row(username=''), 'username and object_name are required'),
+    (_row(ra='25:99:00'), 'invalid ra'),
+    (_row(dec='north'), 'invalid ra'),
+    (_row(begin='yesterday'), 'invalid begin'),
+    (_row(exp_time='long'), 'invalid exp_time'),
+    (_row(num_exp='3.5'), 'invalid exp_time'),
+    (_row(non_sidereal='true', non_sidereal_json='{"ObjectRate": 1.0}'), 'invalid non_sidereal_json'),
+])
+def test_parse_invalid_row(values, error):
+    _typed, _error = upload_parse(values)
+    assert _typed is None
+    assert _error.startswith(error)
+
+
+def test_parse_non_sidereal():
+    _typed, _error = upload_parse(_row(non_sidereal='True', non_sidereal_json=f"'{_json()}'"))
+    assert _error == ''
+    assert _typed['non_sidereal'] is True
+    assert _typed['non_sidereal_json']['PositionAngle'] == 10.0
+
+
+def test_parse_non_sidereal_out_of_range():
+    _typed, _error = upload_parse(_row(non_sidereal='1', non_sidereal_json=_json(ObjectRate=11.0)))
+    assert _typed is None and _error.startswith('invalid non_sidereal_json')
+
+
+# +
+# upload_rows(), upload_batches(), upload_check()
+# -
+@pytest.mark.parametrize('suffix, delimiter', [('csv', ','), ('tsv', '\t')])
+def test_batches(tmp_path, suffix, delimiter):
+    _file = _write(tmp_path / f'upload.{suffix}', [
+        _row(object_name='a'),                    # line 2
+        f'# a comment{delimiter}ignored',         # line 3
+        '',                                       # line 4
+        _row(object_name='b'),                    # line 5
+        ['too', 'short'],                         # line 6
+        _row(object_name='c', ra='xx'),           # line 7
+        _row(object_name='d'),                    # line 8
+        _row(object_name='e', guiding='0'),       # line 9
+    ], delimiter)
+    _batches = list(upload_batches(_file, 2))
+    assert [list(_c['object_name']) for _c, _ in _batches] == [['a', 'b'], ['d', 'e']]
+    assert [list(_c['line']) for _c, _ in _batches] == [[2, 5], [8, 9]]
+    assert _batches[0][1] == {}
+    assert _batches[1][1] == {6: 'irregular number of elements', 7: 'invalid ra (xx) or dec (+41:16:09)'}
+    _columns = _batches[1][0]
+    assert _columns['ra_deg'].dtype == np.float64 and _columns['num_exp'].dtype == np.int64
+    assert _columns['guiding'].dtype == bool and list(_columns['guiding']) == [True, False]
+    assert upload_check(_file, 2) == (4, 2, {6: 'irregular number of elements',
+                                             7: 'invalid ra (xx) or dec (+41:16:09)'})
+
+
+def test_rows_multiline_field(tmp_path):
+    _file = _write(tmp_path / 'upload.csv', [
+        _row(object_name='a', non_sidereal='true', non_sidereal_json=_json(indent=2)),    # lines 2-8
+        _row(object_name='b', ra='xx'),                                                   # line 9
+        _row(object_name='c', non_sidereal='true', non_sidereal_json='{\n"ObjectRate": 1\n}'),  # lines 10-12
+        ['too', 'short'],                                                                 # line 13
+    ])
+    assert [_l for _l, _ in upload_rows(_file)] == [2, 9, 10, 13]
+    _num, _version, _errors = upload_check(_file)
+    assert (_num, _version) == (1, 2)
+    assert sorted(_errors) == [9, 10, 13]
+
+
+def test_bad_header(tmp_path):
+    _file = tmp_path / 'upload.csv'
+    _file.write_text('username,telescope\nartn,Kuiper\n')
+    with pytest.raises(Exception, match='Failed to get all allowed headers'):
+        upload_check(str(_file))
+
+
+# +
+# utils/check_upload_format_standalone.py stays in step with src.upload (via utils/check_upload_format.py)
+# -
+PARITY = {
+    'clean': [_row(object_name=f'target{_i}') for _i in range(5)],
+    'irregular': [_row(), ['too', 'short'], '', _row(), list(ROW.values()) + ['extra']],
+    'comments': ['# comment', _row(), '%another,comment', '!', _row()],
+    'non_sidereal': [_row(non_sidereal='true', non_sidereal_json=_json()),
+                     _row(non_sidereal='true', non_sidereal_json=_json(PositionAngle=720.0)),
+                     _row(non_sidereal='t', non_sidereal_json='{}'),
+                     _row(non_sidereal='false', non_sidereal_json='not json'),
+                     _row(non_sidereal='1', non_sidereal_json='not json')],
+    'multiline': [_row(non_sidereal='true', non_sidereal_json=_json(indent=4)), ['too', 'short'],
+                  _row(non_sidereal='true', non_sidereal_json='{\n\n}'), _row()],
+}
+
+
+@pytest.mark.parametrize('name', sorted(PARITY))
+@pytest.mark.parametrize('suffix, delimiter', [('csv', ','), ('tsv', '\t')])
+def test_standalone_parity(tmp_path, capsys, name, suffix, delimiter):
+    _file = _write(tmp_path / f'{name}.{suffix}', PARITY[name], delimiter)
+    _shared = check_upload_format.check_upload_format(_file)
+    _shared_lines = _error_lines(capsys.readouterr().out)
+    _standalone = check_upload_format_standalone.check_upload_format(_file)
+    _standalone_lines = _error_lines(capsys.readouterr().out)
+    assert _standalone == _shared
+    assert _standalone_lines == _shared_lines
+    assert _shared[1] == len(_shared_lines)
+
+
+def test_standalone_bad_header(tmp_path):
+    _file = tmp_path / 'upload.tsv'
+    _file.write_text('username\ttelescope\nartn\tKuiper\n')
+    for _check in (check_upload_format.check_upload_format, check_upload_format_standalone.check_upload_format):
+        with pytest.raises(Exception, match='Failed to get all allowed headers'):
+            _check(str(_file))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from src.convert import dms_to_deg, dms_to_deg_array, hms_to_deg, hms_to_deg_array, iso_to_mjd, iso_to_mjd_array
+from astropy.coordinates import Angle
+from astropy.time import Time
+
+import argparse
+import numpy as np
+import random
+import time
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+  % python3 bench_convert.py --help
+"""
+
+
+# +
+# function: bench_rows()
+# -
+def bench_rows(_rows=100000, _seed=42):
+    """ returns (ra, dec, iso) lists shaped like an upload file """
+    _r = random.Random(_seed)
+    _ra = [f'{_r.randint(0, 23):02d}:{_r.randint(0, 59):02d}:{_r.uniform(0.0, 59.999):06.3f}' for _ in range(_rows)]
+    _dec = [f'{_r.choice("+-")}{_r.randint(0, 89):02d}:{_r.randint(0, 59):02d}:{_r.uniform(0.0, 59.99):05.2f}'
+            for _ in range(_rows)]
+    _iso = [f'{_r.randint(2019, 2025)}-{_r.randint(1, 12):02d}-{_r.randint(1, 28):02d}T{_r.randint(0, 23):02d}:'
+            f'{_r.randint(0, 59):02d}:{_r.randint(0, 59):02d}.{_r.randint(0, 999999):06d}' for _ in range(_rows)]
+    return _ra, _dec, _iso
+
+
+# +
+# function: _timed()
+# -
+def _timed(_func=None, *args):
+    _t = time.perf_counter()
+    _out = _func(*args)
+    return time.perf_counter() - _t, np.asarray(_out, dtype=float)
+
+
+# +
+# function: bench_convert()
+# -
+def bench_convert(_rows=100000, _sample=0):
+    """ times astropy string parsing against src.convert (scalar and vectorized) """
+
+    # set default(s), astropy timings may be extrapolated from a sample
+    _ra, _dec, _iso = bench_rows(_rows)
+    _n = _rows if _sample <= 0 else min(_sample, _rows)
+    _scale = _rows / _n
+    _cases = (
+        ('ra  (hms)', _ra, lambda _v: [float(Angle(f'{_x} hours').degree) for _x in _v],
+         lambda _v: [hms_to_deg(_x) for _x in _v], hms_to_deg_array, 1.0e-9),
+        ('dec (dms)', _dec, lambda _v: [float(Angle(f'{_x} degrees').degree) for _x in _v],
+         lambda _v: [dms_to_deg(_x) for _x in _v], dms_to_deg_array, 1.0e-9),
+        ('iso (mjd)', _iso, lambda _v: [float(Time(_x).mjd) for _x in _v],
+         lambda _v: [iso_to_mjd(_x) for _x in _v], iso_to_mjd_array, 1.0e-10))
+
+    print(f"rows={_rows}, astropy rows={_n}{' (extrapolated)' if _n != _rows else ''}")
+    print(f"{'case':10s} {'astropy':>10s} {'scalar':>10s} {'vector':>10s} {'x scalar':>9s} {'x vector':>9s} "
+          f"{'max |diff|':>11s}")
+    for _name, _values, _slow, _fast, _vector, _tol in _cases:
+        _t_slow, _ref = _timed(_slow, _values[:_n])
+        _t_slow *= _scale
+        _t_fast, _out = _timed(_fast, _values)
+        _t_vec, _vout = _timed(_vector, _values)
+        _diff = max(np.max(np.abs(_out[:_n] - _ref)), np.max(np.abs(_vout[:_n] - _ref)))
+        print(f"{_name:10s} {_t_slow:9.3f}s {_t_fast:9.3f}s {_t_vec:9.3f}s {_t_slow / _t_fast:8.1f}x "
+              f"{_t_slow / _t_vec:8.1f}x {_diff:11.3e}{'' if _diff <= _tol else ' FAIL'}")
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'Benchmark src.convert against astropy',
+                                 formatter_class=argparse.RawTextHelpFormatter)
+    _p.add_argument(f'--rows', default=100000, help="""Number of rows, default=%(default)s""")
+    _p.add_argument(f'--sample', default=0, help="""Astropy rows (0=all, else extrapolate), default=%(default)s""")
+    args = _p.parse_args()
+
+    # execute
+    bench_convert(_rows=int(args.rows), _sample=int(args.sample))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+
+# +
+# import(s)
+# -
+from src import ARTN_FITS_HEADERS
+from src.fitsheader import fits_header
+from astropy.io import fits
+
+import argparse
+import numpy as np
+import os
+import random
+import tempfile
+import time
+
+
+# +
+# __doc__ string
+# -
+__doc__ = """
+  % python3 bench_fits.py --help
+"""
+
+
+# +
+# function: bench_files()
+# -
+def bench_files(_dir='', _files=200, _size=1024, _seed=42):
+    """ writes _files synthetic _size x _size int16 images with ARTN_FITS_HEADERS keywords, returns their paths """
+    _r = random.Random(_seed)
+    _data = np.zeros((_size, _size), dtype=np.int16)
+    _paths = []
+    for _i in range(_files):
+        _h = fits.Header()
+        _h['AIRMASS'], _h['ARTNGID'], _h['ARTNOID'] = _r.uniform(1.0, 3.0), f'{_r.getrandbits(64):x}', f'{_i:08d}'
+        _h['AZIMUTH'], _h['BINNING'], _h['CAMTEMP'] = _r.uniform(0.0, 360.0), '2x2', _r.uniform(-120.0, -100.0)
+        _h['DATE-OBS'], _h['DEC'], _h['DETSIZE'] = '2023-04-18', '+41:16:09', f'[1:{_size},1:{_size}]'
+        _h['DEWTEMP'], _h['ELEVAT'], _h['EPOCH'] = _r.uniform(-200.0, -180.0), _r.uniform(20.0, 90.0), 2000.0
+        _h['EXPTIME'], _h['FILTER'], _h['FOCUS'] = _r.choice([1.0, 30.0, 300.0]), _r.choice('UBVRI'), -1234
+        _h['IMAGETYP'], _h['INSTRUME'], _h['JULIAN'] = 'object', 'Mont4k', 2460053.5 + _i / 1440.0
+        _h['OBJECT'], _h['RA'], _h['ROTANGLE'] = f"O'bject {_i}", '00:42:44.3', _r.uniform(-180.0, 180.0)
+        _h['TIME-OBS'] = f'{_i // 60 % 24:02d}:{_i % 60:02d}:00.0'
+        for _j in range(100):
+            _h[f'HIST{_j:04d}'] = _r.uniform(0.0, 1.0)
+        _paths.append(os.path.join(_dir, f'bench_{_i:05d}.fits'))
+        fits.PrimaryHDU(_data, header=_h).writeto(_paths[-1], overwrite=True)
+    return _paths
+
+
+# +
+# function: _astropy()
+# -
+# noinspection PyBroadException
+def _astropy(_paths=None):
+    """ the fits.open() / per-key lookup pattern this replaces """
+    _out = []
+    for _p in _paths:
+        _d = {}
+        with fits.open(_p) as _hdul:
+            for _h in ARTN_FITS_HEADERS:
+                try:
+                    _d[_h] = _hdul[0].header[_h]
+                except Exception:
+                    pass
+        _out.append(_d)
+    return _out
+
+
+# +
+# function: bench_fits()
+# -
+def bench_fits(_files=200, _size=1024, _repeat=3):
+    """ times fits.open() against fits_header() on a synthetic directory """
+
+    with tempfile.TemporaryDirectory() as _tmp:
+        _t = time.perf_counter()
+        _paths = bench_files(_tmp, _files, _size)
+        print(f"wrote {_files} {_size}x{_size} file(s) in {time.perf_counter() - _t:.3f}s")
+
+        # best of _repeat (the page cache is warm after the first pass)
+        _slow, _fast = [], []
+        for _ in range(_repeat):
+            _t = time.perf_counter()
+            _ref = _astropy(_paths)
+            _slow.append(time.perf_counter() - _t)
+            _t = time.perf_counter()
+            _out = [fits_header(_p, ARTN_FITS_HEADERS) for _p in _paths]
+            _fast.append(time.perf_counter() - _t)
+
+        # compare
+        _bad = sum(1 for _a, _b in zip(_ref, _out) if _a != _b or
+                   any(type(_a[_k]) is not type(_b[_k]) for _k in _a))
+        print(f"{'reader':12s} {'total':>10s} {'per file':>10s}")
+        print(f"{'fits.open':12s} {min(_slow):9.3f}s {1000.0 * min(_slow) / _files:8.3f}ms")
+        print(f"{'fits_header':12s} {min(_fast):9.3f}s {1000.0 * min(_fast) / _files:8.3f}ms")
+        print(f"speedup {min(_slow) / min(_fast):.1f}x, mismatched file(s) {_bad}{'' if _bad == 0 else ' FAIL'}")
+
+
+# +
+# main()
+# -
+if __name__ == '__main__':
+
+    # get command line argument(s)
+    # noinspection PyTypeChecker
+    _p = argparse.ArgumentParser(description=f'Benchmark src.fitsheader against astropy.io.fits',
+                                 formatter_class=argparse.RawTextHelpFormatter)
+    _p.add_argument(f'--files', default=200, help="""Number of files, default=%(default)s""")
+    _p.add_argument(f'--repeat', default=3, help="""Repeats (best is reported), default=%(default)s""")
+    _p.add_argument(f'--size', default=1024, help="""Image size (pixels), default=%(default)s""")
+    args = _p.parse_args()
+
+    # execute
+    bench_fits(_files=int(args.files), _size=int(args.size), _repeat=int(args.repeat))
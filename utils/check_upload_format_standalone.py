@@ -140,16 +140,59 @@ def check_json(_json='', refresh=True):
     return True
 
 
+# +
+# function: upload_version()
+# -
+def upload_version(_headers=None):
+    """ returns 2 (non-sidereal enabled) or 1 for a cleaned header row, mirrors src.upload.upload_version() """
+    if all(_k in _headers for _k in ARTN_ALLOWED_HEADERS_V2):
+        return 2
+    elif all(_k in _headers for _k in ARTN_ALLOWED_HEADERS_V1):
+        return 1
+    raise Exception(f'Failed to get all allowed headers, headers={_headers}')
+
+
+# +
+# function: upload_rows()
+# -
+def upload_rows(_file=''):
+    """ yields (line, headers, {header: value} or None if irregular) for every data row and (line, headers, None)
+        for the header row, mirrors src.upload.upload_rows() """
+    _delimiter = {'csv': ',', 'tsv': '\t'}.get(os.path.splitext(_file)[-1][1:].lower(), '')
+    if _delimiter == '':
+        raise Exception(f'Unsupported file type (not .csv, .tsv)')
+    _headers = None
+    with open(_file, 'r', newline='') as _fd:
+        _csv, _line = csv.reader(_fd, delimiter=_delimiter), 1
+        for _row in _csv:
+            if not _row or all(_v.strip() == '' for _v in _row):
+                pass
+            elif _headers is None:
+                _headers = [_h.translate({ord(i): None for i in ' !@#$'}) for _h in _row]
+                upload_version(_headers)
+                yield _line, _headers, None
+            elif _row[0][:1] != '' and _row[0][:1] in r'#%!<>+\/':
+                pass
+            elif len(_row) != len(_headers):
+                yield _line, _headers, None
+            else:
+                yield _line, _headers, {_h: _v.strip() for _h, _v in zip(_headers, _row)}
+            # quoted fields can span lines so count them from the reader, not the rows
+            _line = _csv.line_num + 1
+
+
 # +
 # function: check_upload_format()
 # -
 def check_upload_format(_infil='', _verbose=False, _json=True):
+    """ checks the header, row shape and non-sidereal json of every row, the rest of src.upload.upload_parse()
+        (co-ordinates, times and numbers) needs the ORP source tree so use utils/check_upload_format.py for that """
 
     # check input(s)
     if _infil == '':
         raise Exception(f'Invalid argument, infil={_infil}')
     if _verbose:
-        print(f"Executing> upload_from_file(_infil={_infil}, _verbose={_verbose})")
+        print(f"Executing> check_upload_format(_infil={_infil}, _verbose={_verbose})")
 
     # does infil file exist?
     _file = os.path.abspath(os.path.expanduser(_infil))
@@ -158,78 +201,41 @@ def check_upload_format(_infil='', _verbose=False, _json=True):
     if _verbose:
         print(f"Found _file={_file}")
 
-    # get number of lines in file
-    _num = 0
-    with open(_file, 'r') as _fd:
-        _num = sum(1 for _l in _fd if (_l.strip() != '' and _l.strip()[0] not in r'#%!<>+\/'))
-    if _verbose:
-        print(f"File {_file} has {_num} non-comment entries")
-
-    # check file type is supported
-    _delimiter = ''
-    if _file.lower().endswith('csv'):
-        _delimiter = ','
-        if _verbose:
-            print(f"File {_file} has {_num} non-comment entries in CSV format")
-    elif _file.lower().endswith('tsv'):
-        _delimiter = '\t'
-        if _verbose:
-            print(f"File {_file} has {_num} non-comment entries in TSV format")
-    else:
-        raise Exception(f'Unsupported file type (not .csv, .tsv)')
-
-    # read the file
-    _columns = {}
-    with open(_file, 'r') as _fd:
-        _r = csv.reader(_fd, delimiter=_delimiter)
-        _headers = next(_r, None)
-        # separate header line into column headings
-        for _h in _headers:
-            _columns[_h] = []
-        # read rest of file into lists associated with each column heading
-        for _row in _r:
-            # ignore comment rows
-            if _row[0][0] != '' and _row[0][0] in r'#%!<>+\/':
-                continue
-            # load valid rows
-            for _h, _v in zip(_headers, _row):
-                _columns[_h].append(_v.strip())
+    # read the file once, checking the header then each row as it is read
+    _num, _bad, _refresh, _header = 0, 0, True, True
+    for _line, _headers, _values in upload_rows(_file):
 
-    # sanity check
-    if len(_columns)*_num != sum([len(_v) for _v in _columns.values()]):
-        raise Exception(f'Irregular number of elements in {_file}, please check {_file}')
-    if _verbose:
-        print(f"File {_file} has passed the sanity check")
-
-    # change the dictionary keys to remove unwanted characters
-    for _k in list(_columns.keys()):
-        _columns[_k.translate({ord(i): None for i in ' !@#$'})] = _columns.pop(_k)
-
-    # check we got all the allowed headers
-    if all(_k in _columns for _k in ARTN_ALLOWED_HEADERS_V2):
-        if _verbose:
-            print(f"File {_file} supports V2 format (non-sidereal enabled)")
-    elif all(_k in _columns for _k in ARTN_ALLOWED_HEADERS_V1):
-        if _verbose:
-            print(f"File {_file} supports V1 format (non-sidereal disabled)")
-    else:
-        raise Exception(f'Failed to get all allowed headers, please check {_file}')
-    print(f"File {_file} passed header checks OK")
-
-    # check the json
-    if _json and 'non_sidereal_json' in _columns:
-        _nsj = _columns['non_sidereal_json']
-        for _e in _nsj:
-            _e = _e.replace("'", "")
+        # check we got all the allowed headers
+        if _header:
+            _version, _header = upload_version(_headers), False
+            if _verbose:
+                print(f"File {_file} supports V{_version} format "
+                      f"(non-sidereal {'enabled' if _version > 1 else 'disabled'})")
+            print(f"File {_file} passed header checks OK")
+            continue
+
+        # sanity check
+        if _values is None:
+            print(f"ERROR: line {_line}: irregular number of elements")
+            _bad += 1
+            continue
+
+        # check the json
+        if _json and _values['non_sidereal'].lower() in TRUE_VALUES:
+            _str = _values.get('non_sidereal_json', '')
+            _e = f"{_str[_str.find('{'):_str.rfind('}') + 1]}"
             if _verbose:
                 print(f"Checking {_e}")
-            if "{}" in _e:
+            if not check_json(f"{_e}", _refresh):
+                print(f"ERROR: line {_line}: invalid non_sidereal_json ({_str})")
+                _bad += 1
                 continue
-            else:
-                if not check_json(f"{_e}",  False):
-                    print(f"ERROR: there is an error on JSON string:\n{_e}")
-                else:
-                    print(f"File {_file} passed JSON checks OK")
+            _refresh = False
+        _num += 1
+
+    # report
+    print(f"File {_file} has {_num} valid and {_bad} invalid entries{' OK' if _bad == 0 else ''}")
+    return _num, _bad
 
 
 # +
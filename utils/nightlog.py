@@ -4,9 +4,9 @@
 # +
 # import(s)
 # -
-from astropy.io import fits
 from datetime import datetime
 from datetime import timedelta
+from src.fitsheader import fits_header
 
 import argparse
 import itertools
@@ -86,12 +86,12 @@ def nlog_get_fits_headers(_in=None):
     _l_out = []
     for _k, _v in _in.items():
         _d_out = {'file': os.path.basename(_k), 'directory': os.path.dirname(_k), 'size': _v}
-        with fits.open(_k) as _hdul:
-            for _h in ARTN_FITS_HEADERS:
-                try:
-                    _d_out[_h.replace('-', '')] = str(_hdul[0].header[_h]).strip()
-                except Exception:
-                    _d_out[_h] = ''
+        try:
+            _hdr = fits_header(_k, ARTN_FITS_HEADERS)
+        except Exception:
+            _hdr = {}
+        for _h in ARTN_FITS_HEADERS:
+            _d_out[_h.replace('-', '')] = str(_hdr.get(_h, '')).strip()
 
         # who requested it?
         try: